@@ -0,0 +1,104 @@
+# benchmarks/bench_bulk_writes.py
+#
+# Compares the old per-row write path (CheckResult.objects.create + full
+# website.save() per probe) with the ResultWriteBuffer bulk path.
+#
+# Runs against a throwaway test database created from DATABASES['default']:
+#   SQLite:    python benchmarks/bench_bulk_writes.py
+#   Postgres:  POSTGRES_DB=whm POSTGRES_USER=... python benchmarks/bench_bulk_writes.py
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'monitor_project.settings')
+
+import django
+django.setup()
+
+from django.db import connection
+from django.utils import timezone
+
+from monitor.models import CheckResult, CustomUser, Website
+from monitor.writebuffer import ResultWriteBuffer
+
+
+def make_results(websites, rows):
+    """Synthetic probe outcomes, round-robin across the websites."""
+    return [
+        (websites[i % len(websites)], 200 if i % 10 else 503, float(50 + i % 300))
+        for i in range(rows)
+    ]
+
+
+def per_row(results):
+    for website, status_code, response_time_ms in results:
+        CheckResult.objects.create(
+            website=website,
+            status_code=status_code,
+            response_time_ms=response_time_ms,
+            is_up=status_code < 400,
+        )
+        website.last_checked = timezone.now()
+        website.status_code = status_code
+        website.response_time = response_time_ms
+        website.is_up = status_code < 400
+        website.save()
+
+
+def bulk(results, buffer_size):
+    buffer = ResultWriteBuffer(max_size=buffer_size, max_age_seconds=3600)
+    for website, status_code, response_time_ms in results:
+        website.last_checked = timezone.now()
+        website.status_code = status_code
+        website.response_time = response_time_ms
+        website.is_up = status_code < 400
+        buffer.add(website, CheckResult(
+            website=website,
+            status_code=status_code,
+            response_time_ms=response_time_ms,
+            is_up=status_code < 400,
+        ))
+    buffer.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-row vs. bulk CheckResult write throughput.')
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--websites', type=int, default=1000)
+    parser.add_argument('--buffer-size', type=int, default=500)
+    args = parser.parse_args()
+
+    old_name = connection.settings_dict['NAME']
+    if connection.vendor == 'sqlite':
+        # The default SQLite test DB lives in memory, which hides per-commit fsync cost.
+        connection.settings_dict['TEST']['NAME'] = os.path.join(tempfile.gettempdir(), 'whm_bench.sqlite3')
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        user = CustomUser.objects.create_user('0000000000', 'bench')
+        Website.objects.bulk_create(
+            Website(user=user, name=f'site-{i}', url=f'https://site-{i}.example.com/')
+            for i in range(args.websites)
+        )
+        websites = list(Website.objects.all())
+        results = make_results(websites, args.rows)
+
+        print(f"Backend: {connection.vendor}  rows={args.rows}  websites={args.websites}")
+        for label, run in (
+            ('per-row create+save', lambda: per_row(results)),
+            (f'bulk buffer ({args.buffer_size})', lambda: bulk(results, args.buffer_size)),
+        ):
+            CheckResult.objects.all().delete()
+            started = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - started
+            print(f"  {label:<24} {elapsed:8.2f}s  {args.rows / elapsed:10.0f} results/s")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+# benchmarks/bench_sketches.py
+#
+# Accuracy and speed of the DDSketch latency sketches versus exact
+# percentiles computed by sorting raw response times.
+#
+#   python benchmarks/bench_sketches.py [--samples 1000000] [--buckets 288]
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from monitor.sketches import DDSketch
+
+QUANTILES = (0.5, 0.95, 0.99, 0.999)
+
+
+def exact_quantile(sorted_values, q):
+    return sorted_values[int(q * (len(sorted_values) - 1))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='DDSketch accuracy and speed vs. exact percentiles.')
+    parser.add_argument('--samples', type=int, default=1000000)
+    parser.add_argument('--buckets', type=int, default=288, help='Sketches to merge (288 = one day of 5m buckets).')
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    # Log-normal latencies with a slow tail, roughly what real sites look like.
+    values = [rng.lognormvariate(5.0, 0.6) + (rng.random() < 0.01) * rng.uniform(2000, 15000)
+              for _ in range(args.samples)]
+
+    started = time.perf_counter()
+    exact = sorted(values)
+    exact_results = {q: exact_quantile(exact, q) for q in QUANTILES}
+    exact_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    per_bucket = args.samples // args.buckets
+    sketches = []
+    for b in range(args.buckets):
+        sketch = DDSketch()
+        for value in values[b * per_bucket:(b + 1) * per_bucket]:
+            sketch.add(value)
+        sketches.append(sketch)
+    add_time = time.perf_counter() - started
+
+    encoded = [s.to_bytes() for s in sketches]
+
+    started = time.perf_counter()
+    merged = DDSketch()
+    for data in encoded:
+        merged.merge(DDSketch.from_bytes(data))
+    sketch_results = {q: merged.quantile(q) for q in QUANTILES}
+    query_time = time.perf_counter() - started
+
+    print(f"samples={args.samples}  buckets={args.buckets}  relative_accuracy={merged.relative_accuracy}")
+    print(f"  exact sort + quantiles:        {exact_time * 1000:9.1f} ms")
+    print(f"  sketch add (all samples):      {add_time * 1000:9.1f} ms  ({args.samples / add_time:,.0f} adds/s)")
+    print(f"  decode + merge + quantiles:    {query_time * 1000:9.1f} ms")
+    print(f"  avg encoded size per bucket:   {sum(map(len, encoded)) / len(encoded):9.0f} bytes")
+    print()
+    print(f"  {'quantile':>8}  {'exact':>10}  {'sketch':>10}  {'rel. error':>10}")
+    for q in QUANTILES:
+        error = abs(sketch_results[q] - exact_results[q]) / exact_results[q]
+        print(f"  {q:>8}  {exact_results[q]:10.2f}  {sketch_results[q]:10.2f}  {error:10.3%}")
+
+
+if __name__ == '__main__':
+    main()
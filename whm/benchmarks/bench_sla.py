@@ -0,0 +1,135 @@
+# benchmarks/bench_sla.py
+#
+# SLA computation over synthetic check history (no database involved):
+#   1. a plain Python loop over checks (per-site uptime, outages, MTTR/MTBF,
+#      sorted-list percentiles), on the first --loop-rows rows only,
+#   2. monitor.analytics.compute_sla on the same rows (results must match),
+#   3. compute_sla on all --rows rows at once.
+#
+#   python benchmarks/bench_sla.py [--rows 10000000] [--sites 1000] [--loop-rows 1000000]
+#
+# Sites are checked every --interval seconds with jitter; outages start with
+# probability 1/1000 per check and last 5 checks on average.
+
+import argparse
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'monitor_project.settings')
+
+import django
+django.setup()
+
+import numpy as np
+
+from monitor.analytics import compute_sla
+
+
+def synthetic_columns(rows, sites, interval, seed=1):
+    """Columns sorted by (site, timestamp), as load_checks returns them."""
+    rng = np.random.default_rng(seed)
+    per_site = rows // sites
+    site = np.repeat(np.arange(1, sites + 1, dtype=np.int64), per_site)
+    step = np.tile(np.arange(per_site, dtype=np.float64), sites)
+    timestamp = 1.7e9 + step * interval + rng.uniform(0, interval / 10, site.size)
+
+    # Alternating UP/DOWN runs with geometric lengths.
+    runs = rng.geometric(np.where(np.arange(2 * site.size // 900 + 2) % 2 == 0, 1 / 1000, 1 / 5))
+    states = np.arange(runs.size) % 2 == 0
+    is_up = np.repeat(states, runs)[:site.size]
+
+    status_code = np.where(is_up, 200, rng.choice([0, 503, 408], site.size)).astype(np.int16)
+    response_time = rng.lognormal(4, 0.5, site.size)
+    response_time[status_code == 0] = np.nan
+    return {
+        'site': site,
+        'timestamp': timestamp,
+        'is_up': is_up,
+        'status_code': status_code,
+        'response_time_ms': response_time,
+    }
+
+
+def python_loop_sla(columns, end):
+    """Reference implementation: one pass over checks in Python."""
+    report = {}
+    sites = columns['site'].tolist()
+    stamps = columns['timestamp'].tolist()
+    ups = columns['is_up'].tolist()
+    codes = columns['status_code'].tolist()
+    latencies = columns['response_time_ms'].tolist()
+    i = 0
+    while i < len(sites):
+        site, j = sites[i], i
+        while j < len(sites) and sites[j] == site:
+            j += 1
+        up_time = monitored = 0.0
+        outages, resolved, resolved_time, down_since = 0, 0, 0.0, None
+        timed = []
+        for k in range(i, j):
+            held = (stamps[k + 1] if k + 1 < j else end) - stamps[k]
+            monitored += held
+            if ups[k]:
+                up_time += held
+                if down_since is not None:
+                    resolved += 1
+                    resolved_time += stamps[k] - down_since
+                    down_since = None
+            elif down_since is None:
+                outages += 1
+                down_since = stamps[k]
+            if not math.isnan(latencies[k]) and codes[k] not in (0, 408):
+                timed.append(latencies[k])
+        timed.sort()
+        position = (len(timed) - 1) * 0.95
+        lower = int(position)
+        upper = min(lower + 1, len(timed) - 1)
+        report[site] = {
+            'uptime_pct': round(100.0 * up_time / monitored, 3),
+            'outages': outages,
+            'mttr_seconds': round(resolved_time / resolved, 3) if resolved else None,
+            'p95_response_ms': round(timed[lower] + (timed[upper] - timed[lower]) * (position - lower), 3),
+        }
+        i = j
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Vectorized vs. Python-loop SLA computation on synthetic history.')
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    parser.add_argument('--sites', type=int, default=1000)
+    parser.add_argument('--interval', type=float, default=10.0, help='Seconds between checks of a site.')
+    parser.add_argument('--loop-rows', type=int, default=1_000_000, help='Rows given to the Python loop.')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    columns = synthetic_columns(args.rows, args.sites, args.interval)
+    end = float(columns['timestamp'].max()) + args.interval
+    print(f"rows={columns['site'].size:,}  sites={args.sites}  generated in {time.perf_counter() - started:.1f}s")
+
+    subset = {name: values[:args.loop_rows] for name, values in columns.items()}
+    runs = [
+        (f'python loop ({args.loop_rows:,} rows)', lambda: python_loop_sla(subset, end), args.loop_rows),
+        (f'compute_sla ({args.loop_rows:,} rows)', lambda: compute_sla(subset, end), args.loop_rows),
+        (f"compute_sla ({columns['site'].size:,} rows)", lambda: compute_sla(columns, end), columns['site'].size),
+    ]
+    results = []
+    for label, run, rows in runs:
+        started = time.perf_counter()
+        results.append(run())
+        elapsed = time.perf_counter() - started
+        print(f"  {label:<34} {elapsed:8.2f}s  {rows / elapsed / 1e6:8.2f} M rows/s")
+
+    loop, vectorized = results[0], results[1]
+    mismatches = [
+        site for site in loop
+        if any(loop[site][key] != vectorized[site][key] for key in loop[site])
+    ]
+    print(f"  results match on {len(loop) - len(mismatches)}/{len(loop)} sites")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+# benchmarks/bench_sms_fanout.py
+#
+# SMS burst throughput against the local fake Twilio API (monitor.fakeproviders):
+#   1. a new twilio Client per message, sent one after another (the old path),
+#   2. the cached per-process client, sequential,
+#   3. send_sms_bulk: cached client + thread fan-out + token-bucket limiter.
+#
+#   python benchmarks/bench_sms_fanout.py [--messages 200] [--latency-ms 50] [--rate 1000]
+#
+# The fake speaks plain HTTP, so the per-message connection cost measured
+# here excludes the TLS handshake a real api.twilio.com connection pays.
+
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'monitor_project.settings')
+
+import django
+django.setup()
+
+from django.conf import settings
+from twilio.rest import Client
+
+from monitor.alerts import PooledTwilioHttpClient, send_sms_bulk, twilio_client
+from monitor.fakeproviders import FakeTwilioServer
+
+ACCOUNT_SID = 'AC' + '0' * 32
+FROM_NUMBER = '+15550000000'
+
+
+def start_fake_twilio(latency_ms):
+    """Runs the fake Twilio API on a background event loop; returns (server, base_url)."""
+    fake = FakeTwilioServer(latency_ms=latency_ms)
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(asyncio.start_server(fake.handle, '127.0.0.1', 0))
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return fake, f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+
+
+def numbers(count):
+    return [f"+1555{i:07d}" for i in range(count)]
+
+
+def new_client_per_message(base_url, recipients):
+    for number in recipients:
+        client = Client(ACCOUNT_SID, 'token', http_client=PooledTwilioHttpClient(base_url))
+        client.messages.create(to=number, from_=FROM_NUMBER, body='bench')
+
+
+def cached_client_sequential(recipients):
+    for number in recipients:
+        twilio_client().messages.create(to=number, from_=FROM_NUMBER, body='bench')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SMS burst throughput against a local fake Twilio API.')
+    parser.add_argument('--messages', type=int, default=200)
+    parser.add_argument('--latency-ms', type=int, default=50, help='Simulated provider latency per request.')
+    parser.add_argument('--rate', type=float, default=1000, help='SMS_RATE_PER_SECOND for the fan-out.')
+    parser.add_argument('--workers', type=int, default=settings.SMS_FANOUT_WORKERS)
+    args = parser.parse_args()
+
+    fake, base_url = start_fake_twilio(args.latency_ms)
+    settings.TWILIO_API_BASE_URL = base_url
+    settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN = ACCOUNT_SID, 'token'
+    settings.TWILIO_PHONE_NUMBER = FROM_NUMBER
+    settings.SMS_RATE_PER_SECOND, settings.SMS_RATE_BURST = args.rate, max(1, int(args.rate))
+    settings.SMS_FANOUT_WORKERS = args.workers
+    recipients = numbers(args.messages)
+
+    runs = [
+        ('new client per message', lambda: new_client_per_message(base_url, recipients)),
+        ('cached client, sequential', lambda: cached_client_sequential(recipients)),
+        (f'send_sms_bulk ({args.workers} workers)', lambda: send_sms_bulk(recipients, 'bench')),
+    ]
+    print(f"messages={args.messages}  provider latency={args.latency_ms}ms  rate limit={args.rate}/s")
+    for label, run in runs:
+        started = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - started
+        print(f"  {label:<28} {elapsed:7.2f}s  {args.messages / elapsed:8.1f} msg/s")
+    print(f"  fake Twilio: {fake.stats}")
+
+
+if __name__ == '__main__':
+    main()
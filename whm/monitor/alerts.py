@@ -1,24 +1,139 @@
 # monitor/alerts.py (Final Correct Version)
 
 import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+
 from django.conf import settings
-from django.core.mail import send_mail # For Django Email
+from django.core.mail import EmailMessage # For Django Email
+from requests.adapters import HTTPAdapter
+from twilio.base.exceptions import TwilioException
+from twilio.http.http_client import TwilioHttpClient
 from twilio.rest import Client # For Twilio SMS
 from django.utils import timezone 
+
+from .mailer import mailer
+
 logger = logging.getLogger(__name__)
 
+TWILIO_API_BASE_URL = 'https://api.twilio.com'
+
+
+class PooledTwilioHttpClient(TwilioHttpClient):
+    """Twilio HTTP client with a connection pool sized for parallel sends.
+
+    Optionally sends API calls to another base URL (e.g. the fake server from
+    run_fake_providers).
+    """
+
+    def __init__(self, base_url=None, pool_size=10, **kwargs):
+        super().__init__(**kwargs)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.base_url = base_url.rstrip('/') if base_url else None
+
+    def request(self, method, url, *args, **kwargs):
+        if self.base_url and url.startswith(TWILIO_API_BASE_URL):
+            url = self.base_url + url[len(TWILIO_API_BASE_URL):]
+        return super().request(method, url, *args, **kwargs)
+
+
+@lru_cache(maxsize=8)
+def _cached_twilio_client(pid, account_sid, auth_token, base_url):
+    # Keyed on pid so forked Celery workers never share the parent's sockets.
+    http_client = PooledTwilioHttpClient(
+        base_url=None if base_url.rstrip('/') == TWILIO_API_BASE_URL else base_url,
+        pool_size=settings.SMS_FANOUT_WORKERS,
+        timeout=settings.SMS_REQUEST_TIMEOUT_SECONDS,
+    )
+    return Client(account_sid, auth_token, http_client=http_client)
+
+
+def twilio_client(account_sid=None, auth_token=None):
+    """The process-wide Twilio REST client; keep-alive HTTPS connections are reused across messages."""
+    account_sid = account_sid or settings.TWILIO_ACCOUNT_SID
+    auth_token = auth_token or settings.TWILIO_AUTH_TOKEN
+    if not all([account_sid, auth_token]):
+        # Client() doesn't check this itself; every request would just go out unauthenticated.
+        raise TwilioException("Twilio credentials are not configured.")
+    return _cached_twilio_client(os.getpid(), account_sid, auth_token, settings.TWILIO_API_BASE_URL)
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` sends per second, bursts of up to `burst`."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+_sms_bucket = None
+
+
+def sms_rate_limiter():
+    """The per-process limiter shared by every SMS fan-out (SMS_RATE_PER_SECOND)."""
+    global _sms_bucket
+    if _sms_bucket is None or _sms_bucket.rate != settings.SMS_RATE_PER_SECOND:
+        _sms_bucket = TokenBucket(settings.SMS_RATE_PER_SECOND, settings.SMS_RATE_BURST)
+    return _sms_bucket
+
+
+def send_sms_bulk(numbers, body, from_=None):
+    """Sends one SMS body to many numbers in parallel, within the provider rate limit.
+
+    Returns {number: exception} for the numbers that failed; missing or
+    invalid credentials fail every number.
+    """
+    try:
+        client = twilio_client()
+    except TwilioException as e:
+        logger.error(f"SMS fan-out to {len(numbers)} numbers not sent: {e}")
+        return dict.fromkeys(numbers, e)
+    limiter = sms_rate_limiter()
+    from_ = from_ or settings.TWILIO_PHONE_NUMBER
+
+    def send(number):
+        limiter.acquire()
+        client.messages.create(to=number, from_=from_, body=body)
+
+    failures = {}
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max(1, min(settings.SMS_FANOUT_WORKERS, len(numbers)))) as pool:
+        futures = {pool.submit(send, number): number for number in numbers}
+        for future in as_completed(futures):
+            if future.exception() is not None:
+                failures[futures[future]] = future.exception()
+    logger.info(
+        f"SMS fan-out: {len(numbers) - len(failures)}/{len(numbers)} sent in {time.monotonic() - started:.2f}s."
+    )
+    return failures
+
 # --- 1. HELPER FUNCTIONS (To resolve the "is not defined" error) ---
 
 def send_email_alert(recipient_email, subject, message_body):
     """Handles sending email alerts using Django's core mail functionality."""
     try:
-        send_mail(
-            subject=subject,
-            message=message_body,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[recipient_email],
-            fail_silently=False,
-        )
+        # Sent over the worker's persistent SMTP connection rather than a new one per mail.
+        mailer.send(EmailMessage(subject, message_body, settings.DEFAULT_FROM_EMAIL, [recipient_email]))
         logger.info(f"Email alert SUCCESS: Sent to {recipient_email}")
         return True
     except Exception as e:
@@ -38,7 +153,7 @@ def send_twilio_sms(to_number, message_body):
         return False
 
     try:
-        client = Client(account_sid, auth_token)
+        client = twilio_client()
         client.messages.create(
             to=to_number,
             from_=twilio_number,
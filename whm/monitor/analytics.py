@@ -0,0 +1,224 @@
+from datetime import datetime
+from itertools import islice
+
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+
+from . import archive
+from .models import CheckResult
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; SLA analytics need it
+    np = None
+
+# =================================================================
+# Vectorized SLA / Uptime Engine
+# =================================================================
+# Check history for many sites is loaded into flat NumPy columns sorted by
+# (site, timestamp) and every metric is computed for all sites at once with
+# array operations (reduceat / bincount over site segments), never a Python
+# loop over checks:
+#   - uptime: each check's state holds until the site's next check (the last
+#     one until the end of the window), so uptime is time-weighted; the
+#     share of successful checks is reported alongside;
+#   - outages: run-length encoding of the up/down sequence, a DOWN run lasting
+#     from its first failed check to the next successful one;
+#   - MTTR (mean duration of resolved outages) and MTBF (up time per outage);
+#   - latency mean and percentiles, excluding checks without a response
+#     time (latency.has_latency).
+# History comes from the Parquet archive (when pyarrow is installed) and the
+# database. Rows caught in an interrupted archival run may be read from both
+# until the next run deletes them.
+
+QUANTILES = (50, 95, 99)
+READ_CHUNK_SIZE = 20000
+COLUMN_TYPES = {
+    'site': 'int64', 'timestamp': 'float64', 'is_up': 'bool', 'status_code': 'int16', 'response_time_ms': 'float64',
+}
+
+
+def _require_numpy():
+    if np is None:
+        raise ImproperlyConfigured("SLA analytics need numpy (pip install numpy).")
+
+
+def _database_columns(website_ids, start, end):
+    """The sites' database rows as NumPy columns, converted one fetched chunk at a time."""
+    queryset = CheckResult.objects.filter(website_id__in=website_ids, timestamp__lt=end)
+    if start:
+        queryset = queryset.filter(timestamp__gte=start)
+    rows = queryset.values_list('website_id', 'timestamp', 'is_up', 'status_code', 'response_time_ms').iterator(
+        chunk_size=READ_CHUNK_SIZE,
+    )
+    chunks = []
+    while chunk := list(islice(rows, READ_CHUNK_SIZE)):
+        site, stamp, up, code, latency = zip(*chunk)
+        chunks.append({
+            'site': np.array(site, dtype=np.int64),
+            'timestamp': np.fromiter(map(datetime.timestamp, stamp), dtype=np.float64, count=len(stamp)),
+            'is_up': np.array(up, dtype=bool),
+            'status_code': np.array(code, dtype=np.int16),
+            'response_time_ms': np.array(latency, dtype=np.float64),  # None becomes NaN
+        })
+    if not chunks:
+        return {name: np.empty(0, dtype=dtype) for name, dtype in COLUMN_TYPES.items()}
+    return {name: np.concatenate([chunk[name] for chunk in chunks]) for name in COLUMN_TYPES}
+
+
+def _archived_columns(website_id, start, end):
+    data = archive.load_archived(
+        website_id, ('timestamp', 'is_up', 'status_code', 'response_time_ms'), start, end,
+    )
+    count = data['timestamp'].size
+    return {
+        'site': np.full(count, website_id, dtype=np.int64),
+        'timestamp': data['timestamp'].astype('datetime64[us]').astype(np.int64) / 1e6,
+        'is_up': data['is_up'].astype(bool),
+        'status_code': data['status_code'].astype(np.int16),
+        'response_time_ms': data['response_time_ms'].astype(np.float64),
+    }
+
+
+def load_checks(website_ids, start=None, end=None):
+    """Flat columns of the sites' checks in [start, end), sorted by (site, timestamp).
+
+    Timestamps are float epoch seconds; missing response times are NaN.
+    """
+    _require_numpy()
+    end = end or timezone.now()
+    parts = [_database_columns(website_ids, start, end)]
+    if archive.pq is not None:
+        parts.extend(_archived_columns(website_id, start, end) for website_id in website_ids)
+    columns = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+    order = np.lexsort((columns['timestamp'], columns['site']))
+    return {name: values[order] for name, values in columns.items()}
+
+
+def _percentiles(values, counts):
+    """Linear-interpolated QUANTILES per segment (NaN when empty), for values grouped by segment.
+
+    Each segment's slice is only partially sorted around the quantile
+    positions (np.partition), which is far cheaper than one global sort of
+    (segment, value) pairs; the loop is per site, not per check.
+    """
+    quantiles = np.array(QUANTILES) / 100
+    result = np.full((len(QUANTILES), counts.size), np.nan)
+    bounds = np.concatenate(([0], np.cumsum(counts)))
+    for i in np.flatnonzero(counts).tolist():
+        chunk = values[bounds[i]:bounds[i + 1]]
+        positions = (chunk.size - 1) * quantiles
+        lower = np.floor(positions).astype(np.int64)
+        upper = np.minimum(lower + 1, chunk.size - 1)
+        partitioned = np.partition(chunk, np.concatenate((lower, upper)))
+        result[:, i] = partitioned[lower] + (partitioned[upper] - partitioned[lower]) * (positions - lower)
+    return dict(zip(QUANTILES, result))
+
+
+def _to_list(values):
+    """Plain Python values for the JSON report: floats rounded to 3 places, NaN as None."""
+    if values.dtype.kind != 'f':
+        return values.tolist()
+    return [None if value != value else value for value in np.round(values, 3).tolist()]
+
+
+def compute_sla(columns, end, include_outages=False):
+    """{site id: metrics} from columns sorted by (site, timestamp), as returned by load_checks.
+
+    `end` (epoch seconds) closes the last check of every site and any
+    ongoing outage. With include_outages, each site also lists its outages
+    as (start, end) epoch seconds.
+    """
+    _require_numpy()
+    site, stamp, up = columns['site'], columns['timestamp'], columns['is_up']
+    count = site.size
+    if not count:
+        return {}
+    # Rows are sorted by site, so each site is one contiguous segment.
+    seg_starts = np.concatenate(([0], np.flatnonzero(site[1:] != site[:-1]) + 1))
+    seg_ends = np.concatenate((seg_starts[1:], [count]))
+    seg_counts = seg_ends - seg_starts
+    sites = site[seg_starts]
+    segments = sites.size
+    segment = np.repeat(np.arange(segments), seg_counts)
+
+    # Time-weighted state: each check holds until the site's next check, the last one until `end`.
+    next_stamp = np.empty(count)
+    next_stamp[:-1] = stamp[1:]
+    next_stamp[seg_ends - 1] = end
+    held = np.clip(next_stamp - stamp, 0, None)
+    monitored = np.add.reduceat(held, seg_starts)
+    up_time = np.add.reduceat(np.where(up, held, 0.0), seg_starts)
+    up_checks = np.add.reduceat(up.astype(np.int64), seg_starts)
+
+    # Run-length encoding: a run starts at a site's first check or wherever the state changes.
+    run_start = np.ones(count, dtype=bool)
+    run_start[1:] = up[1:] != up[:-1]
+    run_start[seg_starts] = True
+    runs = np.flatnonzero(run_start)
+    run_segment = segment[runs]
+    closes_segment = np.ones(runs.size, dtype=bool)
+    closes_segment[:-1] = run_segment[1:] != run_segment[:-1]
+    run_end = np.empty(runs.size)
+    run_end[:-1] = stamp[runs[1:]]
+    run_end[closes_segment] = end
+    run_duration = run_end - stamp[runs]
+
+    down = ~up[runs]
+    resolved = down & ~closes_segment
+    outages = np.bincount(run_segment[down], minlength=segments)
+    resolved_count = np.bincount(run_segment[resolved], minlength=segments)
+    resolved_time = np.bincount(run_segment[resolved], weights=run_duration[resolved], minlength=segments)
+    down_time = np.bincount(run_segment[down], weights=run_duration[down], minlength=segments)
+    longest = np.zeros(segments)
+    np.maximum.at(longest, run_segment[down], run_duration[down])
+    ongoing = np.zeros(segments, dtype=bool)
+    ongoing[run_segment[down & closes_segment]] = True
+
+    # Latency over checks that got a response
+    latency = columns['response_time_ms']
+    status_code = columns['status_code']
+    timed = ~np.isnan(latency) & (status_code != 0) & (status_code != 408)
+    timed_segment, timed_latency = segment[timed], latency[timed]
+    timed_count = np.bincount(timed_segment, minlength=segments)
+    latency_sum = np.bincount(timed_segment, weights=timed_latency, minlength=segments)
+    percentiles = _percentiles(timed_latency, timed_count)
+
+    with np.errstate(divide='ignore', invalid='ignore'):  # 0/0 -> NaN -> None
+        metrics = {
+            'checks': seg_counts,
+            'up_checks': up_checks,
+            'check_uptime_pct': 100.0 * up_checks / seg_counts,
+            'monitored_seconds': monitored,
+            'uptime_pct': 100.0 * up_time / monitored,
+            'outages': outages,
+            'downtime_seconds': down_time,
+            'longest_outage_seconds': longest,
+            'ongoing_outage': ongoing,
+            'mttr_seconds': resolved_time / resolved_count,
+            'mtbf_seconds': np.where(outages > 0, up_time / outages, np.nan),
+            'avg_response_ms': latency_sum / timed_count,
+            **{f'p{q}_response_ms': percentiles[q] for q in QUANTILES},
+        }
+    metrics = {name: _to_list(values) for name, values in metrics.items()}
+    report = {
+        website_id: {name: values[i] for name, values in metrics.items()}
+        for i, website_id in enumerate(sites.tolist())
+    }
+
+    if include_outages:
+        down_runs = np.flatnonzero(down)
+        for website_id in sites.tolist():
+            report[website_id]['outage_intervals'] = []
+        for run in down_runs.tolist():
+            report[int(sites[run_segment[run]])]['outage_intervals'].append(
+                (float(stamp[runs[run]]), float(run_end[run]))
+            )
+    return report
+
+
+def sla_report(website_ids, start=None, end=None, include_outages=False):
+    """SLA metrics for the given sites over [start, end) (end defaults to now)."""
+    end = end or timezone.now()
+    columns = load_checks(list(website_ids), start, end)
+    return compute_sla(columns, end.timestamp(), include_outages)
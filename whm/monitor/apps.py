@@ -4,10 +4,7 @@ class MonitorConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'monitor'
     label = 'monitor'
-    
-    # TEMPORARILY COMMENT OUT THE READY METHOD IF IT EXISTS
-    # def ready(self):
-    #     import monitor.signals
-    #     from django.contrib import admin
-    #     admin.autodiscover()
-    # Use pass instead of ready() content for now
+
+    def ready(self):
+        # Registers the AlertContact cache invalidation receivers.
+        import monitor.signals  # noqa: F401
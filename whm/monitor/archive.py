@@ -0,0 +1,266 @@
+import logging
+import os
+from datetime import datetime, timedelta, timezone as dt_timezone
+from functools import lru_cache
+from itertools import groupby
+from operator import itemgetter
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+
+from .models import CheckResult, RollupWatermark
+from .rollups import WATERMARK_NAME
+
+try:
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow/numpy are optional; archival and archive queries need them
+    np = pa = pq = None
+
+logger = logging.getLogger(__name__)
+
+# =================================================================
+# Columnar Archive of Old Check History (Parquet)
+# =================================================================
+# Raw CheckResult rows older than CHECKRESULT_ARCHIVE_AFTER_DAYS are moved,
+# one whole calendar month at a time, into one compressed Parquet file per
+# site per month:
+#   <CHECKRESULT_ARCHIVE_DIR>/<website id>/<YYYY-MM>.parquet
+# Timestamps and ids use DELTA_BINARY_PACKED encoding (a month of evenly
+# spaced checks packs into a few bits per row), status codes and error
+# messages are dictionary-encoded, and pages are zstd-compressed. Rollups are
+# unaffected, and rows are only archived once the rollups have folded them in
+# (id <= rollup watermark). Each month is read with one query for all sites.
+# Each file is written to a temporary name and renamed into place before the
+# rows are deleted, so a crash at any point leaves every row in the database,
+# the archive, or both (re-archiving merges by id).
+#
+# Queries over archived ranges read only the needed columns from
+# memory-mapped files and compute with NumPy (see archived_summary). The raw
+# history API and exports read the database only: they reject ranges that
+# start before a site's archived months (see database_start).
+
+ARCHIVE_FIELDS = (
+    'id', 'timestamp', 'status_code', 'is_up', 'response_time_ms', 'error_message',
+    'connection_reused', 'bytes_transferred', 'assertions_passed',
+    'dns_ms', 'connect_ms', 'tls_ms', 'ttfb_ms', 'transfer_ms',
+)
+READ_CHUNK_SIZE = 10000
+DELETE_CHUNK_SIZE = 10000
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImproperlyConfigured("Check history archival needs pyarrow and numpy (pip install pyarrow numpy).")
+
+
+@lru_cache(maxsize=1)
+def archive_schema():
+    _require_pyarrow()
+    timing = pa.float32()
+    return pa.schema([
+        ('id', pa.int64()),
+        ('timestamp', pa.timestamp('us', tz='UTC')),
+        ('status_code', pa.int16()),
+        ('is_up', pa.bool_()),
+        ('response_time_ms', timing),
+        ('error_message', pa.string()),
+        ('connection_reused', pa.bool_()),
+        ('bytes_transferred', pa.int64()),
+        ('assertions_passed', pa.bool_()),
+        ('dns_ms', timing),
+        ('connect_ms', timing),
+        ('tls_ms', timing),
+        ('ttfb_ms', timing),
+        ('transfer_ms', timing),
+    ])
+
+
+WRITE_OPTIONS = {
+    'compression': 'zstd',
+    'use_dictionary': ['status_code', 'error_message'],
+    'column_encoding': {'id': 'DELTA_BINARY_PACKED', 'timestamp': 'DELTA_BINARY_PACKED'},
+}
+
+
+def _month_start(moment):
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_month(month):
+    return (month + timedelta(days=32)).replace(day=1)
+
+
+def archive_path(website_id, month):
+    return Path(settings.CHECKRESULT_ARCHIVE_DIR) / str(website_id) / f"{month:%Y-%m}.parquet"
+
+
+def _write_atomically(table, path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + '.tmp')
+    pq.write_table(table, tmp, **WRITE_OPTIONS)
+    os.replace(tmp, path)
+
+
+def _month_rows(month, max_id):
+    return CheckResult.objects.filter(timestamp__gte=month, timestamp__lt=_next_month(month), id__lte=max_id)
+
+
+def _write_month(website_id, month, columns):
+    """Writes (or merges into) one site's Parquet file for the month."""
+    table = pa.table(
+        {name: pa.array(values, type=archive_schema().field(name).type) for name, values in zip(ARCHIVE_FIELDS, columns)},
+        schema=archive_schema(),
+    )
+    path = archive_path(website_id, month)
+    if path.exists():
+        # An earlier run archived part of this month (or crashed before deleting): merge by id.
+        existing = pq.read_table(path, memory_map=True)
+        new_rows = pa.array(~np.isin(table.column('id').to_numpy(), existing.column('id').to_numpy()))
+        table = pa.concat_tables([existing, table.filter(new_rows)]).sort_by([('timestamp', 'ascending'), ('id', 'ascending')])
+    _write_atomically(table, path)
+
+
+def archive_month(month, max_id):
+    """Moves all sites' rows of one month (with id <= max_id) into their Parquet files; returns (rows, files)."""
+    rows = _month_rows(month, max_id).order_by('website_id', 'timestamp', 'id').values_list(
+        'website_id', *ARCHIVE_FIELDS,
+    )
+    counts = {}  # website id -> rows written
+    for website_id, site_rows in groupby(rows.iterator(chunk_size=READ_CHUNK_SIZE), key=itemgetter(0)):
+        columns = [[] for _ in ARCHIVE_FIELDS]
+        for row in site_rows:
+            for column, value in zip(columns, row[1:]):
+                column.append(value)
+        _write_month(website_id, month, columns)
+        counts[website_id] = len(columns[0])
+
+    # Deleted once the whole month is read, a few sites (about DELETE_CHUNK_SIZE rows) per statement.
+    batch, batch_rows = [], 0
+    for website_id, count in counts.items():
+        batch.append(website_id)
+        batch_rows += count
+        if batch_rows >= DELETE_CHUNK_SIZE:
+            _month_rows(month, max_id).filter(website_id__in=batch).delete()
+            batch, batch_rows = [], 0
+    if batch:
+        _month_rows(month, max_id).filter(website_id__in=batch).delete()
+    return sum(counts.values()), len(counts)
+
+
+def archive_history(after_days=None):
+    """Archives every whole month older than the threshold; returns the number of rows moved."""
+    _require_pyarrow()
+    if after_days is None:
+        after_days = settings.CHECKRESULT_ARCHIVE_AFTER_DAYS
+    cutoff = _month_start(timezone.now() - timedelta(days=after_days))
+    max_id = RollupWatermark.objects.filter(name=WATERMARK_NAME).values_list('last_id', flat=True).first() or 0
+
+    oldest = (
+        CheckResult.objects.filter(timestamp__lt=cutoff, id__lte=max_id)
+        .order_by('timestamp').values_list('timestamp', flat=True).first()
+    )
+    if oldest is None:
+        return 0
+
+    moved = files = 0
+    month = _month_start(oldest)
+    while month < cutoff:
+        month_rows, month_files = archive_month(month, max_id)
+        moved += month_rows
+        files += month_files
+        month = _next_month(month)
+    logger.info(f"Archived {moved} check results into {files} monthly files (before {cutoff:%Y-%m}).")
+    return moved
+
+
+# --- Reading archived history ---
+
+def archived_files(website_id, start=None, end=None):
+    """The site's monthly archive files overlapping [start, end), oldest first."""
+    directory = Path(settings.CHECKRESULT_ARCHIVE_DIR) / str(website_id)
+    if not directory.is_dir():
+        return []
+    first = f"{_month_start(start):%Y-%m}" if start else None
+    last = f"{end - timedelta(microseconds=1):%Y-%m}" if end else None
+    return [
+        path for path in sorted(directory.glob('*.parquet'))
+        if (first is None or path.stem >= first) and (last is None or path.stem <= last)
+    ]
+
+
+def archived_until(website_id):
+    """End of the site's newest archived month, or None: older raw rows are only in the archive."""
+    files = archived_files(website_id)
+    if not files:
+        return None
+    return _next_month(datetime.strptime(files[-1].stem, '%Y-%m').replace(tzinfo=dt_timezone.utc))
+
+
+def database_start(website_id, start):
+    """`start` for queries of the site's raw rows in the database.
+
+    Raises ValueError when the range starts inside the archive; no start
+    becomes the end of the archived months.
+    """
+    archived = archived_until(website_id)
+    if archived is None:
+        return start
+    if start is None:
+        return archived
+    if start < archived:
+        raise ValueError(
+            f"Check results before {archived:%Y-%m-%d} have been archived. Use a later start, "
+            f"aggregated history (bucket=1h or 1d) or the SLA report for older ranges."
+        )
+    return start
+
+
+def load_archived(website_id, columns=('timestamp', 'is_up', 'response_time_ms'), start=None, end=None):
+    """{column: NumPy array} of the site's archived rows in [start, end), oldest first.
+
+    Only the requested columns are read, from memory-mapped files. Timestamps
+    come back as datetime64[us] (UTC); missing timings as NaN.
+    """
+    _require_pyarrow()
+    filters = []
+    if start:
+        filters.append(('timestamp', '>=', start))
+    if end:
+        filters.append(('timestamp', '<', end))
+    tables = [
+        pq.read_table(path, columns=list(columns), memory_map=True, filters=filters or None)
+        for path in archived_files(website_id, start, end)
+    ]
+    if not tables:
+        schema = archive_schema()
+        tables = [pa.table({name: pa.array([], type=schema.field(name).type) for name in columns})]
+    table = pa.concat_tables(tables)
+    return {name: table.column(name).to_numpy() for name in columns}
+
+
+def archived_summary(website_id, start=None, end=None):
+    """Uptime and latency over archived history, computed with vectorized NumPy operations."""
+    data = load_archived(website_id, ('is_up', 'status_code', 'response_time_ms'), start, end)
+    is_up = data['is_up'].astype(bool)
+    response_times = data['response_time_ms'].astype(np.float64)
+    # Same rule as latency.has_latency: connection errors and timeouts carry no response time.
+    timed = ~np.isnan(response_times) & ~np.isin(data['status_code'], (0, 408))
+    latencies = response_times[timed]
+    checks, up = int(is_up.size), int(np.count_nonzero(is_up))
+    p50 = p95 = p99 = None
+    if latencies.size:
+        p50, p95, p99 = (float(value) for value in np.percentile(latencies, [50, 95, 99]))
+    return {
+        'website_id': website_id,
+        'checks': checks,
+        'up_checks': up,
+        'uptime_pct': round(100.0 * up / checks, 3) if checks else None,
+        'avg_response_ms': float(latencies.mean()) if latencies.size else None,
+        'p50_response_ms': p50,
+        'p95_response_ms': p95,
+        'p99_response_ms': p99,
+    }
@@ -0,0 +1,259 @@
+import codecs
+import json
+import logging
+import re
+from functools import lru_cache
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# =================================================================
+# Content Assertions on Streamed Response Bodies
+# =================================================================
+# Assertions are fed the body chunk by chunk as the prober streams it, so
+# reading can stop as soon as every assertion is decided (a substring found,
+# a size limit exceeded) and whole bodies are never held in memory:
+#   - substring / regex keep only a sliding window of recent text,
+#   - jsonpath buffers the body up to ASSERTION_JSON_MAX_BYTES,
+#   - max_size only counts bytes. The prober reads one byte past the largest
+#     limit (see read_limit), and a body cut off before that is a failure,
+#     since its size is unknown.
+# Matchers are compiled once per worker process (lru_cache on the assertion's
+# definition) and each check only creates a small per-body state object.
+
+MATCHER_CACHE_SIZE = 4096
+
+_JSONPATH_TOKEN = re.compile(r"\.([A-Za-z_][\w-]*)|\[(\d+)\]|\[['\"]([^'\"]+)['\"]\]")
+
+
+class _WindowState:
+    """Searches a text stream, keeping only the last `keep` characters between chunks."""
+
+    def __init__(self, search, keep):
+        self.search = search
+        self.keep = keep
+        self.tail = ''
+
+    def feed(self, chunk, text):
+        window = self.tail + text
+        if self.search(window):
+            return True
+        self.tail = window[-self.keep:] if self.keep else ''
+        return None
+
+    def finish(self, truncated):
+        return False
+
+
+class SubstringMatcher:
+    def __init__(self, text):
+        self.text = text
+
+    def start(self):
+        return _WindowState(lambda window: self.text in window, len(self.text) - 1)
+
+    def describe(self):
+        return f"'{self.text}' not found in body"
+
+
+class RegexMatcher:
+    def __init__(self, pattern):
+        self.regex = re.compile(pattern)
+
+    def start(self):
+        # Matches spanning more than the window (across chunks) are not found.
+        return _WindowState(self.regex.search, settings.ASSERTION_REGEX_WINDOW_BYTES)
+
+    def describe(self):
+        return f"no match for /{self.regex.pattern}/ in body"
+
+
+def _json_equal(value, expected):
+    """JSON equality: true is not 1, "1" is not 1; 1 and 1.0 are the same number."""
+    if isinstance(value, bool) or isinstance(expected, bool):
+        return type(value) is type(expected) and value == expected
+    if isinstance(value, (int, float)) and isinstance(expected, (int, float)):
+        return value == expected
+    if type(value) is not type(expected):
+        return False
+    if isinstance(value, list):
+        return len(value) == len(expected) and all(map(_json_equal, value, expected))
+    if isinstance(value, dict):
+        return value.keys() == expected.keys() and all(_json_equal(value[key], expected[key]) for key in value)
+    return value == expected
+
+
+class _JSONState:
+    def __init__(self, matcher):
+        self.matcher = matcher
+        self.chunks = []
+        self.size = 0
+
+    def feed(self, chunk, text):
+        self.size += len(chunk)
+        if self.size > settings.ASSERTION_JSON_MAX_BYTES:
+            self.chunks = []
+            return False
+        self.chunks.append(chunk)
+        return None
+
+    def finish(self, truncated):
+        try:
+            document = json.loads(b''.join(self.chunks))
+        except ValueError:
+            return False
+        return self.matcher.evaluate(document)
+
+
+class JSONPathMatcher:
+    """A small JSONPath subset: $.key, $['key'], $.list[0] and chains of those."""
+
+    def __init__(self, path, expected_value):
+        self.path = path
+        self.steps = self._parse(path)
+        try:
+            self.expected = json.loads(expected_value)
+        except ValueError:
+            self.expected = expected_value  # Bare text compares as a string
+
+    @staticmethod
+    def _parse(path):
+        if not path.startswith('$'):
+            raise ValueError(f"JSONPath must start with '$': {path}")
+        steps, position = [], 1
+        while position < len(path):
+            match = _JSONPATH_TOKEN.match(path, position)
+            if match is None:
+                raise ValueError(f"Unsupported JSONPath syntax at {path[position:]!r}")
+            key, index, quoted = match.groups()
+            steps.append(int(index) if index is not None else (key if key is not None else quoted))
+            position = match.end()
+        return tuple(steps)
+
+    def evaluate(self, document):
+        value = document
+        for step in self.steps:
+            try:
+                value = value[step]
+            except (KeyError, IndexError, TypeError):
+                return False
+        return _json_equal(value, self.expected)
+
+    def start(self):
+        return _JSONState(self)
+
+    def describe(self):
+        return f"{self.path} != {json.dumps(self.expected)} (or body is not JSON within {settings.ASSERTION_JSON_MAX_BYTES} bytes)"
+
+
+class _SizeState:
+    def __init__(self, limit):
+        self.limit = limit
+        self.size = 0
+
+    def feed(self, chunk, text):
+        self.size += len(chunk)
+        return False if self.size > self.limit else None
+
+    def finish(self, truncated):
+        # Reading stopped before the body ended, so its full size is unknown.
+        return not truncated
+
+
+class MaxSizeMatcher:
+    def __init__(self, limit):
+        self.limit = int(limit)
+
+    def start(self):
+        return _SizeState(self.limit)
+
+    def describe(self):
+        return f"body larger than {self.limit} bytes"
+
+
+class InvalidMatcher:
+    """Stands in for an assertion that does not compile; it always fails."""
+
+    def __init__(self, error):
+        self.error = error
+
+    def start(self):
+        return self
+
+    def feed(self, chunk, text):
+        return False
+
+    def finish(self, truncated):
+        return False
+
+    def describe(self):
+        return f"invalid assertion ({self.error})"
+
+
+@lru_cache(maxsize=MATCHER_CACHE_SIZE)
+def compile_matcher(kind, expression, expected_value=''):
+    """Compiles one assertion definition; cached per worker, so each pattern compiles once."""
+    try:
+        if kind == 'substring':
+            return SubstringMatcher(expression)
+        if kind == 'regex':
+            return RegexMatcher(expression)
+        if kind == 'jsonpath':
+            return JSONPathMatcher(expression, expected_value)
+        if kind == 'max_size':
+            return MaxSizeMatcher(expression)
+        raise ValueError(f"unknown kind '{kind}'")
+    except (ValueError, re.error) as e:
+        logger.warning(f"Invalid {kind} assertion {expression!r}: {e}")
+        return InvalidMatcher(str(e))
+
+
+def read_limit(assertions):
+    """Bytes to read so every max_size assertion can be decided (limit + 1), or None."""
+    limits = [
+        matcher.limit + 1 for matcher in (compile_matcher(*definition) for definition in assertions)
+        if isinstance(matcher, MaxSizeMatcher)
+    ]
+    return max(limits, default=None)
+
+
+class ContentCheck:
+    """Evaluates a target's assertions against one streamed body."""
+
+    def __init__(self, assertions):
+        # assertions: (kind, expression, expected_value) tuples, as carried by probe targets.
+        self.pending = []
+        for definition in assertions:
+            matcher = compile_matcher(*definition)
+            self.pending.append((matcher, matcher.start()))
+        self.failure = None
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+    @property
+    def done(self):
+        """True once the outcome is known and the rest of the body need not be read."""
+        return self.failure is not None or not self.pending
+
+    def feed(self, chunk):
+        text = self._decoder.decode(chunk)
+        still_pending = []
+        for matcher, state in self.pending:
+            outcome = state.feed(chunk, text)
+            if outcome is False:
+                self.failure = matcher.describe()
+                return
+            if outcome is None:
+                still_pending.append((matcher, state))
+        self.pending = still_pending
+
+    def finish(self, truncated=False):
+        """Returns (passed, failure message) once the body has ended or reading stopped."""
+        if self.failure is None:
+            for matcher, state in self.pending:
+                if not state.finish(truncated):
+                    self.failure = matcher.describe()
+                    if truncated:
+                        self.failure += " (body read was capped)"
+                    break
+        return self.failure is None, self.failure
@@ -0,0 +1,124 @@
+from django.conf import settings
+from django.core.cache import cache
+
+# =================================================================
+# Confirmation Policy and Flap Detection
+# =================================================================
+# A single failed probe no longer flips a site DOWN. Each site keeps a small
+# ring buffer of its recent raw outcomes in the cache (one bit per check), and
+# its confirmed state only changes once CONFIRM_FAILURES of the last
+# CONFIRM_WINDOW checks agree (N-of-M, both directions). Only checks since the
+# last confirmed change count, so the outcomes that confirmed a DOWN cannot
+# also confirm the next UP (and vice versa). While the latest
+# outcome disagrees with the confirmed state, the site is re-probed after
+# CONFIRM_RETRY_SECONDS, up to CONFIRM_RETRIES times, so confirmation takes
+# seconds rather than several check intervals.
+#
+# Flapping: when the raw outcome changed at least FLAP_THRESHOLD times in the
+# last FLAP_WINDOW checks, one FLAPPING alert is sent and further transitions
+# are dampened; once it settles (changes <= FLAP_THRESHOLD // 2) the current
+# state is alerted if it differs from the last one alerted.
+#
+# The state is a tuple so it stays small in the cache; if it is evicted the
+# site restarts from its stored Website.is_up with an empty history.
+
+CACHE_KEY = 'site-state:v2:{}'  # v2 added SiteState.since
+CACHE_TIMEOUT = 7 * 24 * 3600
+
+
+class SiteState:
+    __slots__ = ('failures', 'flips', 'count', 'since', 'is_up', 'alerted_up', 'flapping', 'retries')
+
+    def __init__(self, is_up, failures=0, flips=0, count=0, since=0, alerted_up=None, flapping=False, retries=0):
+        self.failures = failures  # Bit i set = the i-th most recent check failed
+        self.flips = flips  # Bit i set = the i-th most recent check changed the raw outcome
+        self.count = count  # Checks recorded (capped at the ring size)
+        self.since = since  # Checks since the last confirmed change (capped at CONFIRM_WINDOW)
+        self.is_up = is_up  # Confirmed state
+        self.alerted_up = is_up if alerted_up is None else alerted_up
+        self.flapping = flapping
+        self.retries = retries  # Fast re-probes spent on the current disagreement
+
+    def to_tuple(self):
+        return (
+            self.failures, self.flips, self.count, self.since, self.is_up, self.alerted_up, self.flapping,
+            self.retries,
+        )
+
+    @classmethod
+    def from_tuple(cls, data):
+        failures, flips, count, since, is_up, alerted_up, flapping, retries = data
+        return cls(is_up, failures, flips, count, since, alerted_up, flapping, retries)
+
+
+def _ring_size():
+    return max(settings.CONFIRM_WINDOW, settings.FLAP_WINDOW)
+
+
+def load_states(websites):
+    """SiteState per website id, from the cache in one round trip."""
+    cached = cache.get_many([CACHE_KEY.format(website.id) for website in websites])
+    states = {}
+    for website in websites:
+        data = cached.get(CACHE_KEY.format(website.id))
+        states[website.id] = SiteState.from_tuple(data) if data else SiteState(website.is_up)
+    return states
+
+
+def save_states(states):
+    cache.set_many(
+        {CACHE_KEY.format(website_id): state.to_tuple() for website_id, state in states.items()},
+        timeout=CACHE_TIMEOUT,
+    )
+
+
+def record_outcome(state, is_up):
+    """Adds one raw check outcome to the state.
+
+    Returns (alert, retry): alert is 'UP', 'DOWN', 'FLAPPING' or None, and
+    retry says whether the site should be re-probed soon to confirm.
+    """
+    ring_mask = (1 << _ring_size()) - 1
+    failed = 0 if is_up else 1
+    changed = 1 if state.count and (state.failures & 1) != failed else 0
+    state.failures = ((state.failures << 1) | failed) & ring_mask
+    state.flips = ((state.flips << 1) | changed) & ((1 << settings.FLAP_WINDOW) - 1)
+    state.count = min(state.count + 1, _ring_size())
+    state.since = min(state.since + 1, settings.CONFIRM_WINDOW)
+
+    window = state.since
+    recent_failures = bin(state.failures & ((1 << window) - 1)).count('1')
+    needed = settings.CONFIRM_FAILURES
+    confirmed_change = (
+        (state.is_up and recent_failures >= needed)
+        or (not state.is_up and window - recent_failures >= needed)
+    )
+
+    alert = None
+    flip_count = bin(state.flips).count('1')
+    started_flapping = not state.flapping and flip_count >= settings.FLAP_THRESHOLD
+    if started_flapping:
+        state.flapping = True
+        alert = 'FLAPPING'
+
+    if confirmed_change:
+        state.is_up = not state.is_up
+        state.retries = 0
+        state.since = 0
+        if not state.flapping:
+            alert = 'UP' if state.is_up else 'DOWN'
+            state.alerted_up = state.is_up
+
+    if state.flapping and not started_flapping and flip_count <= settings.FLAP_THRESHOLD // 2:
+        state.flapping = False
+        if state.is_up != state.alerted_up:
+            alert = 'UP' if state.is_up else 'DOWN'
+            state.alerted_up = state.is_up
+
+    retry = False
+    if is_up != state.is_up and state.retries < settings.CONFIRM_RETRIES:
+        state.retries += 1
+        retry = True
+    elif is_up == state.is_up:
+        state.retries = 0
+    return alert, retry
@@ -1,38 +1,39 @@
-import json
-from channels.generic.websocket import WebsocketConsumer
-from asgiref.sync import async_to_sync
-
-class LiveDashboardConsumer(WebsocketConsumer):
-    # This is the name of the group that all dashboard browsers will join
-    DASHBOARD_GROUP_NAME = 'dashboard_updates'
-
-    def connect(self):
-        # When a browser connects, accept the connection
-        self.accept()
-        
-        # Add the connection to the group to receive broadcasts
-        async_to_sync(self.channel_layer.group_add)(
-            self.DASHBOARD_GROUP_NAME,
-            self.channel_name
-        )
-        
-        # Send an initial connection status
-        self.send(text_data=json.dumps({
-            'type': 'status',
-            'message': 'Real-time feed connected.',
-        }))
-
-    def disconnect(self, close_code):
-        # Remove the connection from the group when disconnected
-        async_to_sync(self.channel_layer.group_discard)(
-            self.DASHBOARD_GROUP_NAME,
-            self.channel_name
-        )
-
-    # Handler for messages sent to the group from Django views
-    def send_dashboard_update(self, event):
-        # Send the actual data payload to the WebSocket
-        self.send(text_data=json.dumps(event['data']))
-
-    # We generally don't need a receive method for a monitoring dashboard, 
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
+
+from .livefeed import user_group
+from .snapshots import snapshot_message
+
+
+class LiveDashboardConsumer(AsyncWebsocketConsumer):
+    """Streams a user's site states: one snapshot on connect, then the coalesced deltas.
+
+    Runs on the event loop (no thread per socket); group messages arrive
+    already JSON-encoded by monitor.livefeed and are forwarded as-is.
+    """
+    group_name = None
+
+    async def connect(self):
+        # AuthMiddlewareStack has already resolved the session user
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close()
+            return
+
+        await self.accept()
+
+        # Join before reading the snapshot, so no delta published in between is lost
+        self.group_name = user_group(user.id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.send(text_data=await database_sync_to_async(snapshot_message)(user.id))
+
+    async def disconnect(self, close_code):
+        if self.group_name:
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    # Handler for the coalesced deltas published by monitor.livefeed
+    async def send_dashboard_update(self, event):
+        await self.send(text_data=event['text'])
+
+    # We generally don't need a receive method for a monitoring dashboard,
     # as the server is pushing updates.
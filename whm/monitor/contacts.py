@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import AlertContact
+
+# =================================================================
+# Cached Alert Contacts
+# =================================================================
+# Every status change used to query AlertContact for the site's user, so an
+# incident touching thousands of sites ran thousands of identical queries.
+# The active contacts of a user are cached as (id, email, phone_number)
+# tuples. monitor.signals drops the entry (and the previous owner's, when a
+# contact moves to another user) once a save or delete of an AlertContact
+# commits; CONTACT_CACHE_SECONDS bounds staleness after queryset
+# .update()/.delete() calls, which send no per-row signals.
+
+CACHE_KEY = 'user-contacts:{}'
+
+
+def invalidate_contacts(user_id):
+    cache.delete(CACHE_KEY.format(user_id))
+
+
+def active_contacts_many(user_ids):
+    """{user_id: [(contact_id, email, phone_number), ...]}: one cache round trip, one query for misses."""
+    keys = {user_id: CACHE_KEY.format(user_id) for user_id in set(user_ids)}
+    cached = cache.get_many(list(keys.values()))
+    contacts = {user_id: cached[key] for user_id, key in keys.items() if key in cached}
+
+    missing = set(keys) - set(contacts)
+    if missing:
+        for user_id in missing:
+            contacts[user_id] = []
+        rows = AlertContact.objects.filter(user_id__in=missing, is_active=True).order_by('pk')
+        for contact_id, user_id, email, phone_number in rows.values_list('pk', 'user_id', 'email', 'phone_number'):
+            contacts[user_id].append((contact_id, email, phone_number))
+        cache.set_many(
+            {keys[user_id]: contacts[user_id] for user_id in missing},
+            timeout=settings.CONTACT_CACHE_SECONDS,
+        )
+    return contacts
+
+
+def active_contacts(user_id):
+    return active_contacts_many([user_id])[user_id]
@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import socket
+import time
+from collections import OrderedDict
+
+try:
+    import dns.asyncresolver
+    import dns.exception
+    import dns.resolver
+except ImportError:  # dnspython is optional; without it TTLs fall back to DNS_CACHE_DEFAULT_TTL
+    dns = None
+
+logger = logging.getLogger(__name__)
+
+# =================================================================
+# In-Process DNS Cache for the Prober
+# =================================================================
+# Thousands of probes a minute would otherwise send thousands of lookups to
+# the system resolver. Answers are cached per worker for their record TTL
+# (clamped to [min_ttl, max_ttl]), failures are cached for negative_ttl, the
+# cache is LRU-bounded, and concurrent lookups of the same host share one
+# in-flight query. With dnspython installed, record TTLs come from the DNS
+# answer; otherwise getaddrinfo is used with a fixed default TTL.
+
+
+class DNSLookupError(OSError):
+    """Raised for a failed (or negatively cached) resolution."""
+
+
+class DNSCache:
+    def __init__(self, max_size=10000, default_ttl=60, min_ttl=5, max_ttl=3600, negative_ttl=30):
+        self.max_size = max_size
+        self.default_ttl = default_ttl
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.negative_ttl = negative_ttl
+        self._entries = OrderedDict()  # host -> (expires_at, addresses or None, error message)
+        self._inflight = {}
+        self._resolver = None
+        if dns is not None:
+            try:
+                self._resolver = dns.asyncresolver.Resolver()
+            except dns.exception.DNSException as e:
+                logger.warning(f"dnspython resolver unavailable ({e}); using getaddrinfo without TTLs.")
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.evictions = 0
+
+    def stats(self):
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'negative_hits': self.negative_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': round((self.hits + self.negative_hits) / lookups, 3) if lookups else None,
+        }
+
+    def _store(self, host, ttl, addresses, error=None):
+        ttl = min(max(ttl, self.min_ttl), self.max_ttl)
+        self._entries[host] = (time.monotonic() + ttl, addresses, error)
+        self._entries.move_to_end(host)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def peek(self, host):
+        """The cached addresses for `host` if present and fresh, without counting a lookup."""
+        entry = self._entries.get(host)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+        return None
+
+    async def resolve(self, host, port, fresh=False):
+        """Returns the addresses for `host`, from cache unless `fresh` is set."""
+        if not fresh:
+            entry = self._entries.get(host)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(host)
+                if entry[1] is None:
+                    self.negative_hits += 1
+                    raise DNSLookupError(entry[2])
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+            # Coalesce concurrent misses for the same host into one query.
+            if host in self._inflight:
+                return await asyncio.shield(self._inflight[host])
+            future = asyncio.ensure_future(self._lookup(host, port))
+            self._inflight[host] = future
+            try:
+                return await asyncio.shield(future)
+            finally:
+                self._inflight.pop(host, None)
+
+        return await self._lookup(host, port)
+
+    async def _lookup(self, host, port):
+        try:
+            try:
+                if self._resolver is None:
+                    raise DNSLookupError(host)
+                addresses, ttl = await self._query(host)
+            except DNSLookupError:
+                # getaddrinfo also covers /etc/hosts names (e.g. localhost) that DNS does not know.
+                infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+                addresses, ttl = list(dict.fromkeys(info[4][0] for info in infos)), self.default_ttl
+        except OSError as e:
+            self._store(host, self.negative_ttl, None, str(e))
+            raise DNSLookupError(str(e)) from e
+
+        self._store(host, ttl, addresses)
+        return addresses
+
+    async def _query(self, host):
+        """A records first, then AAAA; returns (addresses, ttl of the answer)."""
+        for rdtype in ('A', 'AAAA'):
+            try:
+                answer = await self._resolver.resolve(host, rdtype)
+            except dns.resolver.NoAnswer:
+                continue
+            except dns.resolver.NXDOMAIN:
+                raise DNSLookupError(f"{host}: no such domain")
+            except dns.exception.DNSException as e:
+                raise DNSLookupError(f"{host}: {e.__class__.__name__}") from e
+            return [rdata.address for rdata in answer], answer.rrset.ttl
+        raise DNSLookupError(f"{host}: no A or AAAA records")
@@ -0,0 +1,161 @@
+import asyncio
+import itertools
+import json
+import logging
+import random
+import time
+from urllib.parse import parse_qs
+
+logger = logging.getLogger(__name__)
+
+# =================================================================
+# Fake SMTP and Twilio Servers for Local Load Testing
+# =================================================================
+# Stand-ins for the alert providers, so notification throughput can be
+# measured without sending real mail or SMS. Both servers can add latency
+# and fail a share of requests with temporary errors, and the Twilio one can
+# answer 429 above a per-second rate the way the real API does. Start them
+# with `python manage.py run_fake_providers`, then point the app at them:
+#   EMAIL_HOST=127.0.0.1 EMAIL_PORT=2525 EMAIL_USE_TLS=False
+#   TWILIO_API_BASE_URL=http://127.0.0.1:8099
+
+
+class ProviderStats:
+    def __init__(self):
+        self.accepted = 0
+        self.failed = 0
+        self.throttled = 0
+
+    def __str__(self):
+        return f"accepted={self.accepted} failed={self.failed} throttled={self.throttled}"
+
+
+class FakeSMTPServer:
+    """Just enough SMTP (no TLS, no AUTH) for Django's SMTP backend."""
+
+    def __init__(self, latency_ms=0, failure_rate=0.0):
+        self.latency = latency_ms / 1000
+        self.failure_rate = failure_rate
+        self.stats = ProviderStats()
+
+    async def handle(self, reader, writer):
+        async def reply(line):
+            writer.write(line.encode() + b'\r\n')
+            await writer.drain()
+
+        await reply('220 fake-smtp ESMTP ready')
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line.decode(errors='replace').strip().upper()
+                if command.startswith(('EHLO', 'HELO')):
+                    await reply('250-fake-smtp\r\n250 8BITMIME')
+                elif command.startswith('DATA'):
+                    await reply('354 End data with <CR><LF>.<CR><LF>')
+                    while (await reader.readline()) not in (b'.\r\n', b'.\n', b''):
+                        pass
+                    await asyncio.sleep(self.latency)
+                    if random.random() < self.failure_rate:
+                        self.stats.failed += 1
+                        await reply('451 4.3.0 Temporary failure, try again later')
+                    else:
+                        self.stats.accepted += 1
+                        await reply('250 2.0.0 OK queued')
+                elif command.startswith('QUIT'):
+                    await reply('221 2.0.0 Bye')
+                    break
+                else:  # MAIL FROM, RCPT TO, RSET, NOOP
+                    await reply('250 2.0.0 OK')
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+class FakeTwilioServer:
+    """Accepts POST .../Messages.json like the Twilio REST API, over keep-alive HTTP/1.1."""
+
+    def __init__(self, latency_ms=0, failure_rate=0.0, rate_per_second=None):
+        self.latency = latency_ms / 1000
+        self.failure_rate = failure_rate
+        self.rate_per_second = rate_per_second
+        self.stats = ProviderStats()
+        self._ids = itertools.count(1)
+        self._window = (0, 0)  # (second, requests in that second)
+
+    def _throttled(self):
+        if not self.rate_per_second:
+            return False
+        second = int(time.monotonic())
+        start, count = self._window
+        count = count + 1 if start == second else 1
+        self._window = (second, count)
+        return count > self.rate_per_second
+
+    async def _respond(self, path, body):
+        await asyncio.sleep(self.latency)
+        if not path.endswith('/Messages.json'):
+            return 404, {'code': 20404, 'message': 'Not found', 'status': 404}
+        if self._throttled():
+            self.stats.throttled += 1
+            return 429, {'code': 20429, 'message': 'Too Many Requests', 'status': 429}
+        if random.random() < self.failure_rate:
+            self.stats.failed += 1
+            return 503, {'code': 20503, 'message': 'Service unavailable', 'status': 503}
+
+        self.stats.accepted += 1
+        form = {key: values[0] for key, values in parse_qs(body.decode()).items()}
+        return 201, {
+            'sid': f"SM{next(self._ids):032x}",
+            'status': 'queued',
+            'to': form.get('To'),
+            'from': form.get('From'),
+            'body': form.get('Body'),
+        }
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                _, path, _ = request_line.decode().split(' ', 2)
+                headers = {}
+                while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    name, _, value = line.decode().partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+                status, payload = await self._respond(path, body)
+                data = json.dumps(payload).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} Fake\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(host='127.0.0.1', smtp_port=2525, twilio_port=8099, report_every=10, report=logger.info, **options):
+    """Runs both fake servers until cancelled, reporting their counters periodically."""
+    smtp = FakeSMTPServer(options.get('latency_ms', 0), options.get('failure_rate', 0.0))
+    twilio = FakeTwilioServer(
+        options.get('latency_ms', 0), options.get('failure_rate', 0.0), options.get('sms_rate'),
+    )
+    servers = [
+        await asyncio.start_server(smtp.handle, host, smtp_port),
+        await asyncio.start_server(twilio.handle, host, twilio_port),
+    ]
+    report(f"Fake SMTP on {host}:{smtp_port}, fake Twilio on http://{host}:{twilio_port}")
+    try:
+        while True:
+            await asyncio.sleep(report_every)
+            report(f"Fake SMTP: {smtp.stats} | Fake Twilio: {twilio.stats}")
+    finally:
+        for server in servers:
+            server.close()
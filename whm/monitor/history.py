@@ -0,0 +1,202 @@
+import base64
+import re
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .latency import has_latency
+from .models import CheckResult, CheckRollup, RollupWatermark
+from .rollups import BUCKET_SIZES, WATERMARK_NAME, _weighted_percentile, bucket_start, percentile
+
+# =================================================================
+# Check History Queries (Keyset Pagination)
+# =================================================================
+# Pages are addressed by an opaque cursor holding the position of the last
+# row returned, never by OFFSET: the next page is "rows older than
+# (timestamp, id)", an index seek on (website, timestamp), so page 10,000 of
+# a year of history costs the same as page 1.
+#
+# Downsampled history (?bucket=5m, 1h, 1d, ...) is aggregated from the
+# rollups of the largest resolution that divides the bucket. Rows newer than
+# the rollup watermark (not aggregated yet), or all rows when no rollups
+# exist, are aggregated from raw CheckResult rows instead. A bucketed page
+# spans `limit` buckets of time and skips over gaps in the history.
+
+BUCKET_PATTERN = re.compile(r'^(\d+)([mhd])$')
+UNIT_SECONDS = {'m': 60, 'h': 3600, 'd': 86400}
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+MAX_BUCKET = timedelta(days=5 * 366)
+
+
+def parse_time(value):
+    """Aware datetime from an ISO-8601 query parameter (naive values are UTC), or None."""
+    if not value:
+        return None
+    moment = parse_datetime(value)
+    if moment is None:
+        raise ValueError(f"Invalid datetime: {value!r}. Use ISO-8601, e.g. 2024-05-01T00:00:00Z.")
+    return moment if timezone.is_aware(moment) else moment.replace(tzinfo=dt_timezone.utc)
+
+
+def parse_bucket(value):
+    """(bucket size, rollup resolution to aggregate from) for values like '5m', '6h', '1d'."""
+    match = BUCKET_PATTERN.match(value or '')
+    if not match or int(match.group(1)) < 1:
+        raise ValueError(f"Invalid bucket: {value!r}. Use a number of minutes, hours or days, e.g. 5m, 1h, 1d.")
+    count, unit = int(match.group(1)), match.group(2)
+    if count * UNIT_SECONDS[unit] > MAX_BUCKET.total_seconds():
+        raise ValueError(f"Invalid bucket: {value!r}. Buckets can span at most {MAX_BUCKET.days} days.")
+    return timedelta(seconds=count * UNIT_SECONDS[unit]), f'1{unit}'
+
+
+def encode_cursor(moment, row_id=None):
+    raw = moment.isoformat() if row_id is None else f"{moment.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(datetime, row id or None) from a cursor returned by a previous page."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        stamp, _, row_id = raw.partition('|')
+        return datetime.fromisoformat(stamp), int(row_id) if row_id else None
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor.") from e
+
+
+def raw_page(website_id, fields, start=None, end=None, cursor=None, limit=100):
+    """One page of CheckResult rows (dicts of `fields`), newest first; returns (rows, next cursor)."""
+    queryset = CheckResult.objects.filter(website_id=website_id)
+    if start:
+        queryset = queryset.filter(timestamp__gte=start)
+    if end:
+        queryset = queryset.filter(timestamp__lt=end)
+    if cursor:
+        moment, row_id = decode_cursor(cursor)
+        if row_id is None:
+            raise ValueError("Invalid cursor.")
+        queryset = queryset.filter(Q(timestamp__lt=moment) | Q(timestamp=moment, id__lt=row_id))
+
+    columns = list(dict.fromkeys((*fields, 'id', 'timestamp')))
+    rows = list(queryset.order_by('-timestamp', '-id').values(*columns)[:limit + 1])
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1]['timestamp'], rows[-1]['id'])
+
+
+def _align(moment, size):
+    """Start of the epoch-aligned bucket of `size` containing `moment`."""
+    return EPOCH + ((moment - EPOCH) // size) * size
+
+
+def _rolled_up_until():
+    """Timestamp of the newest CheckResult folded into the rollups, or None."""
+    return RollupWatermark.objects.filter(name=WATERMARK_NAME).values_list('last_timestamp', flat=True).first()
+
+
+def _rollup_parts(website_id, resolution, lo, hi, size):
+    """{bucket start: [part, ...]} from rollups; a part is (checks, up, samples, min, max, avg, p95)."""
+    parts = defaultdict(list)
+    rows = CheckRollup.objects.filter(
+        website_id=website_id, resolution=resolution, bucket_start__gte=lo, bucket_start__lt=hi,
+    ).values_list(
+        'bucket_start', 'check_count', 'up_count', 'latency_samples',
+        'min_response_ms', 'max_response_ms', 'avg_response_ms', 'p95_response_ms',
+    )
+    for start, *part in rows.iterator(chunk_size=5000):
+        parts[_align(start, size)].append(tuple(part))
+    return parts
+
+
+def _raw_parts(website_id, lo, hi, size):
+    """Same as _rollup_parts, computed from raw CheckResult rows."""
+    grouped = defaultdict(list)
+    rows = CheckResult.objects.filter(
+        website_id=website_id, timestamp__gte=lo, timestamp__lt=hi,
+    ).values_list('timestamp', 'is_up', 'status_code', 'response_time_ms')
+    for timestamp, is_up, status_code, response_time_ms in rows.iterator(chunk_size=5000):
+        grouped[_align(timestamp, size)].append((is_up, status_code, response_time_ms))
+
+    parts = defaultdict(list)
+    for start, checks in grouped.items():
+        latencies = sorted(rt for _, code, rt in checks if has_latency(code, rt))
+        parts[start].append((
+            len(checks),
+            sum(1 for is_up, _, _ in checks if is_up),
+            len(latencies),
+            latencies[0] if latencies else None,
+            latencies[-1] if latencies else None,
+            sum(latencies) / len(latencies) if latencies else None,
+            percentile(latencies, 0.95),
+        ))
+    return parts
+
+
+def _bucket(start, parts):
+    checks = sum(part[0] for part in parts)
+    up = sum(part[1] for part in parts)
+    timed = [part for part in parts if part[2]]
+    samples = sum(part[2] for part in timed)
+    return {
+        'bucket_start': start,
+        'checks': checks,
+        'up_checks': up,
+        'uptime_pct': round(100.0 * up / checks, 3) if checks else None,
+        'avg_response_ms': sum(part[5] * part[2] for part in timed) / samples if samples else None,
+        'min_response_ms': min((part[3] for part in timed), default=None),
+        'max_response_ms': max((part[4] for part in timed), default=None),
+        'p95_response_ms': _weighted_percentile([(part[6], part[2]) for part in timed], 0.95),
+    }
+
+
+def _older_than(website_id, resolution, moment):
+    """Timestamp of the newest data (rollup or raw) before `moment`, or None."""
+    candidates = [
+        CheckRollup.objects.filter(website_id=website_id, resolution=resolution, bucket_start__lt=moment)
+        .order_by('-bucket_start').values_list('bucket_start', flat=True).first(),
+        CheckResult.objects.filter(website_id=website_id, timestamp__lt=moment)
+        .order_by('-timestamp').values_list('timestamp', flat=True).first(),
+    ]
+    return max((candidate for candidate in candidates if candidate is not None), default=None)
+
+
+def bucket_page(website_id, bucket, start=None, end=None, cursor=None, limit=100):
+    """One page of downsampled history, newest bucket first; returns (buckets, next cursor).
+
+    Empty buckets are omitted. Rollup buckets are taken whole, so a 1d
+    aggregate near `start`/`end` may include checks just outside the range.
+    """
+    size, resolution = parse_bucket(bucket)
+    end = end or timezone.now()
+    hi = decode_cursor(cursor)[0] if cursor else _align(end - timedelta(microseconds=1), size) + size
+    try:
+        lo = max(hi - size * limit, EPOCH)  # Both are bucket boundaries
+    except OverflowError:  # Pages reaching back past year 1
+        lo = EPOCH
+    if start:
+        lo = max(lo, _align(start, size))
+    data_lo, data_hi = max(lo, start) if start else lo, min(hi, end)
+
+    # Base buckets from the one holding the rollup watermark onwards are not complete yet.
+    rolled_up_until = _rolled_up_until()
+    cut = bucket_start(rolled_up_until, resolution) if rolled_up_until else data_lo
+    parts = defaultdict(list)
+    if data_lo < min(data_hi, cut):
+        for key, values in _rollup_parts(website_id, resolution, data_lo, min(data_hi, cut), size).items():
+            parts[key].extend(values)
+    if max(data_lo, cut) < data_hi:
+        for key, values in _raw_parts(website_id, max(data_lo, cut), data_hi, size).items():
+            parts[key].extend(values)
+    buckets = [_bucket(key, parts[key]) for key in sorted(parts, reverse=True)]
+
+    next_cursor = None
+    if not start or lo > start:
+        older = _older_than(website_id, resolution, lo)
+        if older is not None and (not start or older >= start - BUCKET_SIZES[resolution]):
+            # Jump straight to the next bucket that has data.
+            next_cursor = encode_cursor(min(_align(older, size) + size, lo))
+    return buckets, next_cursor
@@ -0,0 +1,423 @@
+import asyncio
+import ipaddress
+import logging
+import time
+from collections import defaultdict
+from datetime import timedelta
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Incident, IncidentSite
+
+try:
+    import dns.asyncresolver
+    import dns.exception
+    import dns.resolver
+except ImportError:  # dnspython is optional; without it sites are not correlated by DNS provider
+    dns = None
+
+try:
+    from publicsuffixlist import PublicSuffixList
+except ImportError:  # optional; without it a provider is named by its nameserver minus the first label
+    PublicSuffixList = None
+
+logger = logging.getLogger(__name__)
+
+# =================================================================
+# Incident Engine: Alert Storm Suppression and Grouping
+# =================================================================
+# When a CDN, DNS provider or our own network fails, hundreds of sites flip
+# DOWN together. Instead of alerting per site, DOWN transitions are attached
+# to an incident correlated by shared host, IP address or DNS provider.
+# Incidents stay 'pending' for INCIDENT_GROUP_WAIT_SECONDS to collect the rest
+# of the storm; notify_due_incidents then merges duplicates (and, when
+# INCIDENT_STORM_MIN_INCIDENTS or more are due at once, everything due, as a
+# time-window correlation) and emits one notification per user per incident.
+# Sites only join incidents opened within INCIDENT_CORRELATION_WINDOW_SECONDS;
+# a site joining an incident that was already notified is alerted on its own.
+# Flaps of member sites are suppressed, and each user gets one grouped
+# recovery as soon as all of their member sites are back UP. Incidents that
+# recover before being notified never alert at all.
+#
+# DNS providers are looked up before any rows are locked, concurrently with
+# dnspython's async resolver under one overall INCIDENT_NS_LOOKUP_TIMEOUT per
+# batch. Answers are cached for their TTL (at most INCIDENT_NS_CACHE_SECONDS);
+# failures are not cached, so a DNS outage costs at most one timeout per
+# batch and is retried on the next one.
+#
+# Functions here return notifications as (user_id, name, status, message)
+# tuples; monitor.tasks delivers them through the alert queues.
+
+ACTIVE_STATUSES = ('pending', 'open')
+MAX_LISTED_SITES = 10
+PROVIDER_CACHE_SIZE = 4096
+
+_provider_cache = {}  # host -> (expires at, provider), oldest first
+
+
+def _is_ip(host):
+    try:
+        ipaddress.ip_address(host)
+        return True
+    except ValueError:
+        return False
+
+
+@lru_cache(maxsize=1)
+def _public_suffixes():
+    return PublicSuffixList() if PublicSuffixList is not None else None
+
+
+def provider_name(nameserver):
+    """Registered domain of a nameserver: 'host.co.uk' for 'ns1.host.co.uk'."""
+    name = nameserver.rstrip('.').lower()
+    suffixes = _public_suffixes()
+    if suffixes is not None:
+        return suffixes.privatesuffix(name) or name
+    labels = name.split('.')
+    return '.'.join(labels[1:]) if len(labels) > 2 else name
+
+
+def _zone_candidates(host):
+    """The host and its parents, closest first, down to its registered domain (never a public suffix)."""
+    labels = host.rstrip('.').lower().split('.')
+    suffixes = _public_suffixes()
+    registered = suffixes.privatesuffix('.'.join(labels)) if suffixes is not None else None
+    names = []
+    for i in range(len(labels) - 1):
+        names.append('.'.join(labels[i:]))
+        if names[-1] == registered:
+            break
+    return names
+
+
+async def _lookup_provider(resolver, host):
+    """(provider, ttl) from the NS records of the closest zone above `host`; (None, 0) if none."""
+    for name in _zone_candidates(host):
+        try:
+            answer = await resolver.resolve(name, 'NS')
+        except (dns.resolver.NoAnswer, dns.resolver.NXDOMAIN):
+            continue
+        providers = sorted({provider_name(str(rdata.target)) for rdata in answer})
+        return ','.join(providers), answer.rrset.ttl
+    return None, 0
+
+
+async def _lookup_providers(hosts):
+    timeout = settings.INCIDENT_NS_LOOKUP_TIMEOUT
+    try:
+        resolver = dns.asyncresolver.Resolver()
+    except dns.exception.DNSException as e:
+        logger.warning(f"No DNS resolver for provider lookups: {e}")
+        return {}
+    resolver.lifetime = timeout
+    tasks = [asyncio.ensure_future(_lookup_provider(resolver, host)) for host in hosts]
+    done, pending = await asyncio.wait(tasks, timeout=timeout)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+
+    providers = {}
+    for host, task in zip(hosts, tasks):
+        if task not in done or task.exception() is not None:
+            logger.debug(f"NS lookup for {host} failed: {'timeout' if task not in done else task.exception()}")
+            continue
+        provider, ttl = task.result()
+        providers[host] = provider
+        if provider:
+            _remember_provider(host, provider, min(ttl, settings.INCIDENT_NS_CACHE_SECONDS))
+    return providers
+
+
+def _remember_provider(host, provider, ttl):
+    _provider_cache.pop(host, None)
+    _provider_cache[host] = (time.monotonic() + ttl, provider)
+    while len(_provider_cache) > PROVIDER_CACHE_SIZE:
+        del _provider_cache[next(iter(_provider_cache))]
+
+
+def dns_providers(hosts):
+    """{host: registered domain(s) of its authoritative nameservers (e.g. 'cloudflare.com') or None}.
+
+    Uncached hosts are looked up concurrently, all within
+    INCIDENT_NS_LOOKUP_TIMEOUT; a failed or late lookup gives None.
+    Must not be called while holding row locks.
+    """
+    now = time.monotonic()
+    providers, missing = {}, []
+    for host in set(hosts):
+        providers[host] = None
+        if not host or _is_ip(host):
+            continue
+        entry = _provider_cache.get(host)
+        if entry is not None and entry[0] > now:
+            providers[host] = entry[1]
+        else:
+            missing.append(host)
+    if missing and dns is not None:
+        providers.update(asyncio.run(_lookup_providers(missing)))
+    return providers
+
+
+def site_host(url):
+    return urlsplit(url).hostname or ''
+
+
+def correlation_keys(url, remote_ip=None, providers=None):
+    """(host, ip_address, dns_provider) used to match a failing site to an incident.
+
+    `providers` is the result of dns_providers() for the batch.
+    """
+    host = site_host(url)
+    ip = host if _is_ip(host) else remote_ip
+    return host, ip, (providers or {}).get(host)
+
+
+def _match(incidents, host, ip, provider):
+    """The first active incident sharing a key with the site, and which key matched."""
+    for incident in incidents:
+        if host and incident.host == host:
+            return incident, 'host'
+        if ip and incident.ip_address == ip:
+            return incident, 'ip'
+        if provider and incident.dns_provider == provider:
+            return incident, 'dns'
+    return None, None
+
+
+def _site_names(members):
+    names = [member.website.name for member in members[:MAX_LISTED_SITES]]
+    if len(members) > MAX_LISTED_SITES:
+        names.append(f"and {len(members) - MAX_LISTED_SITES} more")
+    return ', '.join(names)
+
+
+def describe(incident):
+    if incident.correlation == 'dns':
+        return f"shared DNS provider {incident.dns_provider}"
+    if incident.correlation == 'ip':
+        return f"shared IP {incident.ip_address}"
+    if incident.correlation == 'host':
+        return f"shared host {incident.host}"
+    if incident.correlation == 'window':
+        return "simultaneous failures"
+    return "single site"
+
+
+def _notifications(incident, members, status):
+    """One notification per user: the plain per-site alert for one site, a grouped one otherwise."""
+    by_user = defaultdict(list)
+    for member in members:
+        by_user[member.website.user_id].append(member)
+
+    notifications = []
+    for user_id, user_members in by_user.items():
+        if len(user_members) == 1:
+            member = user_members[0]
+            if status == 'DOWN':
+                message = member.error_message or "Connection failed"
+            else:
+                message = "Recovery: The website is back online."
+            notifications.append((user_id, member.website.name, status, message))
+            continue
+        name = f"{len(user_members)} sites (incident #{incident.pk})"
+        if status == 'DOWN':
+            message = f"{_site_names(user_members)}. Likely cause: {describe(incident)}."
+        else:
+            message = f"Recovery: {_site_names(user_members)} are back online."
+        notifications.append((user_id, name, status, message))
+    _count_suppressed(incident, len(members) - len(notifications))
+    return notifications
+
+
+def _count_suppressed(incident, count):
+    if count:
+        Incident.objects.filter(pk=incident.pk).update(alerts_suppressed=F('alerts_suppressed') + count)
+
+
+def _recoveries(incident, user_ids=None):
+    """Recovery notifications for users whose notified sites in the incident are all back UP."""
+    members = incident.members.filter(notified=True, recovery_notified=False)
+    if user_ids is not None:
+        members = members.filter(website__user_id__in=user_ids)
+    still_down = set(
+        incident.members.filter(recovered_at__isnull=True).values_list('website__user_id', flat=True)
+    )
+    recovered = [
+        member for member in members.select_related('website') if member.website.user_id not in still_down
+    ]
+    if not recovered:
+        return []
+    IncidentSite.objects.filter(pk__in=[member.pk for member in recovered]).update(recovery_notified=True)
+    return _notifications(incident, recovered, 'UP')
+
+
+def _resolve(incident, now):
+    incident.status = 'resolved'
+    incident.resolved_at = now
+    notifications = []
+    if incident.notified_at is not None:
+        notifications = _recoveries(incident)
+    else:
+        logger.info(f"Incident #{incident.pk} recovered before notification; no alerts sent.")
+    incident.save(update_fields=['status', 'resolved_at'])
+    return notifications
+
+
+def handle_transitions(transitions, now=None):
+    """Attaches status changes to incidents; returns the notifications to send right away.
+
+    `transitions` are dicts with 'website', 'status' ('UP'/'DOWN'), 'message'
+    and optionally 'remote_ip'.
+    """
+    now = now or timezone.now()
+    notifications = []
+    # Resolved before taking any locks: lookups can be slow while DNS itself is failing.
+    providers = dns_providers(
+        site_host(transition['website'].url) for transition in transitions if transition['status'] == 'DOWN'
+    )
+
+    with transaction.atomic():
+        memberships = {
+            member.website_id: member
+            for member in IncidentSite.objects.select_for_update().select_related('incident').filter(
+                website_id__in=[transition['website'].id for transition in transitions],
+                incident__status__in=ACTIVE_STATUSES,
+                recovery_notified=False,
+            )
+        }
+        # Older incidents are not joined: a site failing hours later is a new problem.
+        window_start = now - timedelta(seconds=settings.INCIDENT_CORRELATION_WINDOW_SECONDS)
+        active = list(
+            Incident.objects.filter(status__in=ACTIVE_STATUSES, opened_at__gte=window_start).order_by('opened_at')
+        )
+        recovered_incidents = {}
+        recovered_users = defaultdict(set)
+
+        for transition in transitions:
+            website = transition['website']
+            member = memberships.get(website.id)
+
+            if transition['status'] == 'UP':
+                if member is None:
+                    notifications.append((website.user_id, website.name, 'UP', transition['message']))
+                else:
+                    member.recovered_at = now
+                    member.save(update_fields=['recovered_at'])
+                    recovered_incidents[member.incident_id] = member.incident
+                    recovered_users[member.incident_id].add(website.user_id)
+                continue
+
+            if member is not None:  # Flapped DOWN again inside its incident
+                member.recovered_at = None
+                member.error_message = transition['message']
+                member.save(update_fields=['recovered_at', 'error_message'])
+                continue
+
+            host, ip, provider = correlation_keys(website.url, transition.get('remote_ip'), providers)
+            incident, matched_on = _match(active, host, ip, provider)
+            if incident is None:
+                incident = Incident.objects.create(host=host, ip_address=ip, dns_provider=provider, opened_at=now)
+                active.append(incident)
+            elif incident.correlation == 'site':
+                incident.correlation = matched_on
+                incident.save(update_fields=['correlation'])
+
+            # The incident's grouped alert went out before this site failed, so it is alerted on its own.
+            notified = incident.status == 'open'
+            if notified:
+                notifications.append((website.user_id, website.name, 'DOWN', transition['message']))
+            memberships[website.id] = IncidentSite.objects.create(
+                incident=incident, website=website, went_down_at=now,
+                error_message=transition['message'] or '', notified=notified,
+            )
+
+        for incident_id, incident in recovered_incidents.items():
+            if not incident.members.filter(recovered_at__isnull=True).exists():
+                notifications.extend(_resolve(incident, now))
+            elif incident.status == 'open':
+                notifications.extend(_recoveries(incident, recovered_users[incident_id]))
+
+    return notifications
+
+
+def _group_by_keys(incidents):
+    """Partitions incidents into groups connected by a shared host, IP or DNS provider."""
+    parent = list(range(len(incidents)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    first_seen = {}
+    for i, incident in enumerate(incidents):
+        for key in (('host', incident.host), ('ip', incident.ip_address), ('dns', incident.dns_provider)):
+            if not key[1]:
+                continue
+            if key in first_seen:
+                parent[find(i)] = find(first_seen[key])
+            else:
+                first_seen[key] = i
+
+    groups = defaultdict(list)
+    for i, incident in enumerate(incidents):
+        groups[find(i)].append(incident)
+    return list(groups.values())
+
+
+def _merge(group, correlation=None):
+    """Folds a group of pending incidents into the oldest one."""
+    group = sorted(group, key=lambda incident: incident.opened_at)
+    target, others = group[0], group[1:]
+    if others:
+        IncidentSite.objects.filter(incident__in=others).update(incident=target)
+        _count_suppressed(target, sum(incident.alerts_suppressed for incident in others))
+        Incident.objects.filter(pk__in=[incident.pk for incident in others]).delete()
+        if correlation is None and target.correlation == 'site':
+            _, correlation = _match([target], others[0].host, others[0].ip_address, others[0].dns_provider)
+        target.correlation = correlation or target.correlation
+    return target
+
+
+def notify_due_incidents(now=None):
+    """Notifies pending incidents whose group wait has elapsed; returns the notifications."""
+    now = now or timezone.now()
+    cutoff = now - timedelta(seconds=settings.INCIDENT_GROUP_WAIT_SECONDS)
+    notifications = []
+
+    with transaction.atomic():
+        pending = list(Incident.objects.select_for_update(skip_locked=True).filter(status='pending'))
+        # Workers correlating in parallel can open duplicates for the same key.
+        groups = _group_by_keys(pending)
+        due = [group for group in groups if min(incident.opened_at for incident in group) <= cutoff]
+        if len(due) >= settings.INCIDENT_STORM_MIN_INCIDENTS:
+            due = [[incident for group in due for incident in group]]
+            incidents = [_merge(due[0], correlation='window')]
+        else:
+            incidents = [_merge(group) for group in due]
+
+        for incident in incidents:
+            members = list(incident.members.filter(recovered_at__isnull=True).select_related('website'))
+            if not members:
+                notifications.extend(_resolve(incident, now))
+                continue
+            incident.status = 'open'
+            incident.notified_at = now
+            incident_notifications = _notifications(incident, members, 'DOWN')
+            notifications.extend(incident_notifications)
+            IncidentSite.objects.filter(pk__in=[member.pk for member in members]).update(notified=True)
+            incident.save(update_fields=['status', 'notified_at', 'correlation'])
+            logger.warning(
+                f"Incident #{incident.pk}: {len(members)} sites DOWN ({describe(incident)}); "
+                f"{len(incident_notifications)} notifications, "
+                f"{len(members) - len(incident_notifications)} alerts suppressed."
+            )
+
+    return notifications
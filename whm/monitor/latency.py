@@ -0,0 +1,92 @@
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import LatencySketch
+from .sketches import DDSketch
+
+logger = logging.getLogger(__name__)
+
+# =================================================================
+# Per-Site Latency Sketches
+# =================================================================
+# Each website has one DDSketch per SKETCH_BUCKET_SECONDS bucket. Sketches
+# are merged in as check results are flushed, and percentile queries over
+# any window merge the bucket sketches instead of sorting raw rows.
+
+
+def has_latency(status_code, response_time_ms):
+    """Timeouts (408) and connection errors (0) carry no meaningful response time."""
+    return response_time_ms is not None and status_code not in (0, 408)
+
+
+def sketch_bucket_start(moment):
+    bucket = settings.SKETCH_BUCKET_SECONDS
+    epoch_seconds = int(moment.timestamp())
+    return moment.replace(microsecond=0) - timedelta(seconds=epoch_seconds % bucket)
+
+
+def record_latency_sketches(check_results):
+    """Merges a batch of saved CheckResult rows into their bucket sketches.
+
+    Must run inside the caller's transaction: missing bucket rows are created
+    first (ignoring races), then all touched rows are locked and updated.
+    Rows are inserted and locked in key order, so concurrent flushes touching
+    the same sites wait for each other instead of deadlocking.
+    """
+    incoming = defaultdict(DDSketch)
+    for result in check_results:
+        if has_latency(result.status_code, result.response_time_ms):
+            incoming[(result.website_id, sketch_bucket_start(result.timestamp))].add(result.response_time_ms)
+    if not incoming:
+        return 0
+
+    empty = DDSketch().to_bytes()
+    LatencySketch.objects.bulk_create(
+        [
+            LatencySketch(website_id=website_id, bucket_start=start, sketch=empty)
+            for website_id, start in sorted(incoming)
+        ],
+        ignore_conflicts=True,
+    )
+    rows = LatencySketch.objects.select_for_update().filter(
+        website_id__in={website_id for website_id, _ in incoming},
+        bucket_start__in={start for _, start in incoming},
+    ).order_by('website_id', 'bucket_start')
+
+    updated = []
+    for row in rows:
+        addition = incoming.get((row.website_id, row.bucket_start))
+        if addition is None:
+            continue
+        merged = DDSketch.from_bytes(row.sketch).merge(addition)
+        row.sketch = merged.to_bytes()
+        row.sample_count = merged.count
+        updated.append(row)
+    LatencySketch.objects.bulk_update(updated, ['sketch', 'sample_count'], batch_size=500)
+    return len(updated)
+
+
+def merged_sketch(website_id, start, end=None):
+    """One DDSketch covering every bucket of a website that starts within [start, end)."""
+    end = end or timezone.now()
+    sketch = DDSketch()
+    rows = LatencySketch.objects.filter(
+        website_id=website_id,
+        bucket_start__gte=sketch_bucket_start(start),
+        bucket_start__lt=end,
+    ).values_list('sketch', flat=True)
+    for data in rows:
+        sketch.merge(DDSketch.from_bytes(data))
+    return sketch
+
+
+def latency_quantiles(website_id, start, end=None, quantiles=(0.5, 0.95, 0.99)):
+    """Approximate response-time percentiles (within 1% relative error) for any window."""
+    sketch = merged_sketch(website_id, start, end)
+    summary = {f'p{int(q * 100)}': sketch.quantile(q) for q in quantiles}
+    summary.update({'samples': sketch.count, 'avg': sketch.avg})
+    return summary
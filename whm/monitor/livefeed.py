@@ -0,0 +1,102 @@
+import asyncio
+import json
+import logging
+import threading
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# =================================================================
+# Live Dashboard Push: Coalesced Per-User Deltas
+# =================================================================
+# Checkers publish every result here instead of straight to the channel
+# layer. Updates are held for LIVE_UPDATE_COALESCE_MS and merged per site, so
+# a site checked several times in the window costs one entry, and each user
+# gets one group message per window however many of their sites changed.
+# Entries are compact diffs: only the fields that changed, under one-letter
+# keys (see FIELD_KEYS), keyed by site id. Browsers join their own user's
+# group (monitor.consumers), so they only ever receive their own sites.
+#
+# Messages are JSON-encoded once here, not once per socket. Sent to a group:
+#   {'type': 'delta', 'sites': {'42': {'u': 0, 'c': 503, 'r': 812, 't': 1718000000}}}
+
+FIELD_KEYS = {'is_up': 'u', 'status_code': 'c', 'response_time': 'r', 'last_checked': 't'}
+
+
+def user_group(user_id):
+    """Channel layer group of one user's dashboard sockets."""
+    return f"dashboard.user.{user_id}"
+
+
+def live_state(website):
+    """The compact live fields of a Website, as sent to browsers."""
+    return {
+        'u': int(website.is_up),
+        'c': website.status_code,
+        'r': round(website.response_time) if website.response_time is not None else None,
+        't': int(website.last_checked.timestamp()) if website.last_checked else None,
+    }
+
+
+def state_diff(before, after):
+    """Keys of `after` whose values differ from `before`."""
+    return {key: value for key, value in after.items() if before.get(key) != value}
+
+
+class LiveUpdatePublisher:
+    """Per-process buffer of the latest diff per site, flushed to the channel layer once per window."""
+
+    def __init__(self, window_ms=None):
+        self.window_ms = window_ms
+        self._pending = {}  # user_id -> {site_id: merged diff}
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def add_many(self, updates):
+        """Queues (user_id, site_id, diff) updates; empty diffs are dropped."""
+        with self._lock:
+            for user_id, site_id, diff in updates:
+                if diff:
+                    # Later values win, so merging consecutive diffs keeps only the latest state.
+                    self._pending.setdefault(user_id, {}).setdefault(str(site_id), {}).update(diff)
+            if self._pending and self._timer is None:
+                window_ms = self.window_ms or settings.LIVE_UPDATE_COALESCE_MS
+                self._timer = threading.Timer(window_ms / 1000, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """Sends everything pending, one group message per user; returns the number of site updates."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            timer, self._timer = self._timer, None
+        if timer is not None:
+            timer.cancel()
+        if not pending:
+            return 0
+
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return 0
+        try:
+            async_to_sync(self._send)(channel_layer, pending)
+        except Exception as e:  # The feed is best effort; never fail a check batch over it.
+            logger.warning(f"Live dashboard publish failed: {e}")
+            return 0
+        return sum(len(sites) for sites in pending.values())
+
+    @staticmethod
+    async def _send(channel_layer, pending):
+        await asyncio.gather(*(
+            channel_layer.group_send(user_group(user_id), {
+                'type': 'send_dashboard_update',
+                'text': json.dumps({'type': 'delta', 'sites': sites}, separators=(',', ':')),
+            })
+            for user_id, sites in pending.items()
+        ))
+
+
+publisher = LiveUpdatePublisher()
@@ -0,0 +1,161 @@
+import logging
+import smtplib
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# =================================================================
+# Pooled SMTP Sender and Alert Emails
+# =================================================================
+# EmailMessage.send() / send_mail() open, authenticate and close an SMTP
+# connection for every message. The mailer below keeps one connection open
+# per worker process and sends everything over it with send_messages(). It
+# reconnects when the server drops the session, after
+# EMAIL_CONNECTION_MAX_IDLE_SECONDS of inactivity, and after
+# EMAIL_MAX_MESSAGES_PER_CONNECTION messages, because servers cap those.
+
+
+class PooledMailer:
+    """One persistent email backend connection, shared by the threads of a process."""
+
+    def __init__(self):
+        self._connection = None
+        self._opened_messages = 0
+        self._last_used = 0.0
+        self._lock = threading.Lock()
+
+    def _close(self):
+        if self._connection is not None:
+            try:
+                self._connection.close()
+            except (smtplib.SMTPException, OSError):
+                pass  # The server already hung up
+            self._connection = None
+
+    def _open(self):
+        stale = time.monotonic() - self._last_used > settings.EMAIL_CONNECTION_MAX_IDLE_SECONDS
+        if self._connection is not None and (stale or self._opened_messages >= settings.EMAIL_MAX_MESSAGES_PER_CONNECTION):
+            self._close()
+        if self._connection is None:
+            self._connection = get_connection(fail_silently=False)
+            self._connection.open()
+            self._opened_messages = 0
+
+    def _send_one(self, message):
+        # A dropped session is reopened once; the message was not accepted, so resending is safe.
+        for attempt in (1, 2):
+            self._open()
+            try:
+                sent = self._connection.send_messages([message])
+                self._opened_messages += 1
+                self._last_used = time.monotonic()
+                return sent
+            except smtplib.SMTPServerDisconnected:
+                self._close()
+                if attempt == 2:
+                    raise
+
+    def send_messages(self, messages, on_error=None):
+        """Sends messages over the shared connection, one SMTP transaction each.
+
+        Without `on_error` the first failure is raised. With it, each failed
+        message is reported as on_error(message, exc) and sending continues;
+        returns the number of messages sent.
+        """
+        sent = 0
+        with self._lock:
+            for message in messages:
+                try:
+                    sent += self._send_one(message)
+                except (smtplib.SMTPException, OSError) as e:
+                    if on_error is None:
+                        raise
+                    on_error(message, e)
+        return sent
+
+    def send(self, message):
+        return self.send_messages([message])
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+
+mailer = PooledMailer()
+
+
+STATUS_COLORS = {'DOWN': '#dc2626', 'UP': '#16a34a', 'FLAPPING': '#d97706'}
+
+
+def _status_color(status):
+    return STATUS_COLORS.get(status, '#16a34a')
+
+
+def build_alert_email(contact_value, website_name, status, message):
+    """The single-site alert mail."""
+    now = timezone.now().strftime('%Y-%m-%d %H:%M:%S')
+    subject = f"ALERT: {website_name} is {status}"
+    text_content = f"""
+Website Health Monitor Alert!
+
+Website: {website_name}
+Status: {status}
+Time: {now} UTC
+Details: {message}
+"""
+    html_content = f"""
+<html>
+    <body style="font-family: sans-serif; padding: 20px; border: 1px solid #ddd;">
+        <h2 style="color: {_status_color(status)};">
+            Website Health Monitor Alert!
+        </h2>
+        <p><strong>Website:</strong> {website_name}</p>
+        <p><strong>Status:</strong> <span style="font-weight: bold;">{status}</span></p>
+        <p><strong>Time:</strong> {now} UTC</p>
+        <p><strong>Details:</strong> {message}</p>
+    </body>
+</html>
+"""
+    msg = EmailMultiAlternatives(subject, text_content, settings.DEFAULT_FROM_EMAIL, [contact_value])
+    msg.attach_alternative(html_content, "text/html")
+    return msg
+
+
+def build_digest_email(contact_value, alerts):
+    """One mail summarising several site alerts; `alerts` are QueuedEmailAlert rows, oldest first."""
+    if len(alerts) == 1:
+        alert = alerts[0]
+        return build_alert_email(contact_value, alert.website_name, alert.status, alert.message)
+
+    counts = Counter(alert.status for alert in alerts)
+    breakdown = ', '.join(f"{counts[status]} {status}" for status in STATUS_COLORS if counts[status])
+    subject = f"ALERT: {len(alerts)} status changes ({breakdown})"
+    lines, rows = [], []
+    for alert in alerts:
+        when = alert.created_at.strftime('%Y-%m-%d %H:%M:%S')
+        lines.append(f"{when} UTC  {alert.status:<8}  {alert.website_name}: {alert.message}")
+        rows.append(
+            f"<tr><td>{when}</td><td style=\"color: {_status_color(alert.status)}; font-weight: bold;\">"
+            f"{alert.status}</td><td>{alert.website_name}</td><td>{alert.message}</td></tr>"
+        )
+    text_content = "Website Health Monitor Alert Digest\n\n" + "\n".join(lines) + "\n"
+    html_content = f"""
+<html>
+    <body style="font-family: sans-serif; padding: 20px; border: 1px solid #ddd;">
+        <h2>Website Health Monitor Alert Digest</h2>
+        <table cellpadding="6">
+            <tr><th align="left">Time (UTC)</th><th align="left">Status</th><th align="left">Website</th><th align="left">Details</th></tr>
+            {''.join(rows)}
+        </table>
+    </body>
+</html>
+"""
+    msg = EmailMultiAlternatives(subject, text_content, settings.DEFAULT_FROM_EMAIL, [contact_value])
+    msg.attach_alternative(html_content, "text/html")
+    return msg
@@ -0,0 +1,39 @@
+import json
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from monitor.archive import archive_history, archived_summary
+from monitor.history import parse_time
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves whole months of CheckResult history older than the archive threshold into "
+        "per-site monthly Parquet files, or (with --summary) queries the archive."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.CHECKRESULT_ARCHIVE_AFTER_DAYS,
+            help='Archive months that ended more than this many days ago (default: CHECKRESULT_ARCHIVE_AFTER_DAYS).',
+        )
+        parser.add_argument(
+            '--summary', type=int, metavar='WEBSITE_ID',
+            help='Print uptime and latency of a site over its archived history instead of archiving.',
+        )
+        parser.add_argument('--start', help='With --summary: range start (ISO-8601, inclusive).')
+        parser.add_argument('--end', help='With --summary: range end (ISO-8601, exclusive).')
+
+    def handle(self, *args, **options):
+        try:
+            if options['summary'] is not None:
+                start, end = parse_time(options['start']), parse_time(options['end'])
+                summary = archived_summary(options['summary'], start, end)
+                self.stdout.write(json.dumps(summary, indent=2))
+                return
+            moved = archive_history(options['days'])
+        except (ImproperlyConfigured, ValueError) as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f"Archived {moved} check results to {settings.CHECKRESULT_ARCHIVE_DIR}."))
@@ -0,0 +1,50 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from monitor.archive import database_start
+from monitor.exports import FORMATS, export_stream
+from monitor.history import parse_time
+from monitor.models import Website
+from monitor.serializers import CHECK_RESULT_FIELDS, parse_fields
+
+
+class Command(BaseCommand):
+    help = (
+        "Streams a website's raw check history as CSV or NDJSON (optionally gzipped) "
+        "to a file or stdout, in constant memory."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('website_id', type=int)
+        parser.add_argument('--format', choices=list(FORMATS), default='csv')
+        parser.add_argument('--gzip', action='store_true', help='Compress the output with gzip.')
+        parser.add_argument(
+            '--start', help='Oldest timestamp to export (ISO-8601, inclusive; default: end of the archived months).',
+        )
+        parser.add_argument('--end', help='Newest timestamp to export (ISO-8601, exclusive).')
+        parser.add_argument('--fields', help='Comma-separated columns (default: all).')
+        parser.add_argument('--output', '-o', help='File to write (default: stdout).')
+
+    def handle(self, *args, **options):
+        if not Website.objects.filter(pk=options['website_id']).exists():
+            raise CommandError(f"Website with ID {options['website_id']} not found.")
+        try:
+            fields = parse_fields(options['fields'], CHECK_RESULT_FIELDS, CHECK_RESULT_FIELDS)
+            start, end = parse_time(options['start']), parse_time(options['end'])
+            start = database_start(options['website_id'], start)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        chunks = export_stream(options['website_id'], options['format'], options['gzip'], start, end, fields)
+        output = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        written = 0
+        try:
+            for chunk in chunks:
+                output.write(chunk)
+                written += len(chunk)
+        finally:
+            if options['output']:
+                output.close()
+        if options['output']:
+            self.stdout.write(self.style.SUCCESS(f"Wrote {written} bytes to {options['output']}."))
@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from monitor.partitions import convert_to_partitioned, ensure_partitions, partitioning_enabled
+
+
+class Command(BaseCommand):
+    help = (
+        "Converts CheckResult to native PostgreSQL range partitions (if not already) "
+        "and creates the upcoming partitions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ahead', type=int, default=settings.CHECKRESULT_PARTITIONS_AHEAD,
+            help='Number of future partitions to create.',
+        )
+
+    def handle(self, *args, **options):
+        if not partitioning_enabled():
+            raise CommandError(
+                "Partitioning needs PostgreSQL and CHECKRESULT_PARTITIONING set to 'day' or 'month'."
+            )
+
+        if convert_to_partitioned():
+            self.stdout.write(self.style.SUCCESS("Converted CheckResult to a partitioned table."))
+
+        created = ensure_partitions(ahead=options['ahead'])
+        self.stdout.write(self.style.SUCCESS(f"{len(created)} partitions ready up to {created[-1]}."))
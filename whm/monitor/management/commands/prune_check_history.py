@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from monitor.partitions import is_partitioned, partitioning_enabled, prune_history
+
+
+class Command(BaseCommand):
+    help = (
+        "Removes CheckResult history older than the retention window. Drops whole "
+        "partitions on partitioned PostgreSQL tables, otherwise deletes in chunks."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.CHECKRESULT_RETENTION_DAYS,
+            help='Keep this many days of history (default: CHECKRESULT_RETENTION_DAYS).',
+        )
+
+    def handle(self, *args, **options):
+        removed = prune_history(options['days'])
+        if partitioning_enabled() and is_partitioned():
+            self.stdout.write(self.style.SUCCESS(f"Dropped {removed} expired partitions."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Deleted {removed} expired check results."))
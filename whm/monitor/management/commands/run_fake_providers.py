@@ -0,0 +1,42 @@
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+from monitor.fakeproviders import serve
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs local fake SMTP and Twilio servers for load testing alert delivery. "
+        "Point EMAIL_HOST/EMAIL_PORT and TWILIO_API_BASE_URL at them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--smtp-port', type=int, default=2525)
+        parser.add_argument('--twilio-port', type=int, default=8099)
+        parser.add_argument('--latency-ms', type=int, default=0, help='Delay added to every accepted message.')
+        parser.add_argument(
+            '--failure-rate', type=float, default=0.0,
+            help='Share of messages (0-1) rejected with a temporary error, to exercise retries.',
+        )
+        parser.add_argument(
+            '--sms-rate', type=int, default=None,
+            help='Messages per second the fake Twilio accepts before answering 429.',
+        )
+        parser.add_argument('--report-every', type=int, default=10, help='Seconds between counter reports.')
+
+    def handle(self, *args, **options):
+        try:
+            asyncio.run(serve(
+                host=options['host'],
+                smtp_port=options['smtp_port'],
+                twilio_port=options['twilio_port'],
+                report_every=options['report_every'],
+                report=self.stdout.write,
+                latency_ms=options['latency_ms'],
+                failure_rate=options['failure_rate'],
+                sms_rate=options['sms_rate'],
+            ))
+        except KeyboardInterrupt:
+            self.stdout.write("--- Fake providers stopped ---")
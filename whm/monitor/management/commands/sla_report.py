@@ -0,0 +1,46 @@
+import json
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from monitor.analytics import sla_report
+from monitor.history import parse_time
+from monitor.models import Website
+
+
+class Command(BaseCommand):
+    help = (
+        "Prints uptime, outages, MTTR/MTBF and latency percentiles per website over a window, "
+        "computed from the database and the Parquet archive."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sites', help='Comma-separated website ids (default: all).')
+        parser.add_argument('--start', help='Window start (ISO-8601, inclusive; default: first check).')
+        parser.add_argument('--end', help='Window end (ISO-8601, exclusive; default: now).')
+        parser.add_argument('--outages', action='store_true', help='Include outage intervals (with --json).')
+        parser.add_argument('--json', action='store_true', help='Print the full report as JSON.')
+
+    def handle(self, *args, **options):
+        websites = Website.objects.order_by('pk')
+        try:
+            if options['sites']:
+                websites = websites.filter(pk__in=[int(site_id) for site_id in options['sites'].split(',')])
+            start, end = parse_time(options['start']), parse_time(options['end'])
+            names = dict(websites.values_list('pk', 'name'))
+            report = sla_report(list(names), start, end, options['outages'])
+        except (ImproperlyConfigured, ValueError) as e:
+            raise CommandError(str(e))
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        self.stdout.write(
+            f"{'site':<30} {'checks':>9} {'uptime%':>9} {'outages':>8} {'MTTR s':>9} {'MTBF s':>11} {'p95 ms':>9}"
+        )
+        for website_id, metrics in report.items():
+            self.stdout.write(
+                f"{names[website_id][:30]:<30} {metrics['checks']:>9} {metrics['uptime_pct'] or 0:>9.3f} "
+                f"{metrics['outages']:>8} {metrics['mttr_seconds'] or 0:>9.1f} {metrics['mtbf_seconds'] or 0:>11.1f} "
+                f"{metrics['p95_response_ms'] or 0:>9.1f}"
+            )
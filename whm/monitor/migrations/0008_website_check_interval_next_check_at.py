@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0006_alertcontact_is_active'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='website',
+            name='check_interval_seconds',
+            field=models.PositiveIntegerField(default=60),
+        ),
+        migrations.AddField(
+            model_name='website',
+            name='next_check_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:15
+
+from django.db import migrations, models
+
+from monitor.partitions import migrate_to_partitioned
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0008_website_check_interval_next_check_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='checkresult',
+            index=models.Index(fields=['website', '-timestamp'], name='checkresult_site_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='checkresult',
+            index=models.Index(fields=['timestamp'], name='checkresult_timestamp_idx'),
+        ),
+        # No-op unless running on PostgreSQL with CHECKRESULT_PARTITIONING set.
+        migrations.RunPython(migrate_to_partitioned, migrations.RunPython.noop),
+    ]
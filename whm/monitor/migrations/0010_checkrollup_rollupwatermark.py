@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0009_checkresult_time_series_layout'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CheckRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('1m', '1 minute'), ('1h', '1 hour'), ('1d', '1 day')], max_length=2)),
+                ('bucket_start', models.DateTimeField()),
+                ('check_count', models.PositiveIntegerField(default=0)),
+                ('up_count', models.PositiveIntegerField(default=0)),
+                ('latency_samples', models.PositiveIntegerField(default=0)),
+                ('min_response_ms', models.FloatField(blank=True, null=True)),
+                ('max_response_ms', models.FloatField(blank=True, null=True)),
+                ('avg_response_ms', models.FloatField(blank=True, null=True)),
+                ('p50_response_ms', models.FloatField(blank=True, null=True)),
+                ('p95_response_ms', models.FloatField(blank=True, null=True)),
+                ('p99_response_ms', models.FloatField(blank=True, null=True)),
+                ('status_codes', models.JSONField(default=dict)),
+                ('website', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='monitor.website')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='checkrollup',
+            constraint=models.UniqueConstraint(fields=('website', 'resolution', 'bucket_start'), name='checkrollup_unique_bucket'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0010_checkrollup_rollupwatermark'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='checkrollup',
+            name='latency_sketch',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='LatencySketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket_start', models.DateTimeField()),
+                ('sample_count', models.PositiveIntegerField(default=0)),
+                ('sketch', models.BinaryField()),
+                ('website', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='latency_sketches', to='monitor.website')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='latencysketch',
+            constraint=models.UniqueConstraint(fields=('website', 'bucket_start'), name='latencysketch_unique_bucket'),
+        ),
+    ]
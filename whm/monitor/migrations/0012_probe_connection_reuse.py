@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0011_latency_sketches'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='checkresult',
+            name='connection_reused',
+            field=models.BooleanField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='website',
+            name='probe_fresh_connection',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0012_probe_connection_reuse'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='checkresult',
+            name='connect_ms',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='checkresult',
+            name='dns_ms',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='checkresult',
+            name='tls_ms',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='checkresult',
+            name='transfer_ms',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='checkresult',
+            name='ttfb_ms',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0013_checkresult_phase_timings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='website',
+            name='probe_fresh_dns',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0014_website_probe_fresh_dns'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='checkresult',
+            name='bytes_transferred',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='website',
+            name='max_body_bytes',
+            field=models.PositiveIntegerField(default=65536),
+        ),
+        migrations.AddField(
+            model_name='website',
+            name='probe_mode',
+            field=models.CharField(choices=[('full', 'Full request (http_method, whole body)'), ('head', 'HEAD, GET fallback on 405'), ('capped', 'Streamed GET, stop after max_body_bytes'), ('range', 'Ranged GET of the first max_body_bytes')], default='full', max_length=10),
+        ),
+    ]
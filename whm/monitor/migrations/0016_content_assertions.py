@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0015_website_probe_mode_bytes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='checkresult',
+            name='assertions_passed',
+            field=models.BooleanField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='ContentAssertion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('substring', 'Body contains text'), ('regex', 'Body matches regular expression'), ('jsonpath', 'JSONPath value equals'), ('max_size', 'Body is at most N bytes')], max_length=10)),
+                ('expression', models.CharField(max_length=500)),
+                ('expected_value', models.CharField(blank=True, max_length=500)),
+                ('is_active', models.BooleanField(default=True)),
+                ('website', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='assertions', to='monitor.website')),
+            ],
+        ),
+    ]
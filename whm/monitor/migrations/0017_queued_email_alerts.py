@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0016_content_assertions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueuedEmailAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('website_name', models.CharField(max_length=255)),
+                ('status', models.CharField(max_length=10)),
+                ('message', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('contact', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='queued_email_alerts', to='monitor.alertcontact')),
+            ],
+        ),
+    ]
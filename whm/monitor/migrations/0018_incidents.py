@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0017_queued_email_alerts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Incident',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pending (collecting sites before notifying)'), ('open', 'Open (notified)'), ('resolved', 'Resolved')], db_index=True, default='pending', max_length=10)),
+                ('correlation', models.CharField(choices=[('site', 'Single site'), ('host', 'Shared host'), ('ip', 'Shared IP address'), ('dns', 'Shared DNS provider'), ('window', 'Simultaneous failures')], default='site', max_length=10)),
+                ('host', models.CharField(blank=True, max_length=255, null=True)),
+                ('ip_address', models.GenericIPAddressField(blank=True, null=True)),
+                ('dns_provider', models.CharField(blank=True, max_length=255, null=True)),
+                ('opened_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('notified_at', models.DateTimeField(blank=True, null=True)),
+                ('resolved_at', models.DateTimeField(blank=True, null=True)),
+                ('alerts_suppressed', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='IncidentSite',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('went_down_at', models.DateTimeField()),
+                ('recovered_at', models.DateTimeField(blank=True, null=True)),
+                ('error_message', models.TextField(blank=True)),
+                ('notified', models.BooleanField(default=False)),
+                ('incident', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='members', to='monitor.incident')),
+                ('website', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='incident_memberships', to='monitor.website')),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0018_incidents'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='incidentsite',
+            name='recovery_notified',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 20:40
+
+from django.db import migrations, models
+
+
+def copy_watermark_timestamps(apps, schema_editor):
+    RollupWatermark = apps.get_model('monitor', 'RollupWatermark')
+    CheckResult = apps.get_model('monitor', 'CheckResult')
+    for watermark in RollupWatermark.objects.filter(last_id__gt=0):
+        watermark.last_timestamp = (
+            CheckResult.objects.filter(pk=watermark.last_id).values_list('timestamp', flat=True).first()
+        )
+        watermark.save(update_fields=['last_timestamp'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0019_incidentsite_recovery_notified'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rollupwatermark',
+            name='last_timestamp',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(copy_watermark_timestamps, migrations.RunPython.noop),
+    ]
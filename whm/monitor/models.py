@@ -89,11 +89,48 @@ class Website(models.Model):
     response_time = models.FloatField(null=True, blank=True)
     is_up = models.BooleanField(default=True)
     is_active = models.BooleanField(default=True)
+    check_interval_seconds = models.PositiveIntegerField(default=60)
+    next_check_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    # Open a new connection for every probe so response_time includes DNS/TCP/TLS setup.
+    probe_fresh_connection = models.BooleanField(default=False)
+    # Bypass the prober's DNS cache so dns_ms reflects a real resolution on every probe.
+    probe_fresh_dns = models.BooleanField(default=False)
+    probe_mode = models.CharField(
+        max_length=10,
+        choices=[
+            ('full', 'Full request (http_method, whole body)'),
+            ('head', 'HEAD, GET fallback on 405'),
+            ('capped', 'Streamed GET, stop after max_body_bytes'),
+            ('range', 'Ranged GET of the first max_body_bytes'),
+        ],
+        default='full'
+    )
+    max_body_bytes = models.PositiveIntegerField(default=65536)
 
     def __str__(self):
         return f"{self.name} ({self.url})"
 
 
+class ContentAssertion(models.Model):
+    """A check on the response body; a site is DOWN when any of its active assertions fails."""
+    KIND_CHOICES = [
+        ('substring', 'Body contains text'),
+        ('regex', 'Body matches regular expression'),
+        ('jsonpath', 'JSONPath value equals'),
+        ('max_size', 'Body is at most N bytes'),
+    ]
+
+    website = models.ForeignKey(Website, on_delete=models.CASCADE, related_name='assertions')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    # Text / pattern / JSONPath ($.data.items[0].status) / byte limit, depending on kind.
+    expression = models.CharField(max_length=500)
+    expected_value = models.CharField(max_length=500, blank=True)  # JSONPath only; JSON literal or plain text
+    is_active = models.BooleanField(default=True)
+
+    def __str__(self):
+        return f"{self.website.url} - {self.kind}: {self.expression}"
+
+
 class CheckResult(models.Model):
     website = models.ForeignKey(Website, on_delete=models.CASCADE)
     timestamp = models.DateTimeField(auto_now_add=True)
@@ -101,11 +138,130 @@ class CheckResult(models.Model):
     response_time_ms = models.FloatField(null=True, blank=True)
     is_up = models.BooleanField(default=False)
     error_message = models.TextField(null=True, blank=True)
+    connection_reused = models.BooleanField(null=True, blank=True)  # Warm (keep-alive) vs. cold probe
+    bytes_transferred = models.PositiveIntegerField(null=True, blank=True)  # Response body bytes read
+    assertions_passed = models.BooleanField(null=True, blank=True)  # None when the site has no assertions
+    # Phase timings in ms (monotonic clock); zero for phases skipped on a reused connection.
+    dns_ms = models.FloatField(null=True, blank=True)
+    connect_ms = models.FloatField(null=True, blank=True)
+    tls_ms = models.FloatField(null=True, blank=True)
+    ttfb_ms = models.FloatField(null=True, blank=True)
+    transfer_ms = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # "Latest N / last 24h for site X" is an index range scan regardless of table size.
+            models.Index(fields=['website', '-timestamp'], name='checkresult_site_recent_idx'),
+            # Retention pruning and rollups scan by time across all sites.
+            models.Index(fields=['timestamp'], name='checkresult_timestamp_idx'),
+        ]
 
     def __str__(self):
         return f"{self.website.url} - {self.timestamp.date()}"
 
 
+class CheckRollup(models.Model):
+    """Pre-aggregated check history for one website over one time bucket."""
+    RESOLUTION_CHOICES = [('1m', '1 minute'), ('1h', '1 hour'), ('1d', '1 day')]
+
+    website = models.ForeignKey(Website, on_delete=models.CASCADE, related_name='rollups')
+    resolution = models.CharField(max_length=2, choices=RESOLUTION_CHOICES)
+    bucket_start = models.DateTimeField()
+    check_count = models.PositiveIntegerField(default=0)
+    up_count = models.PositiveIntegerField(default=0)
+    latency_samples = models.PositiveIntegerField(default=0)  # Checks that received a response
+    min_response_ms = models.FloatField(null=True, blank=True)
+    max_response_ms = models.FloatField(null=True, blank=True)
+    avg_response_ms = models.FloatField(null=True, blank=True)
+    p50_response_ms = models.FloatField(null=True, blank=True)
+    p95_response_ms = models.FloatField(null=True, blank=True)
+    p99_response_ms = models.FloatField(null=True, blank=True)
+    status_codes = models.JSONField(default=dict)  # {"200": 58, "503": 2}
+    latency_sketch = models.BinaryField(null=True, blank=True)  # Merged DDSketch (1h and 1d buckets)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['website', 'resolution', 'bucket_start'], name='checkrollup_unique_bucket'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.website.url} - {self.resolution} @ {self.bucket_start}"
+
+
+class RollupWatermark(models.Model):
+    """Highest CheckResult id already folded into the rollups."""
+    name = models.CharField(max_length=50, unique=True)
+    last_id = models.BigIntegerField(default=0)
+    # Timestamp of that row, kept here because the row itself may be pruned or archived.
+    last_timestamp = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.last_id}"
+
+
+class LatencySketch(models.Model):
+    """Serialized DDSketch of response times for one website over one time bucket."""
+    website = models.ForeignKey(Website, on_delete=models.CASCADE, related_name='latency_sketches')
+    bucket_start = models.DateTimeField()
+    sample_count = models.PositiveIntegerField(default=0)
+    sketch = models.BinaryField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['website', 'bucket_start'], name='latencysketch_unique_bucket'),
+        ]
+
+    def __str__(self):
+        return f"{self.website.url} - sketch @ {self.bucket_start}"
+
+
+class Incident(models.Model):
+    """Simultaneous DOWN transitions correlated into one event and notified as a group."""
+    STATUS_CHOICES = [
+        ('pending', 'Pending (collecting sites before notifying)'),
+        ('open', 'Open (notified)'),
+        ('resolved', 'Resolved'),
+    ]
+    CORRELATION_CHOICES = [
+        ('site', 'Single site'),
+        ('host', 'Shared host'),
+        ('ip', 'Shared IP address'),
+        ('dns', 'Shared DNS provider'),
+        ('window', 'Simultaneous failures'),
+    ]
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', db_index=True)
+    correlation = models.CharField(max_length=10, choices=CORRELATION_CHOICES, default='site')
+    # Correlation keys of the first site; later sites join when any of them matches.
+    host = models.CharField(max_length=255, null=True, blank=True)
+    ip_address = models.GenericIPAddressField(null=True, blank=True)
+    dns_provider = models.CharField(max_length=255, null=True, blank=True)
+    opened_at = models.DateTimeField(default=timezone.now)
+    notified_at = models.DateTimeField(null=True, blank=True)
+    resolved_at = models.DateTimeField(null=True, blank=True)
+    alerts_suppressed = models.PositiveIntegerField(default=0)  # Per-site alerts folded into grouped ones
+
+    def __str__(self):
+        return f"Incident #{self.pk} ({self.correlation}, {self.status})"
+
+
+class IncidentSite(models.Model):
+    """A website's membership in an incident."""
+    incident = models.ForeignKey(Incident, on_delete=models.CASCADE, related_name='members')
+    website = models.ForeignKey(Website, on_delete=models.CASCADE, related_name='incident_memberships')
+    went_down_at = models.DateTimeField()
+    recovered_at = models.DateTimeField(null=True, blank=True)
+    error_message = models.TextField(blank=True)
+    notified = models.BooleanField(default=False)  # Covered by the incident's DOWN notification
+    recovery_notified = models.BooleanField(default=False)  # Covered by its user's recovery notification
+
+    def __str__(self):
+        return f"{self.website.url} in incident #{self.incident_id}"
+
+
 class AlertContact(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='alert_contacts')
     email = models.EmailField(blank=True, null=True)
@@ -115,3 +271,16 @@ class AlertContact(models.Model):
 
     def __str__(self):
         return f"AlertContact for {self.user.email or self.phone_number}"
+
+
+class QueuedEmailAlert(models.Model):
+    """An email alert waiting to be coalesced with others for the same contact into a digest."""
+    contact = models.ForeignKey(AlertContact, on_delete=models.CASCADE, related_name='queued_email_alerts')
+    website_name = models.CharField(max_length=255)
+    status = models.CharField(max_length=10)  # 'UP' / 'DOWN'
+    message = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.website_name} {self.status} -> {self.contact_id}"
@@ -0,0 +1,279 @@
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import CheckResult
+
+logger = logging.getLogger(__name__)
+
+# =================================================================
+# Time-Partitioned Check History (PostgreSQL)
+# =================================================================
+# With CHECKRESULT_PARTITIONING = 'day' or 'month' on PostgreSQL, the
+# CheckResult table is a native RANGE partitioned table on "timestamp".
+# Partitions are created ahead of time by ensure_partitions() and expired
+# history is removed by dropping whole partitions instead of running huge
+# DELETEs. On SQLite (or with partitioning off) retention falls back to
+# batched DELETEs on the timestamp index.
+#
+# A DEFAULT partition catches rows outside every pre-created range (a clock
+# jump, or maintenance not running for a while), so such a row never fails
+# the write buffer's whole flush. ensure_partitions() moves those rows into
+# their proper partition when it creates it.
+
+TABLE = CheckResult._meta.db_table
+LEGACY_TABLE = f'{TABLE}_legacy'
+DEFAULT_PARTITION = f'{TABLE}_default'
+
+
+def partitioning_enabled(conn=connection):
+    return conn.vendor == 'postgresql' and settings.CHECKRESULT_PARTITIONING in ('day', 'month')
+
+
+def _period_start(moment, interval):
+    if interval == 'month':
+        return datetime(moment.year, moment.month, 1, tzinfo=dt_timezone.utc)
+    return datetime(moment.year, moment.month, moment.day, tzinfo=dt_timezone.utc)
+
+
+def _next_period(start, interval):
+    if interval == 'month':
+        return datetime(start.year + start.month // 12, start.month % 12 + 1, 1, tzinfo=dt_timezone.utc)
+    return start + timedelta(days=1)
+
+
+def _partition_name(start, interval):
+    return f"{TABLE}_p{start:%Y%m}" if interval == 'month' else f"{TABLE}_p{start:%Y%m%d}"
+
+
+def is_partitioned(conn=connection):
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = %s",
+            [TABLE],
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions(conn=connection):
+    """Returns (name, start) for each partition, oldest first, parsed from our naming scheme."""
+    interval = settings.CHECKRESULT_PARTITIONING
+    date_format = '%Y%m' if interval == 'month' else '%Y%m%d'
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits i "
+            "JOIN pg_class parent ON parent.oid = i.inhparent "
+            "JOIN pg_class child ON child.oid = i.inhrelid "
+            "WHERE parent.relname = %s ORDER BY child.relname",
+            [TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    partitions = []
+    for name in names:
+        if name == DEFAULT_PARTITION:
+            continue
+        suffix = name.rsplit('_p', 1)[-1]
+        try:
+            start = datetime.strptime(suffix, date_format).replace(tzinfo=dt_timezone.utc)
+        except ValueError:
+            logger.warning(f"Skipping partition {name}: name does not match the {interval} scheme.")
+            continue
+        partitions.append((name, start))
+    return partitions
+
+
+def create_default_partition(cursor):
+    cursor.execute(f'CREATE TABLE IF NOT EXISTS "{DEFAULT_PARTITION}" PARTITION OF "{TABLE}" DEFAULT')
+
+
+def create_partition(cursor, start, interval):
+    """Creates the partition for [start, next period), moving in any rows the DEFAULT partition holds for it."""
+    end = _next_period(start, interval)
+    name = _partition_name(start, interval)
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL, to_regclass(%s) IS NOT NULL", [name, DEFAULT_PARTITION])
+    exists, has_default = cursor.fetchone()
+    if exists:
+        return name
+
+    stray = False
+    if has_default:
+        cursor.execute(
+            f'SELECT 1 FROM "{DEFAULT_PARTITION}" WHERE "timestamp" >= %s AND "timestamp" < %s LIMIT 1',
+            [start, end],
+        )
+        stray = cursor.fetchone() is not None
+    if not stray:
+        cursor.execute(
+            f'CREATE TABLE "{name}" PARTITION OF "{TABLE}" FOR VALUES FROM (%s) TO (%s)',
+            [start, end],
+        )
+        return name
+
+    # PostgreSQL refuses a new partition while DEFAULT holds rows of its range:
+    # build it detached, move the rows over, then attach it.
+    with transaction.atomic(using=cursor.db.alias):
+        cursor.execute(f'CREATE TABLE "{name}" (LIKE "{TABLE}" INCLUDING DEFAULTS)')
+        cursor.execute(
+            f'WITH moved AS (DELETE FROM "{DEFAULT_PARTITION}" WHERE "timestamp" >= %s AND "timestamp" < %s '
+            f'RETURNING *) INSERT INTO "{name}" SELECT * FROM moved',
+            [start, end],
+        )
+        moved = cursor.rowcount
+        cursor.execute(
+            f'ALTER TABLE "{TABLE}" ATTACH PARTITION "{name}" FOR VALUES FROM (%s) TO (%s)',
+            [start, end],
+        )
+    logger.warning(f"Moved {moved} check results from the default partition into {name}.")
+    return name
+
+
+def _stray_periods(cursor, interval):
+    """Starts of the periods that rows in the DEFAULT partition belong to."""
+    cursor.execute(
+        f'SELECT DISTINCT date_trunc(%s, "timestamp" AT TIME ZONE \'UTC\') FROM "{DEFAULT_PARTITION}"',
+        [interval],
+    )
+    return sorted(row[0].replace(tzinfo=dt_timezone.utc) for row in cursor.fetchall())
+
+
+def ensure_partitions(conn=connection, since=None, ahead=None):
+    """Creates every partition from `since` (default: now) up to `ahead` periods in the future."""
+    if not partitioning_enabled(conn) or not is_partitioned(conn):
+        return []
+
+    interval = settings.CHECKRESULT_PARTITIONING
+    ahead = settings.CHECKRESULT_PARTITIONS_AHEAD if ahead is None else ahead
+    start = _period_start(since or timezone.now(), interval)
+    last = _period_start(timezone.now(), interval)
+    for _ in range(ahead):
+        last = _next_period(last, interval)
+
+    created = []
+    with conn.cursor() as cursor:
+        create_default_partition(cursor)
+        while start <= last:
+            created.append(create_partition(cursor, start, interval))
+            start = _next_period(start, interval)
+        # Rows that fell outside every range since the last run get their own partitions too.
+        for period in _stray_periods(cursor, interval):
+            create_partition(cursor, period, interval)
+    return created
+
+
+def drop_expired_partitions(cutoff, conn=connection):
+    """Drops partitions whose whole range ends at or before `cutoff`; returns their names."""
+    interval = settings.CHECKRESULT_PARTITIONING
+    dropped = []
+    with conn.cursor() as cursor:
+        for name, start in list_partitions(conn):
+            if _next_period(start, interval) > cutoff:
+                break
+            cursor.execute(f'ALTER TABLE "{TABLE}" DETACH PARTITION "{name}"')
+            cursor.execute(f'DROP TABLE "{name}"')
+            dropped.append(name)
+    return dropped
+
+
+def delete_expired_rows(cutoff, chunk_size=None):
+    """Deletes rows older than `cutoff` in bounded chunks so no single DELETE locks for long."""
+    chunk_size = chunk_size or settings.CHECKRESULT_PRUNE_CHUNK_SIZE
+    total = 0
+    while True:
+        ids = list(
+            CheckResult.objects.filter(timestamp__lt=cutoff)
+            .order_by('timestamp')
+            .values_list('id', flat=True)[:chunk_size]
+        )
+        if not ids:
+            return total
+        total += CheckResult.objects.filter(pk__in=ids).delete()[0]
+
+
+def prune_history(retention_days=None):
+    """Removes check history older than the retention window using the cheapest available method."""
+    if retention_days is None:
+        retention_days = settings.CHECKRESULT_RETENTION_DAYS
+    cutoff = timezone.now() - timedelta(days=retention_days)
+
+    if partitioning_enabled() and is_partitioned():
+        dropped = drop_expired_partitions(cutoff)
+        logger.info(f"Dropped {len(dropped)} expired check history partitions (cutoff {cutoff:%Y-%m-%d}).")
+        return len(dropped)
+
+    deleted = delete_expired_rows(cutoff)
+    logger.info(f"Deleted {deleted} check results older than {cutoff:%Y-%m-%d}.")
+    return deleted
+
+
+def convert_to_partitioned(conn=connection):
+    """Rebuilds the CheckResult table as a RANGE partitioned table, keeping data, indexes and FKs.
+
+    Index and constraint names are preserved so later Django migrations still
+    find them. The primary key becomes (id, "timestamp") because PostgreSQL
+    requires the partition key to be part of every unique constraint.
+    """
+    if not partitioning_enabled(conn) or is_partitioned(conn):
+        return False
+
+    interval = settings.CHECKRESULT_PARTITIONING
+    with transaction.atomic(using=conn.alias), conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s AND indexname <> %s",
+            [TABLE, f'{TABLE}_pkey'],
+        )
+        indexes = cursor.fetchall()
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype = 'f'",
+            [TABLE],
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(f'SELECT min("timestamp") FROM "{TABLE}"')
+        oldest = cursor.fetchone()[0]
+
+        cursor.execute(f'ALTER TABLE "{TABLE}" RENAME TO "{LEGACY_TABLE}"')
+        cursor.execute(f'ALTER INDEX "{TABLE}_pkey" RENAME TO "{LEGACY_TABLE}_pkey"')
+        for name, _ in indexes:
+            cursor.execute(f'ALTER INDEX "{name}" RENAME TO "{name}_legacy"')
+        for name, _ in foreign_keys:
+            cursor.execute(f'ALTER TABLE "{LEGACY_TABLE}" RENAME CONSTRAINT "{name}" TO "{name}_legacy"')
+
+        cursor.execute(
+            f'CREATE TABLE "{TABLE}" (LIKE "{LEGACY_TABLE}" INCLUDING DEFAULTS INCLUDING IDENTITY) '
+            f'PARTITION BY RANGE ("timestamp")'
+        )
+        cursor.execute(f'ALTER TABLE "{TABLE}" ADD CONSTRAINT "{TABLE}_pkey" PRIMARY KEY (id, "timestamp")')
+        for _, definition in indexes:
+            # The captured definitions still name the original table, which is now the new parent.
+            cursor.execute(definition)
+        for name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE "{TABLE}" ADD CONSTRAINT "{name}" {definition}')
+
+        start = _period_start(oldest or timezone.now(), interval)
+        last = _period_start(timezone.now(), interval)
+        for _ in range(settings.CHECKRESULT_PARTITIONS_AHEAD):
+            last = _next_period(last, interval)
+        while start <= last:
+            create_partition(cursor, start, interval)
+            start = _next_period(start, interval)
+        create_default_partition(cursor)
+
+        cursor.execute(f'INSERT INTO "{TABLE}" OVERRIDING SYSTEM VALUE SELECT * FROM "{LEGACY_TABLE}"')
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence('\"{TABLE}\"', 'id'), "
+            f'COALESCE((SELECT max(id) FROM "{TABLE}"), 1))'
+        )
+        cursor.execute(f'DROP TABLE "{LEGACY_TABLE}"')
+
+    logger.info(f"Converted {TABLE} to {interval} range partitions.")
+    return True
+
+
+def migrate_to_partitioned(apps, schema_editor):
+    """RunPython hook: converts the table when partitioning is enabled for this database."""
+    convert_to_partitioned(schema_editor.connection)
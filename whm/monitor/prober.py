@@ -0,0 +1,364 @@
+import asyncio
+import contextvars
+import ipaddress
+import logging
+import os
+import time
+
+import httpcore
+import httpx
+from django.conf import settings
+
+from .assertions import ContentCheck, read_limit
+from .dnscache import DNSCache
+
+logger = logging.getLogger(__name__)
+
+# =================================================================
+# Asyncio Probe Engine
+# =================================================================
+# A single event loop drives thousands of concurrent probes, so one worker
+# process is no longer blocked for the full timeout by every dead site.
+# Targets are plain dicts: {'id': ..., 'url': ..., 'method': ..., 'probe_mode': ..., ...}.
+# Results are dicts keyed like the CheckResult fields, plus 'website_id'.
+#
+# The event loop and its HTTP clients live for the whole worker process, so
+# keep-alive connections (and their TLS sessions) are reused across batches
+# for sites that share a host. Targets with 'fresh_connection' go through a
+# non-pooling client instead, to measure cold (new connection) latency.
+#
+# Every probe also records where its time went (DNS, TCP connect, TLS,
+# time-to-first-byte, body transfer) using perf_counter marks taken from
+# httpcore's trace events, plus DNS timed in our own network backend.
+#
+# Bodies are always streamed: probe modes can cap how much is read, and
+# content assertions (monitor.assertions) are fed chunk by chunk so reading
+# stops as soon as they are decided.
+
+PHASE_FIELDS = ['dns_ms', 'connect_ms', 'tls_ms', 'ttfb_ms', 'transfer_ms']
+
+# httpcore trace phase -> result field; request/response phases all count towards TTFB.
+_TRACE_PHASES = {
+    'connect_tcp': 'connect_ms',
+    'start_tls': 'tls_ms',
+    'send_request_headers': 'ttfb_ms',
+    'send_request_body': 'ttfb_ms',
+    'receive_response_headers': 'ttfb_ms',
+    'receive_response_body': 'transfer_ms',
+}
+
+# The timer of the probe running in the current asyncio task, for the network backend.
+_current_timer = contextvars.ContextVar('probe_timer', default=None)
+
+
+class ProbeTimer:
+    """Accumulates per-phase durations for one probe (summed across redirect hops)."""
+
+    def __init__(self, fresh_dns=False):
+        self.phases = dict.fromkeys(PHASE_FIELDS, 0.0)
+        self.fresh_dns = fresh_dns  # Bypass the DNS cache to measure real resolution time
+        self.new_connection = False
+        self.sent_request = False  # Whether a request went out on some connection
+        self.remote_ip = None  # Address connected to, when this probe opened a connection
+        self._started = {}
+
+    def add(self, field, seconds):
+        self.phases[field] += seconds * 1000
+
+    async def trace(self, event_name, info):
+        phase, _, stage = event_name.rpartition('.')
+        phase = phase.split('.', 1)[-1]
+        field = _TRACE_PHASES.get(phase)
+        if field is None:
+            return
+        if stage == 'started':
+            self._started[phase] = time.perf_counter()
+            if phase == 'connect_tcp':
+                self.new_connection = True
+            elif phase == 'send_request_headers':
+                self.sent_request = True
+        elif phase in self._started:
+            self.add(field, time.perf_counter() - self._started.pop(phase))
+
+    def as_fields(self):
+        phases = dict(self.phases)
+        # DNS is resolved inside connect_tcp, so it is reported on its own and not as connect time.
+        phases['connect_ms'] = max(phases['connect_ms'] - phases['dns_ms'], 0.0)
+        return {field: round(value, 1) for field, value in phases.items()}
+
+
+async def resolve_host(host, port, fresh=False):
+    """Resolves a hostname through the worker's DNS cache (IP literals pass straight through)."""
+    try:
+        ipaddress.ip_address(host)
+        return host
+    except ValueError:
+        pass
+    addresses = await _worker_state().dns_cache.resolve(host, port, fresh=fresh)
+    return addresses[0]
+
+
+class TimedResolvingBackend(httpcore.AsyncNetworkBackend):
+    """httpcore network backend that resolves DNS itself (cached) so resolution can be timed."""
+
+    def __init__(self):
+        self._backend = httpcore.AnyIOBackend()
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        timer = _current_timer.get()
+        fresh = timer is not None and timer.fresh_dns
+        start = time.perf_counter()
+        try:
+            address = await asyncio.wait_for(resolve_host(host, port, fresh), timeout)
+        except asyncio.TimeoutError:
+            raise httpcore.ConnectTimeout(f"DNS resolution for {host} timed out.") from None
+        except OSError as e:
+            raise httpcore.ConnectError(f"DNS resolution for {host} failed: {e}") from e
+        finally:
+            if timer is not None:
+                timer.add('dns_ms', time.perf_counter() - start)
+        if timer is not None:
+            timer.remote_ip = address
+        return await self._backend.connect_tcp(address, port, timeout, local_address, socket_options)
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        return await self._backend.connect_unix_socket(path, timeout, socket_options)
+
+    async def sleep(self, seconds):
+        await self._backend.sleep(seconds)
+
+
+def _transport(ssl_context, limits, network_backend):
+    """An httpx transport whose connection pool uses our network backend."""
+    transport = httpx.AsyncHTTPTransport(verify=ssl_context, limits=limits)
+    # httpx does not expose network_backend, so swap in an equivalent pool that uses it.
+    transport._pool = httpcore.AsyncConnectionPool(
+        ssl_context=ssl_context,
+        max_connections=limits.max_connections,
+        max_keepalive_connections=limits.max_keepalive_connections,
+        keepalive_expiry=limits.keepalive_expiry,
+        network_backend=network_backend,
+    )
+    return transport
+
+
+class _WorkerState:
+    """Per-process event loop, pooled clients and DNS cache (rebuilt after fork)."""
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.loop = asyncio.new_event_loop()
+        self.warm_client = None
+        self.cold_client = None
+        self.dns_cache = DNSCache(
+            max_size=settings.DNS_CACHE_MAX_SIZE,
+            default_ttl=settings.DNS_CACHE_DEFAULT_TTL,
+            min_ttl=settings.DNS_CACHE_MIN_TTL,
+            max_ttl=settings.DNS_CACHE_MAX_TTL,
+            negative_ttl=settings.DNS_CACHE_NEGATIVE_TTL,
+        )
+
+    def build_clients(self):
+        # Must run inside self.loop, since httpx binds its pool to the running loop.
+        ssl_context = httpx.create_ssl_context()
+        backend = TimedResolvingBackend()
+        warm_limits = httpx.Limits(
+            max_connections=settings.PROBE_CONCURRENCY,
+            max_keepalive_connections=settings.PROBE_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.PROBE_KEEPALIVE_EXPIRY_SECONDS,
+        )
+        cold_limits = httpx.Limits(max_connections=settings.PROBE_CONCURRENCY, max_keepalive_connections=0)
+        self.warm_client = httpx.AsyncClient(
+            transport=_transport(ssl_context, warm_limits, backend),
+            timeout=settings.PROBE_TIMEOUT_SECONDS,
+            follow_redirects=True,
+        )
+        self.cold_client = httpx.AsyncClient(
+            transport=_transport(ssl_context, cold_limits, backend),
+            timeout=settings.PROBE_TIMEOUT_SECONDS,
+            follow_redirects=True,
+        )
+
+
+def host_semaphore(host_semaphores, url):
+    """The batch's concurrency slot for the URL's host (raises httpx.InvalidURL)."""
+    host = httpx.URL(url).host
+    if host not in host_semaphores:
+        host_semaphores[host] = asyncio.Semaphore(settings.PROBE_MAX_CONNECTIONS_PER_HOST)
+    return host_semaphores[host]
+
+
+_state = None
+
+
+def _worker_state():
+    global _state
+    if _state is None or _state.pid != os.getpid():
+        _state = _WorkerState()
+    return _state
+
+
+def _result(website_id, status_code, response_time_ms, error_message=None, timer=None,
+            bytes_transferred=None, assertions_passed=None):
+    """Builds a probe result dict; UP means a 2xx/3xx status and no failed content assertion."""
+    result = {
+        'website_id': website_id,
+        'status_code': status_code,
+        'response_time_ms': response_time_ms,
+        'is_up': 200 <= status_code < 400 and assertions_passed is not False,
+        'error_message': error_message,
+        'connection_reused': None,
+        'bytes_transferred': bytes_transferred,
+        'assertions_passed': assertions_passed,
+        'remote_ip': None,
+    }
+    result.update(dict.fromkeys(PHASE_FIELDS))
+    if timer is not None:
+        if timer.sent_request:  # Stays None when the probe never got a connection
+            result['connection_reused'] = not timer.new_connection
+        result['remote_ip'] = timer.remote_ip
+        result.update(timer.as_fields())
+    return result
+
+
+async def _fetch(client, method, url, timer, headers=None, max_bytes=None, assertions=()):
+    """Streams one request; returns (response, body bytes downloaded, ContentCheck or None).
+
+    The body is read until it ends, `max_bytes` have arrived, or every content
+    assertion is decided. Assertions only run on 2xx/3xx responses.
+    """
+    check = None
+    async with client.stream(method, url, headers=headers, extensions={'trace': timer.trace}) as response:
+        if method != 'HEAD':
+            if assertions and 200 <= response.status_code < 400:
+                check = ContentCheck(assertions)
+                chunks = response.aiter_bytes()  # Decoded, so assertions see the real content
+            else:
+                chunks = response.aiter_raw()
+            truncated = False
+            async for chunk in chunks:
+                if check is not None:
+                    check.feed(chunk)
+                    if check.done:
+                        break
+                if max_bytes is not None and response.num_bytes_downloaded >= max_bytes:
+                    truncated = True
+                    break  # Leaving the block closes the connection instead of draining the rest
+            if check is not None:
+                check.finish(truncated)
+    return response, response.num_bytes_downloaded, check
+
+
+async def _send(client, target, timer):
+    """Issues the request(s) for the target's probe mode; returns _fetch's (response, bytes, check)."""
+    mode = target.get('probe_mode', 'full')
+    assertions = target.get('assertions', ())
+    max_bytes = target.get('max_body_bytes') or settings.PROBE_DEFAULT_MAX_BODY_BYTES
+    max_bytes = max(max_bytes, read_limit(assertions) or 0)  # A size limit needs one byte past it
+    url = target['url']
+
+    if mode == 'head':
+        # Content assertions need a body, so those sites skip straight to the capped GET.
+        if not assertions:
+            response, received, check = await _fetch(client, 'HEAD', url, timer)
+            if response.status_code not in (405, 501):
+                return response, received, check
+        else:
+            received = 0
+        # Server does not support HEAD: fall back to a capped GET.
+        response, more, check = await _fetch(client, 'GET', url, timer, max_bytes=max_bytes, assertions=assertions)
+        return response, received + more, check
+    if mode == 'capped':
+        return await _fetch(client, 'GET', url, timer, max_bytes=max_bytes, assertions=assertions)
+    if mode == 'range':
+        headers = {'Range': f'bytes=0-{max_bytes - 1}'}
+        # Still capped, for servers that ignore Range and send the whole body.
+        return await _fetch(client, 'GET', url, timer, headers=headers, max_bytes=max_bytes, assertions=assertions)
+    return await _fetch(client, target['method'], url, timer, assertions=assertions)
+
+
+async def probe(state, semaphore, host_semaphores, target):
+    """Probes a single target, holding one per-host and one global concurrency slot.
+
+    The per-host slot is taken first, so probes queued behind a slow host
+    wait without holding global slots that other hosts could use.
+    """
+    client = state.cold_client if target.get('fresh_connection') else state.warm_client
+    timer = ProbeTimer(fresh_dns=target.get('fresh_dns', False))
+    _current_timer.set(timer)
+
+    try:
+        host_slot = host_semaphore(host_semaphores, target['url'])
+    except httpx.InvalidURL as e:
+        return _result(target['id'], 0, 0, f"Invalid URL: {e}")
+
+    async with host_slot, semaphore:
+        start = time.perf_counter()
+        try:
+            response, received, check = await _send(client, target, timer)
+        except httpx.TimeoutException:
+            return _result(
+                target['id'], 408, 0,
+                f"Request timed out after {settings.PROBE_TIMEOUT_SECONDS} seconds.", timer,
+            )
+        except (httpx.HTTPError, httpx.InvalidURL) as e:
+            return _result(target['id'], 0, 0, str(e) or e.__class__.__name__, timer)
+
+        response_time_ms = int((time.perf_counter() - start) * 1000)
+        status_code = response.status_code
+        error_message = None
+        assertions_passed = None
+        if not 200 <= status_code < 400:
+            error_message = f"HTTP Status Code {status_code}"
+        elif check is not None:
+            assertions_passed = check.failure is None
+            if not assertions_passed:
+                error_message = f"Content assertion failed: {check.failure}"
+        return _result(
+            target['id'], status_code, response_time_ms, error_message, timer, received, assertions_passed,
+        )
+
+
+async def probe_many(targets, concurrency=None):
+    """Probes all targets concurrently, at most `concurrency` in flight at once."""
+    state = _worker_state()
+    if state.warm_client is None:
+        state.build_clients()
+    semaphore = asyncio.Semaphore(concurrency or settings.PROBE_CONCURRENCY)
+    host_semaphores = {}  # Per batch, so hosts seen once are not kept for the life of the worker
+    results = await asyncio.gather(
+        *(probe(state, semaphore, host_semaphores, target) for target in targets), return_exceptions=True,
+    )
+    # An unexpected error in one probe must not discard the rest of the batch.
+    for i, (target, result) in enumerate(zip(targets, results)):
+        if isinstance(result, Exception):
+            logger.error(f"Probe of {target['url']!r} failed unexpectedly: {result!r}")
+            results[i] = _result(target['id'], 0, 0, f"Probe error: {result.__class__.__name__}")
+    return results
+
+
+def run_probes(targets, concurrency=None):
+    """Synchronous entry point for Celery tasks: runs a batch of probes to completion."""
+    if not targets:
+        return []
+    started = time.monotonic()
+    state = _worker_state()
+    results = state.loop.run_until_complete(probe_many(targets, concurrency))
+    for target, result in zip(targets, results):
+        if result['remote_ip'] is None and result['connection_reused']:
+            # Reused connection: fall back to the cached DNS answer
+            addresses = state.dns_cache.peek(httpx.URL(target['url']).host)
+            result['remote_ip'] = addresses[0] if addresses else None
+    reused = sum(1 for r in results if r['connection_reused'])
+    received = sum(r['bytes_transferred'] or 0 for r in results)
+    logger.info(
+        f"Probed {len(results)} targets in {time.monotonic() - started:.2f}s "
+        f"({reused} on reused connections, {received / 1024:.0f} KiB of bodies)"
+    )
+    logger.debug(f"DNS cache: {dns_cache_stats()}")
+    return results
+
+
+def dns_cache_stats():
+    """Hit/miss counters of this worker's DNS cache."""
+    return _worker_state().dns_cache.stats()
@@ -0,0 +1,275 @@
+import logging
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .latency import has_latency
+from .models import CheckResult, CheckRollup, LatencySketch, RollupWatermark
+from .sketches import DDSketch
+
+logger = logging.getLogger(__name__)
+
+# =================================================================
+# Check History Rollups (1m -> 1h -> 1d)
+# =================================================================
+# update_rollups() reads only the CheckResult rows past its id watermark,
+# recomputes the 1-minute buckets they touch from raw rows, then rebuilds
+# the affected hourly buckets from the minute rollups and the daily buckets
+# from the hourly ones. Uptime and latency queries over long ranges then
+# read a few hundred CheckRollup rows instead of millions of raw results.
+
+WATERMARK_NAME = 'checkresult'
+BUCKET_SIZES = {'1m': timedelta(minutes=1), '1h': timedelta(hours=1), '1d': timedelta(days=1)}
+ROLLUP_FIELDS = [
+    'check_count', 'up_count', 'latency_samples', 'min_response_ms', 'max_response_ms',
+    'avg_response_ms', 'p50_response_ms', 'p95_response_ms', 'p99_response_ms', 'status_codes',
+    'latency_sketch',
+]
+
+
+def bucket_start(moment, resolution):
+    """Truncates a datetime to the start of its bucket."""
+    if resolution == '1m':
+        return moment.replace(second=0, microsecond=0)
+    if resolution == '1h':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def percentile(sorted_values, q):
+    """Linear-interpolated percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def _weighted_percentile(pairs, q):
+    """Approximates a percentile across buckets from (value, weight) pairs of bucket percentiles."""
+    pairs = sorted(p for p in pairs if p[0] is not None and p[1])
+    if not pairs:
+        return None
+    target = q * sum(weight for _, weight in pairs)
+    running = 0
+    for value, weight in pairs:
+        running += weight
+        if running >= target:
+            return value
+    return pairs[-1][0]
+
+
+def _save_rollups(rollups):
+    CheckRollup.objects.bulk_create(
+        rollups,
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=['website', 'resolution', 'bucket_start'],
+        update_fields=ROLLUP_FIELDS,
+    )
+
+
+def _bounds(buckets, resolution):
+    starts = [start for _, start in buckets]
+    return min(starts), max(starts) + BUCKET_SIZES[resolution]
+
+
+def rebuild_minute_buckets(buckets):
+    """Recomputes the given (website_id, minute) buckets from raw CheckResult rows."""
+    lo, hi = _bounds(buckets, '1m')
+    rows = CheckResult.objects.filter(
+        website_id__in={website_id for website_id, _ in buckets},
+        timestamp__gte=lo,
+        timestamp__lt=hi,
+    ).values_list('website_id', 'timestamp', 'is_up', 'status_code', 'response_time_ms')
+
+    grouped = defaultdict(list)
+    for website_id, timestamp, is_up, status_code, response_time_ms in rows.iterator(chunk_size=5000):
+        key = (website_id, bucket_start(timestamp, '1m'))
+        if key in buckets:
+            grouped[key].append((is_up, status_code, response_time_ms))
+
+    rollups = []
+    for (website_id, start), checks in grouped.items():
+        latencies = sorted(rt for _, code, rt in checks if has_latency(code, rt))
+        rollups.append(CheckRollup(
+            website_id=website_id,
+            resolution='1m',
+            bucket_start=start,
+            check_count=len(checks),
+            up_count=sum(1 for is_up, _, _ in checks if is_up),
+            latency_samples=len(latencies),
+            min_response_ms=latencies[0] if latencies else None,
+            max_response_ms=latencies[-1] if latencies else None,
+            avg_response_ms=sum(latencies) / len(latencies) if latencies else None,
+            p50_response_ms=percentile(latencies, 0.50),
+            p95_response_ms=percentile(latencies, 0.95),
+            p99_response_ms=percentile(latencies, 0.99),
+            status_codes=dict(Counter(str(code) for _, code, _ in checks)),
+        ))
+    _save_rollups(rollups)
+
+
+def _child_sketches(buckets, resolution, lo, hi):
+    """Merged DDSketch per parent bucket, from 5-minute LatencySketch rows (1h) or hourly rollups (1d)."""
+    website_ids = {website_id for website_id, _ in buckets}
+    if resolution == '1h':
+        rows = LatencySketch.objects.filter(
+            website_id__in=website_ids, bucket_start__gte=lo, bucket_start__lt=hi,
+        ).values_list('website_id', 'bucket_start', 'sketch')
+    else:
+        rows = CheckRollup.objects.filter(
+            website_id__in=website_ids, resolution='1h', bucket_start__gte=lo, bucket_start__lt=hi,
+            latency_sketch__isnull=False,
+        ).values_list('website_id', 'bucket_start', 'latency_sketch')
+
+    merged = {}
+    for website_id, start, data in rows.iterator(chunk_size=2000):
+        key = (website_id, bucket_start(start, resolution))
+        if key in buckets:
+            sketch = DDSketch.from_bytes(data)
+            merged[key] = merged[key].merge(sketch) if key in merged else sketch
+    return merged
+
+
+def rebuild_parent_buckets(buckets, resolution):
+    """Recomputes coarser buckets from the child rollups one level down.
+
+    Percentiles come from the merged latency sketches of the bucket. Where no
+    sketch exists (history recorded before sketches), they are approximated
+    from the child buckets' percentiles, weighted by latency samples.
+    """
+    child = {'1h': '1m', '1d': '1h'}[resolution]
+    lo, hi = _bounds(buckets, resolution)
+    children = CheckRollup.objects.filter(
+        website_id__in={website_id for website_id, _ in buckets},
+        resolution=child,
+        bucket_start__gte=lo,
+        bucket_start__lt=hi,
+    ).defer('latency_sketch')
+    sketches = _child_sketches(buckets, resolution, lo, hi)
+
+    grouped = defaultdict(list)
+    for rollup in children.iterator(chunk_size=5000):
+        key = (rollup.website_id, bucket_start(rollup.bucket_start, resolution))
+        if key in buckets:
+            grouped[key].append(rollup)
+
+    rollups = []
+    for (website_id, start), parts in grouped.items():
+        timed = [p for p in parts if p.latency_samples]
+        samples = sum(p.latency_samples for p in timed)
+        status_codes = Counter()
+        for p in parts:
+            status_codes.update(p.status_codes)
+        rollup = CheckRollup(
+            website_id=website_id,
+            resolution=resolution,
+            bucket_start=start,
+            check_count=sum(p.check_count for p in parts),
+            up_count=sum(p.up_count for p in parts),
+            latency_samples=samples,
+            min_response_ms=min((p.min_response_ms for p in timed), default=None),
+            max_response_ms=max((p.max_response_ms for p in timed), default=None),
+            avg_response_ms=sum(p.avg_response_ms * p.latency_samples for p in timed) / samples if samples else None,
+            p50_response_ms=_weighted_percentile([(p.p50_response_ms, p.latency_samples) for p in timed], 0.50),
+            p95_response_ms=_weighted_percentile([(p.p95_response_ms, p.latency_samples) for p in timed], 0.95),
+            p99_response_ms=_weighted_percentile([(p.p99_response_ms, p.latency_samples) for p in timed], 0.99),
+            status_codes=dict(status_codes),
+        )
+        sketch = sketches.get((website_id, start))
+        if sketch is not None and sketch.count:
+            rollup.p50_response_ms = sketch.quantile(0.50)
+            rollup.p95_response_ms = sketch.quantile(0.95)
+            rollup.p99_response_ms = sketch.quantile(0.99)
+            rollup.latency_sketch = sketch.to_bytes()
+        rollups.append(rollup)
+    _save_rollups(rollups)
+
+
+def update_rollups(batch_size=None):
+    """Folds CheckResult rows past the watermark into the rollups; returns rows processed.
+
+    The batch stops at the first row (in id order) younger than
+    ROLLUP_SETTLE_SECONDS; it and everything after it wait for the next run.
+    Concurrent write-buffer flushes do not assign ids in timestamp order, so
+    skipping only the unsettled rows would let a higher id move the watermark
+    past a lower one still in flight, and it would never be rolled up.
+    """
+    batch_size = batch_size or settings.ROLLUP_BATCH_SIZE
+    settled_before = timezone.now() - timedelta(seconds=settings.ROLLUP_SETTLE_SECONDS)
+
+    with transaction.atomic():
+        watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(name=WATERMARK_NAME)
+        rows = list(
+            CheckResult.objects.filter(id__gt=watermark.last_id)
+            .order_by('id')
+            .values_list('id', 'website_id', 'timestamp')[:batch_size]
+        )
+        unsettled = next((i for i, row in enumerate(rows) if row[2] >= settled_before), len(rows))
+        rows = rows[:unsettled]
+        if not rows:
+            return 0
+
+        buckets = {(website_id, bucket_start(timestamp, '1m')) for _, website_id, timestamp in rows}
+        rebuild_minute_buckets(buckets)
+        for resolution in ('1h', '1d'):
+            buckets = {(website_id, bucket_start(start, resolution)) for website_id, start in buckets}
+            rebuild_parent_buckets(buckets, resolution)
+
+        watermark.last_id, _, watermark.last_timestamp = rows[-1]
+        watermark.save(update_fields=['last_id', 'last_timestamp', 'updated_at'])
+
+    logger.info(f"Rolled up {len(rows)} check results (watermark now {watermark.last_id}).")
+    return len(rows)
+
+
+def pick_resolution(start, end):
+    """Coarsest resolution that still gives a useful number of points for the range."""
+    span = end - start
+    if span > timedelta(days=7):
+        return '1d'
+    if span > timedelta(hours=6):
+        return '1h'
+    return '1m'
+
+
+def uptime_summary(website_id, start, end=None, resolution=None):
+    """Uptime and latency for a website over [start, end), read from rollups only."""
+    end = end or timezone.now()
+    resolution = resolution or pick_resolution(start, end)
+    rollups = list(CheckRollup.objects.filter(
+        website_id=website_id,
+        resolution=resolution,
+        bucket_start__gte=bucket_start(start, resolution),
+        bucket_start__lt=end,
+    ))
+
+    checks = sum(r.check_count for r in rollups)
+    up = sum(r.up_count for r in rollups)
+    timed = [r for r in rollups if r.latency_samples]
+    samples = sum(r.latency_samples for r in timed)
+
+    sketch = DDSketch()
+    for r in rollups:
+        if r.latency_sketch is not None:
+            sketch.merge(DDSketch.from_bytes(r.latency_sketch))
+    if sketch.count:
+        p95 = sketch.quantile(0.95)
+    else:
+        p95 = _weighted_percentile([(r.p95_response_ms, r.latency_samples) for r in timed], 0.95)
+
+    return {
+        'website_id': website_id,
+        'resolution': resolution,
+        'buckets': len(rollups),
+        'checks': checks,
+        'up_checks': up,
+        'uptime_pct': round(100.0 * up / checks, 3) if checks else None,
+        'avg_response_ms': sum(r.avg_response_ms * r.latency_samples for r in timed) / samples if samples else None,
+        'p95_response_ms': p95,
+    }
@@ -0,0 +1,137 @@
+import heapq
+import logging
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Website
+
+logger = logging.getLogger(__name__)
+
+# =================================================================
+# Due-Time Scheduling
+# =================================================================
+# Every Website carries its own check_interval_seconds and an indexed
+# next_check_at column. The scheduler only ever touches rows whose due time
+# has arrived (or is about to), so a 10s site and a 1h site can share the
+# table without a full scan on each tick.
+#
+# Claims lock the due rows (SELECT ... FOR UPDATE SKIP LOCKED) until their
+# next_check_at has been pushed forward, so overlapping Beat ticks or
+# run_scheduler running alongside Beat never dispatch the same site twice.
+
+
+def _due_filter(until):
+    """Active sites due at or before `until`; never-scheduled sites are due immediately."""
+    return Q(is_active=True) & (Q(next_check_at__isnull=True) | Q(next_check_at__lte=until))
+
+
+def advance_next_check(rows, now):
+    """Pushes next_check_at forward for (website_id, interval_seconds) rows.
+
+    Sites are grouped by interval so the whole claim costs one UPDATE per
+    distinct interval rather than one per site.
+    """
+    by_interval = defaultdict(list)
+    for website_id, interval in rows:
+        by_interval[interval].append(website_id)
+
+    for interval, website_ids in by_interval.items():
+        Website.objects.filter(pk__in=website_ids).update(
+            next_check_at=now + timezone.timedelta(seconds=interval)
+        )
+
+
+def claim_due_websites(now=None, limit=None):
+    """Selects due sites in due-time order and reschedules them; returns their IDs."""
+    now = now or timezone.now()
+    limit = limit or settings.SCHEDULER_MAX_DUE_PER_TICK
+
+    with transaction.atomic():
+        rows = list(
+            Website.objects.select_for_update(skip_locked=True).filter(_due_filter(now))
+            .order_by(F('next_check_at').asc(nulls_first=True))
+            .values_list('id', 'check_interval_seconds')[:limit]
+        )
+        advance_next_check(rows, now)
+    return [website_id for website_id, _ in rows]
+
+
+def claim_websites(website_ids, now=None):
+    """Claims the given sites if they are still due; returns the claimed (website_id, interval) rows.
+
+    Sites another scheduler claimed (and rescheduled) in the meantime are skipped.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        rows = list(
+            Website.objects.select_for_update(skip_locked=True)
+            .filter(_due_filter(now), pk__in=website_ids)
+            .values_list('id', 'check_interval_seconds')
+        )
+        advance_next_check(rows, now)
+    return rows
+
+
+class DueHeap:
+    """In-memory min-heap of (next_check_at, website_id) for the upcoming horizon.
+
+    The heap is rebuilt from the next_check_at index every `horizon` seconds,
+    so between refreshes the scheduler loop can sleep exactly until the next
+    site is due instead of polling the database.
+    """
+
+    def __init__(self, horizon_seconds=None):
+        self.horizon = timezone.timedelta(
+            seconds=horizon_seconds or settings.SCHEDULER_HORIZON_SECONDS
+        )
+        self.loaded_until = None
+        self._heap = []
+        self._intervals = {}
+
+    def __len__(self):
+        return len(self._heap)
+
+    def needs_refresh(self, now):
+        return self.loaded_until is None or now >= self.loaded_until
+
+    def refresh(self, now):
+        """Reloads every site due before now + horizon."""
+        until = now + self.horizon
+        rows = Website.objects.filter(_due_filter(until)).values_list(
+            'id', 'next_check_at', 'check_interval_seconds'
+        )
+        self._heap = []
+        self._intervals = {}
+        for website_id, next_check_at, interval in rows:
+            self._heap.append((next_check_at or now, website_id))
+            self._intervals[website_id] = interval
+        heapq.heapify(self._heap)
+        self.loaded_until = until
+        logger.info(f"Scheduler heap refreshed: {len(self._heap)} sites due before {until:%H:%M:%S}.")
+
+    def pop_due(self, now):
+        """Pops every entry whose due time has arrived, as (website_id, interval) rows."""
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, website_id = heapq.heappop(self._heap)
+            due.append((website_id, self._intervals.pop(website_id)))
+        return due
+
+    def reschedule(self, rows, now):
+        """Re-queues dispatched sites whose next due time falls inside the loaded horizon."""
+        for website_id, interval in rows:
+            due_at = now + timezone.timedelta(seconds=interval)
+            if due_at < self.loaded_until:
+                heapq.heappush(self._heap, (due_at, website_id))
+                self._intervals[website_id] = interval
+
+    def seconds_until_next(self, now):
+        """Time to sleep before the next entry (or the next refresh) is due."""
+        wake_at = self.loaded_until
+        if self._heap:
+            wake_at = min(wake_at, self._heap[0][0])
+        return max((wake_at - now).total_seconds(), 0)
@@ -1,35 +1,42 @@
-from rest_framework import serializers
-from .models import MonitoredWebsite, AlertLog, CustomUser
+# =================================================================
+# JSON Shapes for the History API
+# =================================================================
+# Plain dict serialization for CheckResult rows and history buckets, used by
+# the history views (monitor.views) and exports. Clients pick columns with
+# ?fields=a,b,c; only whitelisted columns can be selected so the query never
+# touches anything else.
 
-# --- Authentication Serializer ---
+CHECK_RESULT_FIELDS = (
+    'id', 'timestamp', 'status_code', 'response_time_ms', 'is_up', 'error_message',
+    'connection_reused', 'bytes_transferred', 'assertions_passed',
+    'dns_ms', 'connect_ms', 'tls_ms', 'ttfb_ms', 'transfer_ms',
+)
+DEFAULT_CHECK_RESULT_FIELDS = ('id', 'timestamp', 'status_code', 'response_time_ms', 'is_up', 'error_message')
 
-class UserRegistrationSerializer(serializers.ModelSerializer):
-    password = serializers.CharField(write_only=True)
-    
-    class Meta:
-        model = CustomUser
-        fields = ('first_name', 'last_name', 'email', 'mobile', 'password')
-        extra_kwargs = {'email': {'required': True}}
+BUCKET_FIELDS = (
+    'bucket_start', 'checks', 'up_checks', 'uptime_pct',
+    'avg_response_ms', 'min_response_ms', 'max_response_ms', 'p95_response_ms',
+)
 
-    def validate_email(self, value):
-        if CustomUser.objects.filter(email=value).exists():
-            raise serializers.ValidationError("This email is already registered.")
-        return value
 
-# --- Monitoring Serializers ---
+def parse_fields(value, allowed, default):
+    """Validated tuple of field names from a comma-separated ?fields= value.
 
-class AlertLogSerializer(serializers.ModelSerializer):
-    """Serializer for AlertLog (the new HealthLog)"""
-    class Meta:
-        model = AlertLog
-        fields = '__all__'
-        read_only_fields = ('website', 'timestamp')
+    Raises ValueError naming the unknown fields.
+    """
+    if not value:
+        return tuple(default)
+    fields = tuple(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+    unknown = [name for name in fields if name not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(allowed)}.")
+    return fields
 
-class MonitoredWebsiteSerializer(serializers.ModelSerializer):
-    # This field name must match the related_name defined in models.py (alert_logs)
-    alert_logs = AlertLogSerializer(many=True, read_only=True, source='alertlog_set')
 
-    class Meta:
-        model = MonitoredWebsite
-        fields = '__all__'
-        read_only_fields = ('user', 'status', 'last_check', 'last_latency_ms')
\ No newline at end of file
+def serialize_row(row, fields):
+    """A .values() row (or bucket dict) restricted to `fields`, with datetimes as ISO-8601."""
+    data = {}
+    for name in fields:
+        value = row[name]
+        data[name] = value.isoformat() if hasattr(value, 'isoformat') else value
+    return data
@@ -0,0 +1,44 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .contacts import invalidate_contacts
+from .models import AlertContact, Website
+from .snapshots import forget_site
+
+
+@receiver(pre_save, sender=AlertContact)
+def remember_contact_owner(sender, instance, **kwargs):
+    """Notes the stored owner, so a contact moved to another user is dropped from both caches."""
+    instance._stored_user_id = None
+    if instance.pk is not None:
+        instance._stored_user_id = sender.objects.filter(pk=instance.pk).values_list('user_id', flat=True).first()
+
+
+@receiver(post_save, sender=AlertContact)
+@receiver(post_delete, sender=AlertContact)
+def invalidate_contact_cache(sender, instance, **kwargs):
+    """Drops the cached contact lists of the contact's users (see monitor.contacts).
+
+    Runs after commit: dropping the entry earlier lets a concurrent reader
+    cache the old rows again before the change is visible.
+    """
+    user_ids = {instance.user_id, getattr(instance, '_stored_user_id', None)} - {None}
+
+    def invalidate():
+        for user_id in user_ids:
+            invalidate_contacts(user_id)
+
+    transaction.on_commit(invalidate)
+
+
+@receiver(post_save, sender=Website)
+@receiver(post_delete, sender=Website)
+def invalidate_status_snapshot(sender, instance, **kwargs):
+    """Drops the site from its user's cached status snapshot (see monitor.snapshots).
+
+    Runs after commit, like invalidate_contact_cache. The ids are read now:
+    a deleted instance has no pk left by then.
+    """
+    site_id, user_id = instance.pk, instance.user_id
+    transaction.on_commit(lambda: forget_site(site_id, user_id))
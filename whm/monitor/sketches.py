@@ -0,0 +1,164 @@
+import math
+import struct
+
+# =================================================================
+# DDSketch: Mergeable Quantile Sketch for Response Times
+# =================================================================
+# Values are counted in logarithmic bins, so any quantile is answered with a
+# bounded *relative* error (1% by default) no matter how many values were
+# added. Two sketches merge by adding bin counts, which is what lets us keep
+# one small sketch per site per time bucket and combine buckets to answer
+# percentiles for any window without touching raw CheckResult rows.
+# See Masson et al., "DDSketch" (VLDB 2019).
+
+DEFAULT_RELATIVE_ACCURACY = 0.01
+DEFAULT_MAX_BINS = 2048
+MIN_INDEXABLE_VALUE = 1e-3  # Values at or below this (e.g. 0 ms) go into the zero bin
+
+_HEADER = struct.Struct('<BdQQddd')  # version, accuracy, count, zero_count, min, max, sum
+_VERSION = 1
+
+
+def _write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, pos):
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _zigzag(n):
+    return (n << 1) ^ (n >> 63)
+
+
+def _unzigzag(n):
+    return (n >> 1) ^ -(n & 1)
+
+
+class DDSketch:
+    """Relative-error quantile sketch over non-negative values (milliseconds here)."""
+
+    def __init__(self, relative_accuracy=DEFAULT_RELATIVE_ACCURACY, max_bins=DEFAULT_MAX_BINS):
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins = {}
+        self.zero_count = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self.sum = 0.0
+
+    def __len__(self):
+        return self.count
+
+    def _index(self, value):
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def _value(self, index):
+        # Midpoint of bin (gamma^(i-1), gamma^i], which is within the relative accuracy of any value in it.
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def add(self, value, weight=1):
+        if value <= MIN_INDEXABLE_VALUE:
+            self.zero_count += weight
+        else:
+            index = self._index(value)
+            self.bins[index] = self.bins.get(index, 0) + weight
+            if len(self.bins) > self.max_bins:
+                self._collapse()
+        self.count += weight
+        self.sum += value * weight
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def _collapse(self):
+        """Folds the lowest bins together so high quantiles keep their accuracy."""
+        indexes = sorted(self.bins)
+        overflow = indexes[:len(indexes) - self.max_bins + 1]
+        target = indexes[len(overflow)]
+        self.bins[target] += sum(self.bins.pop(i) for i in overflow)
+
+    def merge(self, other):
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge sketches with different relative accuracy.")
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+        if len(self.bins) > self.max_bins:
+            self._collapse()
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def quantile(self, q):
+        """Approximate q-quantile (0 <= q <= 1), or None for an empty sketch."""
+        if not self.count:
+            return None
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+
+        rank = q * (self.count - 1)
+        running = self.zero_count
+        if running > rank:
+            return 0.0
+        for index in sorted(self.bins):
+            running += self.bins[index]
+            if running > rank:
+                return min(max(self._value(index), self.min), self.max)
+        return self.max
+
+    @property
+    def avg(self):
+        return self.sum / self.count if self.count else None
+
+    def to_bytes(self):
+        """Compact encoding: fixed header + delta/zigzag varint bin indexes and varint counts."""
+        out = bytearray(_HEADER.pack(
+            _VERSION, self.relative_accuracy, self.count, self.zero_count,
+            self.min if self.count else 0.0, self.max if self.count else 0.0, self.sum,
+        ))
+        _write_varint(out, len(self.bins))
+        previous = 0
+        for index in sorted(self.bins):
+            _write_varint(out, _zigzag(index - previous))
+            _write_varint(out, self.bins[index])
+            previous = index
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data, max_bins=DEFAULT_MAX_BINS):
+        data = bytes(data)
+        version, accuracy, count, zero_count, low, high, total = _HEADER.unpack_from(data)
+        if version != _VERSION:
+            raise ValueError(f"Unsupported sketch encoding version {version}.")
+
+        sketch = cls(accuracy, max_bins)
+        sketch.count, sketch.zero_count, sketch.sum = count, zero_count, total
+        if count:
+            sketch.min, sketch.max = low, high
+
+        pos = _HEADER.size
+        nbins, pos = _read_varint(data, pos)
+        index = 0
+        for _ in range(nbins):
+            delta, pos = _read_varint(data, pos)
+            bin_count, pos = _read_varint(data, pos)
+            index += _unzigzag(delta)
+            sketch.bins[index] = bin_count
+        return sketch
@@ -0,0 +1,109 @@
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .livefeed import live_state
+from .models import Website
+
+# =================================================================
+# Status Snapshots (Write-Through Cache)
+# =================================================================
+# The current state of every site is kept in the cache by the checker, so
+# the dashboard socket (monitor.consumers) and the status endpoint never read
+# Website rows on the hot path:
+#   site-status:<site id>          {'n': name, 'u', 'c', 'r', 't'} (live fields)
+#   user-sites:<user id>           the user's site ids (dropped by monitor.signals)
+#   user-status-version:<user id>  bumped after each write to any of the user's sites
+#   user-status-body:<user>:<ver>  the encoded snapshot for that version
+# A client polling with If-None-Match costs one cache read (the version) and
+# gets a 304; a changed version is encoded once and shared by every poller
+# and socket of that user. Evicted entries are rebuilt from the database.
+
+SITE_KEY = 'site-status:{}'
+USER_SITES_KEY = 'user-sites:{}'
+VERSION_KEY = 'user-status-version:{}'
+BODY_KEY = 'user-status-body:{}:{}'
+
+
+def site_status(website):
+    return {'n': website.name, **live_state(website)}
+
+
+def bump_version(user_id):
+    key = VERSION_KEY.format(user_id)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Missing or evicted: restart from the clock so an ETag issued earlier cannot match again.
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        return cache.incr(key)
+
+
+def current_version(user_id):
+    version = cache.get(VERSION_KEY.format(user_id))
+    return version if version is not None else bump_version(user_id)
+
+
+def record_statuses(websites):
+    """Writes the checked sites' states through to the cache and bumps their users' versions."""
+    cache.set_many(
+        {SITE_KEY.format(website.id): site_status(website) for website in websites},
+        timeout=settings.STATUS_SNAPSHOT_SECONDS,
+    )
+    for user_id in {website.user_id for website in websites}:
+        bump_version(user_id)
+
+
+def forget_site(site_id, user_id):
+    """Drops a created, edited or deleted site from its user's snapshot."""
+    cache.delete_many([SITE_KEY.format(site_id), USER_SITES_KEY.format(user_id)])
+    bump_version(user_id)
+
+
+def _user_site_ids(user_id):
+    key = USER_SITES_KEY.format(user_id)
+    site_ids = cache.get(key)
+    if site_ids is None:
+        site_ids = list(Website.objects.filter(user_id=user_id).order_by('pk').values_list('pk', flat=True))
+        cache.set(key, site_ids, timeout=settings.STATUS_SNAPSHOT_SECONDS)
+    return site_ids
+
+
+def _user_sites(user_id):
+    keys = {SITE_KEY.format(site_id): site_id for site_id in _user_site_ids(user_id)}
+    cached = cache.get_many(list(keys))
+    sites = {str(keys[key]): status for key, status in cached.items()}
+
+    missing = [site_id for key, site_id in keys.items() if key not in cached]
+    if missing:
+        fetched = {
+            website.id: site_status(website)
+            for website in Website.objects.filter(pk__in=missing).only(
+                'id', 'name', 'is_up', 'status_code', 'response_time', 'last_checked',
+            )
+        }
+        cache.set_many(
+            {SITE_KEY.format(site_id): status for site_id, status in fetched.items()},
+            timeout=settings.STATUS_SNAPSHOT_SECONDS,
+        )
+        sites.update((str(site_id), status) for site_id, status in fetched.items())
+    return sites
+
+
+def snapshot(user_id, version=None):
+    """(version, encoded {'type': 'snapshot', 'version', 'sites'} message) for a user."""
+    version = version if version is not None else current_version(user_id)
+    body_key = BODY_KEY.format(user_id, version)
+    body = cache.get(body_key)
+    if body is None:
+        message = {'type': 'snapshot', 'version': version, 'sites': _user_sites(user_id)}
+        body = json.dumps(message, separators=(',', ':'))
+        cache.set(body_key, body, timeout=settings.STATUS_SNAPSHOT_BODY_SECONDS)
+    return version, body
+
+
+def snapshot_message(user_id):
+    """The encoded snapshot sent to a dashboard socket on connect."""
+    return snapshot(user_id)[1]
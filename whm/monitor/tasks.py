@@ -1,14 +1,27 @@
-import requests
 from celery import shared_task
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Prefetch
 from django.utils import timezone
-from .models import Website, CheckResult, AlertContact
+from .alerts import send_sms_bulk, twilio_client
+from .archive import archive_history
+from .confirmation import load_states, record_outcome, save_states
+from .contacts import active_contacts, active_contacts_many
+from .incidents import handle_transitions, notify_due_incidents
+from .livefeed import live_state, publisher, state_diff
+from .mailer import build_alert_email, build_digest_email, mailer
+from .models import Website, CheckResult, ContentAssertion, QueuedEmailAlert
+from .partitions import ensure_partitions, prune_history
+from .prober import PHASE_FIELDS, run_probes
+from .rollups import update_rollups
+from .scheduler import claim_due_websites
+from .snapshots import record_statuses
+from .writebuffer import ResultWriteBuffer
 import logging
-from twilio.rest import Client
-from django.core.mail import EmailMultiAlternatives
-
-# Ensure requests is imported correctly. If you were getting errors before, 
-# you might need to run: pip install requests
+import random
+import smtplib
+from collections import defaultdict
+from twilio.base.exceptions import TwilioException, TwilioRestException
 
 logger = logging.getLogger(__name__)
 
@@ -19,194 +32,408 @@ def send_email_alert(contact_value, website_name, status, message):
         logger.info(f"Email alerting disabled. Skipping email to {contact_value} for {website_name}.")
         return
 
-    subject = f"ALERT: {website_name} is {status}"
-    text_content = f"""
-Website Health Monitor Alert!
-
-Website: {website_name}
-Status: {status}
-Time: {timezone.now().strftime('%Y-%m-%d %H:%M:%S')} UTC
-Details: {message}
-"""
-    html_content = f"""
-<html>
-    <body style="font-family: sans-serif; padding: 20px; border: 1px solid #ddd;">
-        <h2 style="color: {'#dc2626' if status == 'DOWN' else '#16a34a'};">
-            Website Health Monitor Alert!
-        </h2>
-        <p><strong>Website:</strong> {website_name}</p>
-        <p><strong>Status:</strong> <span style="font-weight: bold;">{status}</span></p>
-        <p><strong>Time:</strong> {timezone.now().strftime('%Y-%m-%d %H:%M:%S')} UTC</p>
-        <p><strong>Details:</strong> {message}</p>
-    </body>
-</html>
-"""
-    try:
-        msg = EmailMultiAlternatives(subject, text_content, settings.DEFAULT_FROM_EMAIL, [contact_value])
-        msg.attach_alternative(html_content, "text/html")
-        msg.send()
-        logger.info(f"Email alert sent successfully to {contact_value} for {website_name}.")
-    except Exception as e:
-        logger.error(f"Failed to send email alert to {contact_value} for {website_name}: {e}")
+    # Errors propagate so deliver_email_alert can retry them.
+    mailer.send(build_alert_email(contact_value, website_name, status, message))
+    logger.info(f"Email alert sent successfully to {contact_value} for {website_name}.")
+
+def sms_body(website_name, status, message):
+    return f"WHM ALERT: {website_name} is {status}. Details: {message[:100]}..."
 
 def send_sms_alert(contact_value, website_name, status, message):
     if not settings.SMS_ENABLED:
         logger.info(f"SMS alerting disabled. Skipping SMS to {contact_value} for {website_name}.")
         return
 
+    # NOTE: Ensure TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, and TWILIO_PHONE_NUMBER are set in settings.py
+    # Errors propagate so deliver_sms_alert can retry them.
+    client = twilio_client()  # Cached per process, so connections are reused
+
+    client.messages.create(
+        to=contact_value,
+        from_=settings.TWILIO_PHONE_NUMBER,
+        body=sms_body(website_name, status, message)
+    )
+    logger.info(f"SMS alert sent successfully to {contact_value} for {website_name}.")
+
+
+# --- Alert Delivery Queue ---
+# Checkers only enqueue; these tasks run on their own per-channel queues
+# (CELERY_TASK_ROUTES), rate limited, and retried with exponential backoff.
+
+def _retry_delivery(task, exc, channel, contact_value, args=None):
+    """Re-queues a failed delivery with jittered exponential backoff, or gives up after max_retries."""
+    retries = task.request.retries
+    if retries >= task.max_retries:
+        logger.error(f"Giving up on {channel} alert to {contact_value} after {retries} retries: {exc}")
+        return
+    countdown = min(5 * 2 ** retries, settings.ALERT_RETRY_BACKOFF_MAX_SECONDS)
+    countdown = random.uniform(countdown / 2, countdown)
+    logger.warning(f"{channel} alert to {contact_value} failed ({exc}); retry {retries + 1} in {countdown:.0f}s.")
+    raise task.retry(exc=exc, countdown=countdown, args=args)
+
+
+def _sms_retryable(exc):
+    """Only throttling, provider outages and network errors are worth retrying.
+
+    Other Twilio errors are 4xx rejections or configuration problems (missing
+    credentials), which fail the same way on every attempt.
+    """
+    if isinstance(exc, TwilioRestException):
+        return exc.status == 429 or (exc.status or 0) >= 500
+    return isinstance(exc, OSError)  # requests' connection errors and timeouts included
+
+
+@shared_task(bind=True, acks_late=True, rate_limit=settings.ALERT_EMAIL_RATE_LIMIT, max_retries=settings.ALERT_MAX_RETRIES)
+def deliver_email_alert(self, contact_value, website_name, status, message):
+    """Sends one email alert from the email queue."""
+    try:
+        send_email_alert(contact_value, website_name, status, message)
+    except smtplib.SMTPRecipientsRefused as e:
+        logger.error(f"Email alert to {contact_value} for {website_name} rejected permanently: {e}")
+    except (smtplib.SMTPException, OSError) as e:
+        _retry_delivery(self, e, 'Email', contact_value)
+
+
+@shared_task(bind=True, acks_late=True, rate_limit=settings.ALERT_SMS_RATE_LIMIT, max_retries=settings.ALERT_MAX_RETRIES)
+def deliver_sms_alert(self, contact_value, website_name, status, message):
+    """Sends one SMS alert from the SMS queue."""
     try:
-        # NOTE: Ensure TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, and TWILIO_PHONE_NUMBER are set in settings.py
-        client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
-        body = f"WHM ALERT: {website_name} is {status}. Details: {message[:100]}..."
-        
-        client.messages.create(
-            to=contact_value,
-            from_=settings.TWILIO_PHONE_NUMBER,
-            body=body
+        send_sms_alert(contact_value, website_name, status, message)
+    except (TwilioException, OSError) as e:
+        if _sms_retryable(e):
+            _retry_delivery(self, e, 'SMS', contact_value)
+        else:  # Invalid number, unverified recipient, bad credentials, ...: retrying cannot help
+            logger.error(f"SMS alert to {contact_value} for {website_name} dropped: {e}")
+
+
+@shared_task(bind=True, acks_late=True, max_retries=settings.ALERT_MAX_RETRIES)
+def deliver_sms_bulk(self, numbers, website_name, status, message):
+    """Sends one SMS alert to many numbers in parallel, rate limited by SMS_RATE_PER_SECOND.
+
+    Only the numbers that failed with a transient error are retried.
+    """
+    if not settings.SMS_ENABLED:
+        return
+    failures = send_sms_bulk(numbers, sms_body(website_name, status, message))
+    retry_numbers = []
+    for number, exc in failures.items():
+        if _sms_retryable(exc):
+            retry_numbers.append(number)
+        else:
+            logger.error(f"SMS alert to {number} for {website_name} dropped: {exc}")
+    if retry_numbers:
+        exc = failures[retry_numbers[0]]
+        _retry_delivery(
+            self, exc, 'SMS', f"{len(retry_numbers)} numbers",
+            args=[retry_numbers, website_name, status, message],
         )
-        logger.info(f"SMS alert sent successfully to {contact_value} for {website_name}.")
-    except Exception as e:
-        logger.error(f"Failed to send SMS alert to {contact_value} for {website_name}: {e}")
+
+
+@shared_task
+def flush_email_digests():
+    """Sends queued email alerts, one digest per contact, over the pooled SMTP connection.
+
+    Rows are claimed and deleted in a short transaction and mailed after it
+    commits, so no row locks are held while talking to SMTP. Digests that
+    fail temporarily are queued again for the next run.
+    """
+    with transaction.atomic():
+        # skip_locked lets an overlapping run skip rows another flush is claiming.
+        queued = list(
+            QueuedEmailAlert.objects.select_for_update(skip_locked=True)
+            .select_related('contact')
+            .order_by('created_at', 'id')[:settings.ALERT_DIGEST_MAX_ALERTS_PER_RUN]
+        )
+        if not queued:
+            return 0
+        QueuedEmailAlert.objects.filter(pk__in=[alert.pk for alert in queued]).delete()
+
+    by_contact = defaultdict(list)
+    for alert in queued:
+        by_contact[alert.contact].append(alert)
+
+    digests, retry = {}, []  # id(message) -> (message, alerts)
+    for contact, alerts in by_contact.items():
+        if contact.email and contact.is_active and settings.EMAIL_ENABLED:
+            message = build_digest_email(contact.email, alerts)
+            digests[id(message)] = (message, alerts)
+
+    def on_error(message, exc):
+        _, alerts = digests.pop(id(message))
+        if isinstance(exc, smtplib.SMTPRecipientsRefused) or alerts[0].attempts + 1 >= settings.ALERT_MAX_RETRIES:
+            logger.error(f"Dropping {len(alerts)} email alerts for {message.to[0]}: {exc}")
+        else:
+            logger.warning(f"Email digest to {message.to[0]} failed ({exc}); will retry next run.")
+            retry.extend(alerts)
+
+    sent = mailer.send_messages([message for message, _ in list(digests.values())], on_error=on_error)
+    if retry:
+        requeue_email_alerts(retry)
+
+    logger.info(f"Sent {sent} email digests covering {len(queued)} alerts.")
+    return sent
+
+
+def requeue_email_alerts(alerts):
+    """Queues already claimed alerts again with one more attempt, keeping their original times."""
+    requeued = QueuedEmailAlert.objects.bulk_create([
+        QueuedEmailAlert(
+            contact_id=alert.contact_id, website_name=alert.website_name, status=alert.status,
+            message=alert.message, attempts=alert.attempts + 1,
+        )
+        for alert in alerts
+    ])
+    # auto_now_add stamps new rows with the current time; digests list alerts by when they happened.
+    for row, alert in zip(requeued, alerts):
+        QueuedEmailAlert.objects.filter(pk=row.pk).update(created_at=alert.created_at)
+
 
 def trigger_alerts(website, new_status, message):
-    """Triggers all active alerts for the given website's user."""
+    """Queues all active alerts for the given website's user."""
     # Note: Alerts are sent to the user associated with the website.
-    contacts = AlertContact.objects.filter(user=website.user, is_active=True).select_related('user')
-    
-    for contact in contacts:
-        website_name = website.name
-        
-        if contact.email:
-            send_email_alert(contact.email, website_name, new_status, message)
-        if contact.phone_number:
-            send_sms_alert(contact.phone_number, website_name, new_status, message)
+    notify_user(website.user_id, website.name, new_status, message)
 
-# --- Core Task ---
 
-@shared_task(bind=True)
-def check_website(self, website_id):
-    """Performs a single health check on a Website object."""
-    try:
-        website = Website.objects.get(pk=website_id)
-    except Website.DoesNotExist:
-        logger.error(f"Website with ID {website_id} not found.")
-        return
+def notify_user(user_id, website_name, new_status, message, contacts=None, digest_alerts=None):
+    """Queues an alert to every active contact of a user (for one site or a grouped incident).
 
-    url = website.url
-    method = website.http_method
-    
-    # Initialize variables
-    is_up = False
-    status_code = 0
-    response_time_ms = 0
-    error_message = None
-    new_status = 'UNKNOWN' # Default state
-    
-    try:
-        start_time = timezone.now()
-        # Ensure requests is installed and imported: import requests
-        response = requests.request(method, url, timeout=15, allow_redirects=True)
-        end_time = timezone.now()
-        response_time_ms = int((end_time - start_time).total_seconds() * 1000)
-        status_code = response.status_code
-        
-        if 200 <= status_code < 400:
-            is_up = True
-            new_status = 'UP'
+    `contacts` are the user's (id, email, phone_number) tuples when already
+    fetched for a batch; otherwise they come from the contact cache. Digest
+    rows are appended to `digest_alerts` when given, for the caller to insert.
+    """
+    if contacts is None:
+        contacts = active_contacts(user_id)
+    phone_numbers = []
+    pending_digests = [] if digest_alerts is None else digest_alerts
+
+    for contact_id, email, phone_number in contacts:
+
+        # Enqueue only: delivery happens on the alert queues, off the checker's hot path.
+        if email and settings.EMAIL_ENABLED:
+            if settings.ALERT_EMAIL_DIGEST_SECONDS:
+                # Coalesced per contact by flush_email_digests.
+                pending_digests.append(QueuedEmailAlert(
+                    contact_id=contact_id, website_name=website_name, status=new_status, message=message,
+                ))
+            else:
+                deliver_email_alert.delay(email, website_name, new_status, message)
+        if phone_number and settings.SMS_ENABLED:
+            phone_numbers.append(phone_number)
+
+    if digest_alerts is None:
+        QueuedEmailAlert.objects.bulk_create(pending_digests)
+    if len(phone_numbers) == 1:
+        deliver_sms_alert.delay(phone_numbers[0], website_name, new_status, message)
+    elif phone_numbers:
+        deliver_sms_bulk.delay(phone_numbers, website_name, new_status, message)
+
+
+def alert_on_transitions(transitions):
+    """Sends alerts for a batch of status changes, grouped into incidents when enabled."""
+    if not transitions:
+        return
+    notifications, grouped = [], []
+    for transition in transitions:
+        # FLAPPING notices are per site; UP/DOWN go through the incident engine when enabled.
+        if settings.INCIDENT_GROUP_WAIT_SECONDS and transition['status'] != 'FLAPPING':
+            grouped.append(transition)
         else:
-            is_up = False
-            new_status = 'DOWN'
-            error_message = f"HTTP Status Code {status_code}"
-            
-    except requests.exceptions.Timeout:
-        status_code = 408
-        is_up = False
-        new_status = 'DOWN'
-        error_message = "Request timed out after 15 seconds."
-        
-    except requests.exceptions.RequestException as e:
-        status_code = 0
-        is_up = False
-        new_status = 'DOWN'
-        error_message = str(e)
-        
-    # 1. Save the result
-    CheckResult.objects.create(
+            website = transition['website']
+            notifications.append((website.user_id, website.name, transition['status'], transition['message']))
+    if grouped:
+        notifications.extend(handle_transitions(grouped))
+    notify_users(notifications)
+
+
+def notify_users(notifications):
+    """Delivers (user_id, name, status, message) notifications with one contact lookup and one digest insert."""
+    contacts = active_contacts_many(notification[0] for notification in notifications)
+    digest_alerts = []
+    for notification in notifications:
+        notify_user(*notification, contacts=contacts[notification[0]], digest_alerts=digest_alerts)
+    QueuedEmailAlert.objects.bulk_create(digest_alerts)
+
+
+@shared_task
+def notify_incidents():
+    """Sends the grouped DOWN notifications of incidents whose group wait has elapsed."""
+    notifications = notify_due_incidents()
+    notify_users(notifications)
+    return len(notifications)
+
+# --- Core Task ---
+
+def record_check_result(website, result, buffer, state):
+    """Queues a probe result and the Website update.
+
+    Returns (transition or None, whether to re-probe soon to confirm a change).
+    """
+    status_code = result['status_code']
+    response_time_ms = result['response_time_ms']
+    is_up = result['is_up']
+    error_message = result['error_message']
+    new_status = 'UP' if is_up else 'DOWN'
+
+    # 1. Build the result row (written later in bulk by the buffer)
+    check_result = CheckResult(
         website=website,
         status_code=status_code,
         response_time_ms=response_time_ms,
         is_up=is_up,
-        error_message=error_message
+        error_message=error_message,
+        connection_reused=result['connection_reused'],
+        bytes_transferred=result['bytes_transferred'],
+        assertions_passed=result['assertions_passed'],
+        **{field: result[field] for field in PHASE_FIELDS},
     )
 
     # 2. Update Website Fields
     website.last_checked = timezone.now()
     website.status_code = status_code
     website.response_time = response_time_ms
-    
-    # 3. Trigger Alert if status has changed (FIXED LOGIC)
-    
-    # Get the status BEFORE we update the website object
-    # The 'is_up' field is what tracks the status in your model
-    old_status_bool = website.is_up
-    
-    # Convert old boolean to string for easier comparison/alert message consistency
-    # On first run, it defaults to True, which is 'UP'. We use the value from the model.
-    old_status = 'UP' if old_status_bool else 'DOWN'
-    
-    # Update the model with the new health status
-    website.is_up = is_up
-    
-    # Now compare the old string status with the new string status
-    if old_status != new_status:
-        
-        if new_status == 'DOWN':
+
+    # 3. Trigger Alert if the confirmed status has changed
+
+    # The raw outcome goes through the confirmation policy (N-of-M, fast
+    # re-probes, flap dampening); only confirmed changes flip is_up and alert.
+    alert, retry = record_outcome(state, is_up)
+    website.is_up = state.is_up
+
+    transition = None
+    if alert is not None:
+
+        if alert == 'DOWN':
             logger.warning(f"Status change detected: {website.name} is now DOWN. Triggering alerts.")
-            trigger_alerts(website, new_status, error_message or "Connection failed")
-        
-        elif new_status == 'UP' and old_status == 'DOWN':
+            message = error_message or "Connection failed"
+
+        elif alert == 'UP':
             # Send recovery alert
             logger.info(f"Status change detected: {website.name} is now UP (Recovery).")
-            trigger_alerts(website, new_status, "Recovery: The website is back online.")
-            
-    # Save all updates to the Website model
-    website.save()
-    
-    logger.info(f"Checked {url}: Status={new_status}, Code={status_code}, Time={response_time_ms}ms")
+            message = "Recovery: The website is back online."
+
+        else:
+            logger.warning(f"{website.name} is flapping; alerts are dampened until it settles.")
+            message = "The website keeps changing state; further alerts are held until it settles."
+
+        # Alerts go out per batch (alert_on_transitions), so correlated changes can be grouped.
+        transition = {
+            'website': website, 'status': alert, 'message': message, 'remote_ip': result['remote_ip'],
+        }
+
+    # 4. Hand both writes to the buffer (bulk_create / bulk_update of the status fields)
+    buffer.add(website, check_result)
+
+    logger.debug(f"Checked {website.url}: Status={new_status}, Code={status_code}, Time={response_time_ms}ms")
+    return transition, retry
+
+
+def check_websites(website_ids):
+    """Probes a batch of websites concurrently on one event loop and records the results."""
+    active_assertions = Prefetch('assertions', queryset=ContentAssertion.objects.filter(is_active=True))
+    websites = {
+        website.id: website
+        for website in Website.objects.filter(pk__in=website_ids).prefetch_related(active_assertions)
+    }
+
+    missing = set(website_ids) - set(websites)
+    for website_id in missing:
+        logger.error(f"Website with ID {website_id} not found.")
+
+    targets = [
+        {
+            'id': website.id,
+            'url': website.url,
+            'method': website.http_method,
+            'fresh_connection': website.probe_fresh_connection,
+            'fresh_dns': website.probe_fresh_dns,
+            'probe_mode': website.probe_mode,
+            'max_body_bytes': website.max_body_bytes,
+            'assertions': tuple(
+                (assertion.kind, assertion.expression, assertion.expected_value)
+                for assertion in website.assertions.all()
+            ),
+        }
+        for website in websites.values()
+    ]
+    buffer = ResultWriteBuffer()
+    states = load_states(list(websites.values()))
+    transitions, retry_ids, live_updates = [], [], []
+    for result in run_probes(targets):
+        website_id = result['website_id']
+        website = websites[website_id]
+        before = live_state(website)
+        transition, retry = record_check_result(website, result, buffer, states[website_id])
+        if transition is not None:
+            transitions.append(transition)
+        if retry:
+            retry_ids.append(website_id)
+        live_updates.append((website.user_id, website_id, state_diff(before, live_state(website))))
+    buffer.flush()
+    save_states(states)
+    record_statuses(list(websites.values()))
+    alert_on_transitions(transitions)
+    if settings.LIVE_UPDATES_ENABLED:
+        publisher.add_many(live_updates)
+
+    if retry_ids:
+        # Fast re-probe to confirm (or dismiss) a state change without waiting a full interval.
+        check_website_batch.apply_async(args=[retry_ids], countdown=settings.CONFIRM_RETRY_SECONDS)
+
+    return len(targets)
+
+
+@shared_task(bind=True)
+def check_website(self, website_id):
+    """Performs a single health check on a Website object."""
+    check_websites([website_id])
+
+@shared_task
+def check_website_batch(website_ids):
+    """Performs health checks for a chunk of Website IDs in a single task."""
+    checked = check_websites(website_ids)
+    logger.info(f"Batch complete: checked {checked} of {len(website_ids)} websites.")
+
+
+def chunked(items, size):
+    """Splits a list into consecutive chunks of at most `size` items."""
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def dispatch_checks(website_ids):
+    """Queues checks for the given IDs, batched or one message per site per settings."""
+    if settings.CHECK_BATCH_DISPATCH:
+        batches = chunked(website_ids, settings.CHECK_BATCH_SIZE)
+        for batch in batches:
+            check_website_batch.delay(batch)
+        logger.info(f"Queued {len(website_ids)} due checks in {len(batches)} batches.")
+    else:
+        for website_id in website_ids:
+            check_website.delay(website_id)
+        logger.info(f"Queued {len(website_ids)} due checks individually.")
+
 
 @shared_task
 def run_all_checks():
     """Celery Beat task to queue checks for all websites that are due."""
-    now = timezone.now()
-    websites = Website.objects.all()
-    
-    for website in websites:
-        # Note: You have 'website.frequency' in your code, but your model only shows 'interval'.
-        # Assuming you meant 'interval' based on the frontend logic. 
-        # If 'frequency' is correct, ensure it is added to your Website model in models.py.
-        # FIXING TO USE A DEFAULT LOGIC or assuming a field exists. Since interval is not in models.py 
-        # but 'http_method' is, I will stick to the previous code structure for the check.
-        
-        # NOTE: Your model is missing a 'frequency' or 'interval' field. 
-        # I'm making a reasonable assumption that you had a field like 'frequency_minutes' or similar
-        # in mind. I will use a placeholder (1 minute) for now, as your code has a variable name issue.
-        
-        # --- POTENTIAL ISSUE HERE: Your model.py is missing the frequency/interval field. ---
-        # Assuming you want to use a fixed 1-minute interval for all sites based on your frontend logic:
-        check_interval = timezone.timedelta(minutes=1) 
-        # If you have a field like 'interval_minutes' in your model, use:
-        # check_interval = timezone.timedelta(minutes=website.interval_minutes)
-        # -------------------------------------------------------------------------------------
-
-        if website.last_checked:
-            time_since_last_check = now - website.last_checked
-            
-            if time_since_last_check >= check_interval:
-                check_website.delay(website.id)
-                logger.info(f"Queued check for {website.name}")
-        else:
-            # Check immediately if never checked before
-            check_website.delay(website.id)
-            logger.info(f"Queued initial check for {website.name}")
-            
-    logger.info(f"Finished queuing checks for {websites.count()} websites.")
\ No newline at end of file
+    # Only rows with next_check_at <= now are read, via the next_check_at index,
+    # and each claimed site is pushed forward by its own check_interval_seconds.
+    due_ids = claim_due_websites()
+    if due_ids:
+        dispatch_checks(due_ids)
+
+
+@shared_task
+def maintain_check_history():
+    """Celery Beat task: creates upcoming history partitions, archives and prunes old history."""
+    ensure_partitions()
+    if settings.CHECKRESULT_ARCHIVE_ENABLED:
+        archive_history()
+    prune_history()
+
+
+@shared_task
+def update_check_rollups():
+    """Celery Beat task: folds new check results into the 1m/1h/1d rollups."""
+    for _ in range(settings.ROLLUP_MAX_BATCHES_PER_RUN):
+        if update_rollups() < settings.ROLLUP_BATCH_SIZE:
+            break
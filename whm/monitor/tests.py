@@ -0,0 +1,1228 @@
+import asyncio
+import csv
+import gzip
+import io
+import json
+import math
+import smtplib
+import re
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from channels.layers import get_channel_layer
+from django.contrib.auth.models import AnonymousUser
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from requests.exceptions import ConnectionError as RequestsConnectionError
+from twilio.base.exceptions import TwilioException, TwilioRestException
+
+from . import analytics, archive
+from .alerts import TokenBucket, send_sms_bulk
+from .assertions import ContentCheck
+from .confirmation import SiteState, record_outcome
+from .consumers import LiveDashboardConsumer
+from .contacts import active_contacts
+from .dnscache import DNSCache, DNSLookupError
+from .exports import export_stream
+from .fakeproviders import FakeTwilioServer
+from .history import parse_time
+from .incidents import handle_transitions, notify_due_incidents
+from .latency import merged_sketch, record_latency_sketches
+from .livefeed import LiveUpdatePublisher, user_group
+from .models import (
+    AlertContact, CheckResult, CheckRollup, CustomUser, Incident, IncidentSite, LatencySketch, QueuedEmailAlert,
+    RollupWatermark, Website,
+)
+from .partitions import DEFAULT_PARTITION, convert_to_partitioned, ensure_partitions, prune_history
+from .prober import run_probes
+from .rollups import WATERMARK_NAME, update_rollups
+from .scheduler import claim_due_websites, claim_websites
+from .sketches import DDSketch
+from .mailer import mailer
+from .tasks import (
+    _retry_delivery, _sms_retryable, deliver_email_alert, flush_email_digests, requeue_email_alerts,
+)
+from .writebuffer import ResultWriteBuffer
+
+
+class _OKHandler(BaseHTTPRequestHandler):
+    """Answers 200 'ok' (200 kB of 'x' for paths containing /big); /slow paths take 0.3s.
+
+    A 'bytes=0-N' Range gets a 206 with that prefix, and HEAD is refused (405)
+    under /nohead. Paths are logged in arrival order, GETs in `paths` and
+    every request as (method, path, Range header) in `requests`.
+    """
+    protocol_version = 'HTTP/1.1'
+    paths = []
+    requests = []
+
+    def _body(self):
+        return b'x' * 200_000 if '/big' in self.path else b'ok'
+
+    def do_GET(self):
+        self.paths.append(self.path)
+        self.requests.append(('GET', self.path, self.headers.get('Range')))
+        if self.path.startswith('/slow'):
+            time.sleep(0.3)
+        body = self._body()
+        byte_range = re.fullmatch(r'bytes=0-(\d+)', self.headers.get('Range', ''))
+        if byte_range:
+            body = body[:int(byte_range.group(1)) + 1]
+        self.send_response(206 if byte_range else 200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_HEAD(self):
+        self.requests.append(('HEAD', self.path, None))
+        if self.path.startswith('/nohead'):
+            self.send_response(405)
+            self.send_header('Content-Length', '0')
+        else:
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(self._body())))
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class LocalServerMixin:
+    """Serves _OKHandler on random ports of two loopback addresses (two distinct hosts)."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.servers = []
+        for address in ('127.0.0.1', '127.0.0.2'):
+            server = ThreadingHTTPServer((address, 0), _OKHandler)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            cls.servers.append(server)
+        cls.url, cls.other_url = (f"http://{s.server_address[0]}:{s.server_port}/" for s in cls.servers)
+
+    @classmethod
+    def tearDownClass(cls):
+        for server in cls.servers:
+            server.shutdown()
+            server.server_close()
+        super().tearDownClass()
+
+
+def _user(mobile_number='5550000001'):
+    return CustomUser.objects.create_user(mobile_number, 'secret')
+
+
+def _website(user, name='site', **fields):
+    fields.setdefault('url', f'https://{name}.example.com/')
+    return Website.objects.create(user=user, name=name, **fields)
+
+
+def _target(website_id, url, **options):
+    return {'id': website_id, 'url': url, 'method': 'GET', **options}
+
+
+# --- Probe engine (monitor.prober) ---
+
+class ProbeEngineTests(LocalServerMixin, SimpleTestCase):
+    def test_batch_results(self):
+        results = run_probes([_target(1, self.url), _target(2, self.url)])
+        self.assertEqual([r['website_id'] for r in results], [1, 2])
+        self.assertTrue(all(r['is_up'] and r['status_code'] == 200 for r in results))
+        self.assertEqual(results[0]['bytes_transferred'], 2)
+
+    def test_invalid_url_fails_only_its_own_probe(self):
+        results = run_probes([_target(1, 'http://[::1/'), _target(2, 'not a url'), _target(3, self.url)])
+        self.assertEqual([r['website_id'] for r in results], [1, 2, 3])
+        self.assertFalse(results[0]['is_up'])
+        self.assertEqual(results[0]['status_code'], 0)
+        self.assertIn('Invalid URL', results[0]['error_message'])
+        self.assertFalse(results[1]['is_up'])
+        self.assertTrue(results[2]['is_up'])
+
+    def test_connection_reuse(self):
+        run_probes([_target(1, self.url)])
+        warm, cold = run_probes([_target(1, self.url), _target(2, self.other_url, fresh_connection=True)])
+        self.assertIs(warm['connection_reused'], True)
+        self.assertIs(cold['connection_reused'], False)
+
+    def test_no_connection_means_no_reuse_flag(self):
+        results = run_probes([_target(1, 'ftp://127.0.0.1/'), _target(2, 'not a url')])
+        self.assertEqual([r['connection_reused'] for r in results], [None, None])
+
+    @override_settings(PROBE_MAX_CONNECTIONS_PER_HOST=1)
+    def test_slow_host_does_not_hold_global_slots(self):
+        _OKHandler.paths.clear()
+        slow = [_target(i, f"{self.url}slow{i}") for i in range(3)]
+        run_probes(slow + [_target(9, f"{self.other_url}fast")], concurrency=2)
+        # The other host's probe gets the free global slot while the slow host's probes queue.
+        self.assertEqual(_OKHandler.paths[:2], ['/slow0', '/fast'])
+
+
+class ProbeModeTests(LocalServerMixin, SimpleTestCase):
+    def setUp(self):
+        _OKHandler.requests.clear()
+
+    def test_head_mode_reads_no_body(self):
+        result, = run_probes([_target(1, f"{self.url}big", probe_mode='head')])
+        self.assertEqual((result['status_code'], result['bytes_transferred']), (200, 0))
+        self.assertEqual(_OKHandler.requests, [('HEAD', '/big', None)])
+
+    def test_head_mode_falls_back_to_a_capped_get(self):
+        result, = run_probes([_target(1, f"{self.url}nohead/big", probe_mode='head', max_body_bytes=1000)])
+        self.assertTrue(result['is_up'])
+        self.assertEqual(result['status_code'], 200)
+        self.assertLess(result['bytes_transferred'], 200_000)
+        self.assertEqual([method for method, _, _ in _OKHandler.requests], ['HEAD', 'GET'])
+
+    def test_capped_and_range_modes_stop_early(self):
+        capped, ranged, full = run_probes([
+            _target(1, f"{self.url}big", probe_mode='capped', max_body_bytes=1000),
+            _target(2, f"{self.url}big", probe_mode='range', max_body_bytes=1000),
+            _target(3, f"{self.url}big"),
+        ])
+        self.assertTrue(capped['is_up'])
+        self.assertLess(capped['bytes_transferred'], 200_000)
+        self.assertEqual((ranged['status_code'], ranged['bytes_transferred']), (206, 1000))
+        self.assertIn(('GET', '/big', 'bytes=0-999'), _OKHandler.requests)
+        self.assertEqual(full['bytes_transferred'], 200_000)
+
+
+# --- Content assertions (monitor.assertions) ---
+
+class ContentAssertionTests(SimpleTestCase):
+    def _check(self, assertions, *chunks, truncated=False):
+        check = ContentCheck(assertions)
+        for chunk in chunks:
+            check.feed(chunk)
+            if check.done:
+                break
+        return check.finish(truncated)
+
+    def test_substring_found_across_chunks(self):
+        self.assertEqual(self._check([('substring', 'hello', '')], b'..hel', b'lo..'), (True, None))
+        passed, failure = self._check([('substring', 'bye', '')], b'hello')
+        self.assertFalse(passed)
+        self.assertIn("'bye' not found", failure)
+
+    def test_regex_and_invalid_assertions(self):
+        self.assertTrue(self._check([('regex', r'v\d+', '')], b'version v12')[0])
+        self.assertFalse(self._check([('regex', '(', '')], b'anything')[0])
+
+    def test_jsonpath_compares_type_and_value(self):
+        body = b'{"ok": 1, "status": "up", "ratio": 1.0, "tags": [true]}'
+        self.assertTrue(self._check([('jsonpath', '$.status', 'up')], body)[0])
+        self.assertTrue(self._check([('jsonpath', '$.ratio', '1')], body)[0])
+        self.assertTrue(self._check([('jsonpath', '$.tags[0]', 'true')], body)[0])
+        self.assertFalse(self._check([('jsonpath', '$.ok', 'true')], body)[0])
+        self.assertFalse(self._check([('jsonpath', '$.ok', '"1"')], body)[0])
+        self.assertFalse(self._check([('jsonpath', '$.tags', '[1]')], body)[0])
+        self.assertFalse(self._check([('jsonpath', '$.missing', '1')], body)[0])
+
+    def test_max_size_is_not_passed_on_a_truncated_read(self):
+        self.assertEqual(self._check([('max_size', '100', '')], b'x' * 50), (True, None))
+        self.assertFalse(self._check([('max_size', '100', '')], b'x' * 101)[0])
+        self.assertFalse(self._check([('max_size', '100', '')], b'x' * 50, truncated=True)[0])
+
+
+class ContentAssertionProbeTests(LocalServerMixin, SimpleTestCase):
+    def test_capped_read_extends_to_decide_max_size(self):
+        big = f"{self.url}big"
+        over, under = run_probes([
+            _target(1, big, probe_mode='capped', max_body_bytes=100, assertions=[('max_size', '150000', '')]),
+            _target(2, big, probe_mode='capped', max_body_bytes=100, assertions=[('max_size', '300000', '')]),
+        ])
+        self.assertIs(over['assertions_passed'], False)
+        self.assertFalse(over['is_up'])
+        self.assertIs(under['assertions_passed'], True)
+        self.assertEqual(under['bytes_transferred'], 200_000)
+
+
+# --- Check history retention (monitor.partitions) ---
+
+class RetentionTests(TestCase):
+    def setUp(self):
+        self.website = _website(_user())
+
+    def test_prune_zero_days_keeps_nothing_older_than_now(self):
+        old = CheckResult.objects.create(website=self.website, status_code=200, is_up=True)
+        CheckResult.objects.filter(pk=old.pk).update(timestamp=timezone.now() - timedelta(hours=1))
+        self.assertEqual(prune_history(0), 1)
+        self.assertFalse(CheckResult.objects.exists())
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'Native partitioning needs PostgreSQL.')
+@override_settings(CHECKRESULT_PARTITIONING='day', CHECKRESULT_PARTITIONS_AHEAD=2)
+class PartitionTests(TestCase):
+    def setUp(self):
+        self.website = _website(_user())
+        self.assertTrue(convert_to_partitioned())
+
+    def _partition_of(self, result):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT tableoid::regclass::text FROM "{CheckResult._meta.db_table}" WHERE id = %s', [result.pk],
+            )
+            return cursor.fetchone()[0]
+
+    def test_row_outside_every_partition_lands_in_default(self):
+        result = CheckResult.objects.create(website=self.website, status_code=200, is_up=True)
+        later = timezone.now() + timedelta(days=400)
+        CheckResult.objects.filter(pk=result.pk).update(timestamp=later)
+        self.assertEqual(self._partition_of(result), DEFAULT_PARTITION)
+
+        # The next maintenance run gives the stray row its own partition.
+        ensure_partitions()
+        self.assertEqual(self._partition_of(result), f"{CheckResult._meta.db_table}_p{later:%Y%m%d}")
+        self.assertEqual(CheckResult.objects.get(pk=result.pk).timestamp, later)
+
+    def test_prune_drops_expired_partitions(self):
+        result = CheckResult.objects.create(website=self.website, status_code=200, is_up=True)
+        CheckResult.objects.filter(pk=result.pk).update(timestamp=timezone.now() - timedelta(days=10))
+        ensure_partitions()
+        self.assertEqual(prune_history(5), 1)
+        self.assertFalse(CheckResult.objects.exists())
+
+
+# --- Rollups (monitor.rollups) ---
+
+@override_settings(ROLLUP_SETTLE_SECONDS=30)
+class RollupTests(TestCase):
+    def setUp(self):
+        self.website = _website(_user())
+
+    def _result(self, age_seconds, is_up=True, response_time_ms=100.0):
+        result = CheckResult.objects.create(
+            website=self.website, status_code=200 if is_up else 503, is_up=is_up, response_time_ms=response_time_ms,
+        )
+        CheckResult.objects.filter(pk=result.pk).update(timestamp=timezone.now() - timedelta(seconds=age_seconds))
+        return result
+
+    def _watermark(self):
+        return RollupWatermark.objects.get(name=WATERMARK_NAME).last_id
+
+    def _rolled_up_checks(self, resolution='1d'):
+        return sum(CheckRollup.objects.filter(resolution=resolution).values_list('check_count', flat=True))
+
+    def test_rollups_count_checks_at_every_resolution(self):
+        self._result(120)
+        self._result(90, is_up=False)
+        self.assertEqual(update_rollups(), 2)
+        for resolution in ('1m', '1h', '1d'):
+            self.assertEqual(self._rolled_up_checks(resolution), 2)
+        days = CheckRollup.objects.filter(resolution='1d')
+        self.assertEqual(sum(day.up_count for day in days), 1)
+        self.assertEqual(sum(day.latency_samples for day in days), 2)  # A 503 still has a response time
+
+    def test_unsettled_lower_id_is_not_skipped(self):
+        # A flush that started later committed first: the higher id carries the older timestamp.
+        in_flight = self._result(0)
+        settled = self._result(120)
+        self.assertLess(in_flight.pk, settled.pk)
+
+        self.assertEqual(update_rollups(), 0)
+        self.assertEqual(self._watermark(), 0)
+
+        CheckResult.objects.filter(pk=in_flight.pk).update(timestamp=timezone.now() - timedelta(seconds=60))
+        self.assertEqual(update_rollups(), 2)
+        self.assertEqual(self._watermark(), settled.pk)
+        self.assertEqual(self._rolled_up_checks(), 2)
+
+    def test_batch_stops_at_first_unsettled_row(self):
+        first = self._result(120)
+        self._result(0)
+        self._result(120)
+        self.assertEqual(update_rollups(), 1)
+        self.assertEqual(self._watermark(), first.pk)
+
+
+# --- Email digests (monitor.tasks / monitor.mailer) ---
+
+@override_settings(EMAIL_ENABLED=True)
+class EmailDigestTests(TestCase):
+    def setUp(self):
+        self.contact = AlertContact.objects.create(user=_user(), email='ops@example.com')
+
+    def _queue(self, *statuses):
+        for status in statuses:
+            QueuedEmailAlert.objects.create(contact=self.contact, website_name='site', status=status, message='-')
+
+    def test_one_digest_per_contact_with_flapping_counted_separately(self):
+        self._queue('DOWN', 'UP', 'FLAPPING')
+        self.assertEqual(flush_email_digests(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, "ALERT: 3 status changes (1 DOWN, 1 UP, 1 FLAPPING)")
+        self.assertFalse(QueuedEmailAlert.objects.exists())
+
+    def test_requeued_alerts_keep_their_time(self):
+        self._queue('DOWN')
+        alert = QueuedEmailAlert.objects.get()
+        alert.delete()
+        requeue_email_alerts([alert])
+        requeued = QueuedEmailAlert.objects.get()
+        self.assertEqual((requeued.attempts, requeued.created_at), (1, alert.created_at))
+
+
+# --- Incidents (monitor.incidents) ---
+
+@override_settings(INCIDENT_GROUP_WAIT_SECONDS=60, INCIDENT_CORRELATION_WINDOW_SECONDS=300)
+class IncidentTests(TestCase):
+    """Sites share the IP 10.0.0.1, so they correlate without DNS lookups."""
+
+    def setUp(self):
+        self.start = timezone.now()
+        self.user, self.other_user = _user(), _user('5550000002')
+
+    def _site(self, name, user=None):
+        return _website(user or self.user, name, url=f'http://10.0.0.1/{name}')
+
+    def _transition(self, seconds, status, *websites):
+        return handle_transitions(
+            [{'website': website, 'status': status, 'message': status.lower()} for website in websites],
+            now=self.start + timedelta(seconds=seconds),
+        )
+
+    def _notify(self, seconds):
+        return notify_due_incidents(now=self.start + timedelta(seconds=seconds))
+
+    def test_sites_are_grouped_into_one_alert_per_user(self):
+        a, b = self._site('a'), self._site('b')
+        self.assertEqual(self._transition(0, 'DOWN', a, b), [])
+        [(user_id, name, status, _)] = self._notify(60)
+        self.assertEqual((user_id, status), (self.user.pk, 'DOWN'))
+        self.assertIn('2 sites', name)
+        self.assertEqual(Incident.objects.get().alerts_suppressed, 1)
+
+    def test_site_joining_a_notified_incident_is_alerted(self):
+        a, b = self._site('a'), self._site('b')
+        self._transition(0, 'DOWN', a)
+        self._notify(60)
+        self.assertEqual(self._transition(120, 'DOWN', b), [(self.user.pk, 'b', 'DOWN', 'down')])
+        self.assertEqual(Incident.objects.count(), 1)
+
+    def test_failure_outside_the_window_opens_a_new_incident(self):
+        a, b = self._site('a'), self._site('b')
+        self._transition(0, 'DOWN', a)
+        self._notify(60)
+        three_days = 3 * 24 * 3600
+        self.assertEqual(self._transition(three_days, 'DOWN', b), [])
+        self.assertEqual(Incident.objects.count(), 2)
+        self.assertEqual(self._notify(three_days + 60), [(self.user.pk, 'b', 'DOWN', 'down')])
+
+    def test_each_user_is_told_of_recovery_when_their_sites_are_up(self):
+        a1, a2, b = self._site('a1'), self._site('a2'), self._site('b', self.other_user)
+        self._transition(0, 'DOWN', a1, a2, b)
+        self.assertEqual(len(self._notify(60)), 2)
+
+        [(user_id, _, status, _)] = self._transition(120, 'UP', a1, a2)
+        self.assertEqual((user_id, status), (self.user.pk, 'UP'))
+        incident = Incident.objects.get()
+        self.assertEqual(incident.status, 'open')
+
+        [(user_id, name, status, _)] = self._transition(180, 'UP', b)
+        self.assertEqual((user_id, name, status), (self.other_user.pk, 'b', 'UP'))
+        incident.refresh_from_db()
+        self.assertEqual(incident.status, 'resolved')
+        self.assertEqual(incident.alerts_suppressed, 2)  # a2's DOWN and UP
+
+    def test_recovered_site_failing_again_is_alerted(self):
+        a, b = self._site('a'), self._site('b', self.other_user)
+        self._transition(0, 'DOWN', a, b)
+        self._notify(60)
+        self._transition(120, 'UP', a)
+        self.assertEqual(self._transition(150, 'DOWN', a), [(self.user.pk, 'a', 'DOWN', 'down')])
+        self.assertEqual(IncidentSite.objects.filter(website=a, recovered_at__isnull=True).count(), 1)
+
+
+# --- Confirmation policy (monitor.confirmation) ---
+
+@override_settings(CONFIRM_FAILURES=3, CONFIRM_WINDOW=5, CONFIRM_RETRIES=3, FLAP_WINDOW=20, FLAP_THRESHOLD=8)
+class ConfirmationTests(SimpleTestCase):
+    def _alerts(self, state, outcomes):
+        return [record_outcome(state, outcome == 'u')[0] for outcome in outcomes]
+
+    def test_three_of_five_confirms_in_both_directions(self):
+        state = SiteState(is_up=True)
+        self.assertEqual(self._alerts(state, 'uufuff'), [None, None, None, None, None, 'DOWN'])
+        self.assertEqual(self._alerts(state, 'uuu'), [None, None, 'UP'])
+
+    def test_outcomes_before_a_down_do_not_confirm_the_next_up(self):
+        state = SiteState(is_up=True)
+        self.assertEqual(self._alerts(state, 'fufuf')[-1], 'DOWN')
+        # The two successes from before the DOWN must not count towards the UP.
+        self.assertEqual(self._alerts(state, 'uuu'), [None, None, 'UP'])
+
+    def test_outcomes_before_an_up_do_not_confirm_the_next_down(self):
+        state = SiteState(is_up=False)
+        self.assertEqual(self._alerts(state, 'ufufu')[-1], 'UP')
+        self.assertEqual(self._alerts(state, 'fff'), [None, None, 'DOWN'])
+
+    def test_state_survives_the_cache_round_trip(self):
+        state = SiteState(is_up=True)
+        self._alerts(state, 'uff')
+        self.assertEqual(SiteState.from_tuple(state.to_tuple()).to_tuple(), state.to_tuple())
+
+
+# --- Cached alert contacts (monitor.contacts / monitor.signals) ---
+
+class ContactCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner, self.new_owner = _user(), _user('5550000002')
+        self.contact = AlertContact.objects.create(user=self.owner, email='ops@example.com')
+
+    def test_cache_is_dropped_only_after_commit(self):
+        active_contacts(self.owner.pk)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.contact.email = 'oncall@example.com'
+            self.contact.save()
+            with self.assertNumQueries(0):
+                self.assertEqual(active_contacts(self.owner.pk)[0][1], 'ops@example.com')
+        for callback in callbacks:
+            callback()
+        self.assertEqual(active_contacts(self.owner.pk)[0][1], 'oncall@example.com')
+
+    def test_reassigned_contact_leaves_the_previous_owners_cache(self):
+        self.assertEqual(len(active_contacts(self.owner.pk)), 1)
+        self.assertEqual(active_contacts(self.new_owner.pk), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.contact.user = self.new_owner
+            self.contact.save()
+        self.assertEqual(active_contacts(self.owner.pk), [])
+        self.assertEqual(len(active_contacts(self.new_owner.pk)), 1)
+
+
+# --- Status snapshot API (monitor.views / monitor.snapshots) ---
+
+class StatusSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = _user()
+        _website(self.user)
+        self.client.force_login(self.user)
+        self.url = reverse('api_status_snapshot')
+
+    def test_unchanged_snapshot_is_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['sites']), 1)
+        again = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again['ETag'], response['ETag'])
+
+    def test_snapshot_changes_only_after_commit(self):
+        response = self.client.get(self.url)
+        added = Website(user=self.user, name='other', url='https://other.example.com')
+        with self.captureOnCommitCallbacks() as callbacks:
+            added.save()
+            # A reader inside the write window must not cache the snapshot without the new site.
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(len(self.client.get(self.url).json()['sites']), 2)
+
+    def test_deleted_site_leaves_the_snapshot(self):
+        added = _website(self.user, 'other')
+        site_id = str(added.pk)
+        self.assertIn(site_id, self.client.get(self.url).json()['sites'])
+        with self.captureOnCommitCallbacks(execute=True):
+            added.delete()
+        self.assertNotIn(site_id, self.client.get(self.url).json()['sites'])
+
+    def test_deactivated_user_is_rejected(self):
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_session_ends_when_the_password_changes(self):
+        self.user.set_password('changed')
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+
+# --- Check history API (monitor.history / monitor.views) ---
+
+@override_settings(ROLLUP_SETTLE_SECONDS=30)
+class CheckHistoryTests(TestCase):
+    def setUp(self):
+        self.user = _user()
+        self.website = _website(self.user)
+        self.client.force_login(self.user)
+        self.url = reverse('api_check_history', args=[self.website.pk])
+
+    def _result(self, timestamp, is_up=True):
+        result = CheckResult.objects.create(
+            website=self.website, status_code=200 if is_up else 503, is_up=is_up, response_time_ms=100.0,
+        )
+        CheckResult.objects.filter(pk=result.pk).update(timestamp=timestamp)
+        return result.pk
+
+    def _pages(self, **params):
+        pages, cursor = [], None
+        while True:
+            response = self.client.get(self.url, {**params, **({'cursor': cursor} if cursor else {})})
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            pages.append(data['results'])
+            cursor = data['next_cursor']
+            if cursor is None:
+                return pages
+
+    def test_keyset_pages_cover_every_row_once(self):
+        moment = timezone.now() - timedelta(minutes=10)
+        # Two rows share a timestamp, so the cursor has to break the tie by id.
+        ids = [self._result(moment), self._result(moment)]
+        ids += [self._result(moment - timedelta(minutes=i)) for i in range(1, 4)]
+        pages = self._pages(limit=2)
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        expected = sorted(ids[:2], reverse=True) + ids[2:]
+        self.assertEqual([row['id'] for page in pages for row in page], expected)
+
+    def test_start_and_end_bound_the_pages(self):
+        now = timezone.now()
+        kept = self._result(now - timedelta(hours=2))
+        self._result(now - timedelta(hours=5))
+        self._result(now - timedelta(minutes=5))
+        params = {'start': (now - timedelta(hours=3)).isoformat(), 'end': (now - timedelta(hours=1)).isoformat()}
+        self.assertEqual([row['id'] for page in self._pages(**params) for row in page], [kept])
+
+    def test_buckets_combine_rollups_and_raw_rows(self):
+        base = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=5)
+        self._result(base + timedelta(minutes=10))
+        self._result(base + timedelta(minutes=20), is_up=False)
+        self._result(base + timedelta(hours=1, minutes=5))
+        update_rollups()
+        self._result(base + timedelta(hours=2, minutes=5))  # Not rolled up yet
+
+        buckets = [row for page in self._pages(bucket='1h', limit=2) for row in page]
+        self.assertEqual(
+            [(row['bucket_start'], row['checks'], row['up_checks']) for row in buckets],
+            [
+                ((base + timedelta(hours=2)).isoformat(), 1, 1),
+                ((base + timedelta(hours=1)).isoformat(), 1, 1),
+                (base.isoformat(), 2, 1),
+            ],
+        )
+
+    def test_buckets_still_use_rollups_after_raw_rows_are_gone(self):
+        self._result(timezone.now() - timedelta(days=3))
+        self._result(timezone.now() - timedelta(minutes=5))
+        update_rollups()
+        CheckResult.objects.all().delete()  # Pruned or archived, watermark row included
+        # Days before the watermark's come from rollups; the current day would be raw rows.
+        buckets = self.client.get(self.url, {'bucket': '1d'}).json()['results']
+        self.assertEqual(sum(bucket['checks'] for bucket in buckets), 1)
+
+    def test_largest_buckets_stop_at_the_epoch(self):
+        self._result(timezone.now() - timedelta(days=1))
+        response = self.client.get(self.url, {'bucket': '1830d', 'limit': 1000})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['checks'] for row in response.json()['results']], [1])
+
+    def test_invalid_parameters_and_other_users_sites(self):
+        self.assertEqual(self.client.get(self.url, {'cursor': 'not-a-cursor'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'bucket': '5x'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'bucket': '99999d'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'limit': 0}).status_code, 400)
+        other = _website(_user('5550000002'), 'other')
+        self.assertEqual(self.client.get(reverse('api_check_history', args=[other.pk])).status_code, 404)
+
+
+# --- Parquet archive (monitor.archive) ---
+
+@unittest.skipIf(archive.pa is None, 'Archival needs pyarrow and numpy.')
+@override_settings(ROLLUP_SETTLE_SECONDS=30)
+class ArchiveTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(CHECKRESULT_ARCHIVE_DIR=directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = _user()
+        self.site, self.other_site = _website(self.user, 'a'), _website(self.user, 'b')
+        for i in range(20):
+            _website(self.user, f'empty{i}')
+        now = timezone.now()
+        self.old = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0) - timedelta(days=40)
+        moments = [self.old, self.old + timedelta(hours=1), self.old + timedelta(hours=2), now - timedelta(minutes=1)]
+        for website, moment in zip((self.site, self.site, self.other_site, self.site), moments):
+            result = CheckResult.objects.create(website=website, status_code=200, is_up=True, response_time_ms=100.0)
+            CheckResult.objects.filter(pk=result.pk).update(timestamp=moment)
+        self.recent = result.pk
+        update_rollups()
+        self.client.force_login(self.user)
+
+    def test_months_are_archived_with_one_query_each(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(archive.archive_history(0), 3)
+        self.assertLess(len(queries), 10)  # Not one per site and month
+        self.assertEqual(list(CheckResult.objects.values_list('pk', flat=True)), [self.recent])
+        self.assertEqual(archive.archived_summary(self.site.pk)['checks'], 2)
+        self.assertEqual(archive.archived_summary(self.other_site.pk)['checks'], 1)
+
+    def test_raw_history_and_exports_reject_archived_ranges(self):
+        archive.archive_history(0)
+        start = {'start': self.old.isoformat()}
+        history = reverse('api_check_history', args=[self.site.pk])
+        response = self.client.get(history, start)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('archived', response.json()['error'])
+        export = reverse('api_export_history', args=[self.site.pk])
+        self.assertEqual(self.client.get(export, start).status_code, 400)
+        with self.assertRaisesMessage(CommandError, 'archived'):
+            call_command('export_history', self.site.pk, start=self.old.isoformat(), stdout=io.StringIO())
+
+        # Without a start, raw history ends at the archive; rollups still cover archived months.
+        self.assertEqual([row['id'] for row in self.client.get(history).json()['results']], [self.recent])
+        buckets = self.client.get(history, {**start, 'bucket': '1d'}).json()['results']
+        self.assertEqual(sum(bucket['checks'] for bucket in buckets), 3)
+
+
+# --- SLA report (monitor.analytics) ---
+
+@unittest.skipIf(analytics.np is None, 'SLA analytics need numpy.')
+@override_settings(SLA_DEFAULT_DAYS=30, SLA_MAX_DAYS=90)
+class SLAReportTests(TestCase):
+    def setUp(self):
+        self.user = _user()
+        self.website = _website(self.user)
+        self.client.force_login(self.user)
+        self.now = timezone.now()
+        for days, is_up, response_time_ms in ((40, True, 100.0), (2, False, None), (1, True, 120.0)):
+            result = CheckResult.objects.create(
+                website=self.website, status_code=200 if is_up else 0, is_up=is_up, response_time_ms=response_time_ms,
+            )
+            CheckResult.objects.filter(pk=result.pk).update(timestamp=self.now - timedelta(days=days))
+
+    def test_columns_come_back_typed_and_sorted(self):
+        columns = analytics.load_checks([self.website.pk], end=self.now)
+        self.assertEqual(columns['timestamp'].tolist(), [
+            (self.now - timedelta(days=days)).timestamp() for days in (40, 2, 1)
+        ])
+        self.assertEqual(columns['is_up'].tolist(), [True, False, True])
+        self.assertTrue(math.isnan(columns['response_time_ms'][1]))
+        self.assertEqual(analytics.load_checks([self.website.pk], self.now, self.now)['site'].size, 0)
+
+    def test_report_defaults_to_a_bounded_window(self):
+        response = self.client.get(reverse('api_sla_report'))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['sites'][str(self.website.pk)]['checks'], 2)  # Not the check from 40 days ago
+        self.assertEqual(parse_time(data['end']) - parse_time(data['start']), timedelta(days=30))
+
+    def test_report_rejects_unbounded_windows(self):
+        url = reverse('api_sla_report')
+        self.assertEqual(self.client.get(url, {'start': (self.now - timedelta(days=89)).isoformat()}).status_code, 200)
+        self.assertEqual(self.client.get(url, {'start': (self.now - timedelta(days=120)).isoformat()}).status_code, 400)
+
+
+# --- Latency sketches (monitor.sketches / monitor.latency) ---
+
+class SketchTests(SimpleTestCase):
+    values = [float(ms) for ms in range(1, 1001)]
+
+    def test_quantiles_are_within_the_relative_accuracy(self):
+        sketch = DDSketch()
+        for value in self.values:
+            sketch.add(value)
+        for q, exact in ((0.5, 500.5), (0.95, 950.05), (0.99, 990.01)):
+            self.assertAlmostEqual(sketch.quantile(q), exact, delta=exact * 0.02)
+        self.assertEqual((sketch.quantile(0), sketch.quantile(1)), (1.0, 1000.0))
+        self.assertIsNone(DDSketch().quantile(0.5))
+
+    def test_encoding_round_trips(self):
+        sketch = DDSketch()
+        for value in self.values + [0.0]:
+            sketch.add(value)
+        decoded = DDSketch.from_bytes(sketch.to_bytes())
+        self.assertEqual(decoded.to_bytes(), sketch.to_bytes())
+        self.assertEqual((decoded.count, decoded.zero_count, decoded.min, decoded.max), (1001, 1, 0.0, 1000.0))
+        self.assertEqual(decoded.quantile(0.95), sketch.quantile(0.95))
+
+    def test_merge_equals_adding_everything(self):
+        low, high, combined = DDSketch(), DDSketch(), DDSketch()
+        for value in self.values:
+            (low if value <= 500 else high).add(value)
+            combined.add(value)
+        self.assertEqual(low.merge(high).to_bytes(), combined.to_bytes())
+
+
+class LatencySketchTests(TestCase):
+    def setUp(self):
+        self.website = _website(_user())
+
+    def _results(self, *checks):
+        results = [
+            CheckResult.objects.create(website=self.website, status_code=code, is_up=code == 200, response_time_ms=ms)
+            for code, ms in checks
+        ]
+        with transaction.atomic():
+            record_latency_sketches(results)
+
+    def test_flushes_merge_into_the_bucket_sketch(self):
+        self._results((200, 100.0), (408, 10000.0), (0, None))
+        self._results((200, 300.0))
+        sketch = merged_sketch(self.website.pk, timezone.now() - timedelta(hours=1))
+        self.assertEqual((sketch.count, sketch.min, sketch.max), (2, 100.0, 300.0))  # The timeout is left out
+
+    def test_rows_are_locked_in_key_order(self):
+        with CaptureQueriesContext(connection) as queries:
+            self._results((200, 100.0))
+        [locking] = [query['sql'] for query in queries if query['sql'].startswith('SELECT')]
+        self.assertIn(LatencySketch._meta.db_table, locking)
+        self.assertIn('ORDER BY', locking)
+
+
+# --- Write-behind buffer (monitor.writebuffer) ---
+
+class WriteBufferTests(TestCase):
+    def setUp(self):
+        user = _user()
+        # An id past 2**31 exercises the bigint key in PostgreSQL's UPDATE ... FROM (VALUES ...).
+        self.websites = [_website(user, 'a', pk=2 ** 31 + 7), _website(user, 'b')]
+        self.next_check_at = timezone.now() + timedelta(minutes=5)
+        Website.objects.update(next_check_at=self.next_check_at)
+
+    def _add(self, buffer, website, status_code, response_time=None):
+        website.is_up, website.status_code, website.response_time = status_code == 200, status_code, response_time
+        website.last_checked = timezone.now()
+        buffer.add(website, CheckResult(
+            website=website, status_code=status_code, is_up=website.is_up, response_time_ms=response_time,
+        ))
+
+    def test_flush_writes_results_and_latest_status_only(self):
+        buffer = ResultWriteBuffer(max_size=100, max_age_seconds=3600)
+        site, other = self.websites
+        site.next_check_at = None  # Stale scheduler column: must not be written back
+        self._add(buffer, site, 200, 120.0)
+        self._add(buffer, site, 503, None)
+        self._add(buffer, other, 200, 80.0)
+        self.assertFalse(CheckResult.objects.exists())
+
+        self.assertEqual(buffer.flush(), 3)
+        self.assertEqual(len(buffer), 0)
+        self.assertEqual(CheckResult.objects.count(), 3)
+        stored = {website.pk: website for website in Website.objects.all()}
+        self.assertEqual((stored[site.pk].status_code, stored[site.pk].is_up), (503, False))
+        self.assertIsNone(stored[site.pk].response_time)
+        self.assertEqual((stored[other.pk].status_code, stored[other.pk].response_time), (200, 80.0))
+        self.assertEqual(stored[site.pk].next_check_at, self.next_check_at)
+        self.assertEqual(buffer.flush(), 0)
+
+    def test_full_buffer_flushes_itself(self):
+        buffer = ResultWriteBuffer(max_size=2, max_age_seconds=3600)
+        self._add(buffer, self.websites[0], 200, 50.0)
+        self.assertFalse(CheckResult.objects.exists())
+        self._add(buffer, self.websites[1], 200, 60.0)
+        self.assertEqual(CheckResult.objects.count(), 2)
+        self.assertEqual(len(buffer), 0)
+
+
+# --- SMS fan-out (monitor.alerts / monitor.tasks) ---
+
+class FakeTwilioMixin:
+    """Serves monitor.fakeproviders.FakeTwilioServer on a random port, from its own event loop thread."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.twilio = FakeTwilioServer()
+        cls.loop = asyncio.new_event_loop()
+        threading.Thread(target=cls.loop.run_forever, daemon=True).start()
+        start = asyncio.start_server(cls.twilio.handle, '127.0.0.1', 0)
+        cls.twilio_server = asyncio.run_coroutine_threadsafe(start, cls.loop).result()
+        cls.twilio_url = f"http://127.0.0.1:{cls.twilio_server.sockets[0].getsockname()[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.twilio_server.close()
+        cls.loop.call_soon_threadsafe(cls.loop.stop)
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        self.twilio.failure_rate = 0.0
+        self.twilio.stats.accepted = self.twilio.stats.failed = 0
+
+
+class SMSDeliveryTests(FakeTwilioMixin, SimpleTestCase):
+    numbers = [f'+1555000{i:04d}' for i in range(6)]
+
+    def _settings(self, **overrides):
+        return override_settings(**{
+            'TWILIO_ACCOUNT_SID': 'AC' + '0' * 32, 'TWILIO_AUTH_TOKEN': 'token', 'TWILIO_PHONE_NUMBER': '+15550009999',
+            'TWILIO_API_BASE_URL': self.twilio_url, 'SMS_RATE_PER_SECOND': 1000, 'SMS_RATE_BURST': 1000,
+            **overrides,
+        })
+
+    def test_fan_out_sends_every_number(self):
+        with self._settings():
+            self.assertEqual(send_sms_bulk(self.numbers, 'site is DOWN'), {})
+        self.assertEqual(self.twilio.stats.accepted, len(self.numbers))
+
+    def test_provider_errors_are_returned_per_number_and_retryable(self):
+        self.twilio.failure_rate = 1.0
+        with self._settings():
+            failures = send_sms_bulk(self.numbers[:2], 'site is DOWN')
+        self.assertEqual(set(failures), set(self.numbers[:2]))
+        self.assertTrue(all(_sms_retryable(exc) for exc in failures.values()))
+
+    def test_missing_credentials_fail_every_number_without_retrying(self):
+        with self._settings(TWILIO_ACCOUNT_SID=None, TWILIO_AUTH_TOKEN=None):
+            failures = send_sms_bulk(self.numbers[:2], 'site is DOWN')
+        self.assertEqual(set(failures), set(self.numbers[:2]))
+        self.assertFalse(any(_sms_retryable(exc) for exc in failures.values()))
+        self.assertEqual(self.twilio.stats.accepted, 0)
+
+    def test_retry_classification(self):
+        cases = [
+            (TwilioRestException(429, '/Messages.json'), True),
+            (TwilioRestException(503, '/Messages.json'), True),
+            (TwilioRestException(400, '/Messages.json'), False),
+            (TwilioException('Credentials are required to create a TwilioClient'), False),
+            (RequestsConnectionError('connection refused'), True),
+        ]
+        self.assertEqual([_sms_retryable(exc) for exc, _ in cases], [retryable for _, retryable in cases])
+
+
+class TokenBucketTests(SimpleTestCase):
+    def test_burst_then_steady_rate(self):
+        bucket = TokenBucket(rate=20, burst=2)
+        started = time.monotonic()
+        bucket.acquire()
+        bucket.acquire()
+        self.assertLess(time.monotonic() - started, 0.04)  # The burst is immediate
+        bucket.acquire()
+        bucket.acquire()
+        self.assertGreaterEqual(time.monotonic() - started, 0.09)  # Then one token every 50ms
+
+
+# --- Due-time scheduler (monitor.scheduler) ---
+
+class SchedulerTests(TestCase):
+    def setUp(self):
+        self.user = _user()
+        self.now = timezone.now()
+
+    def test_due_sites_are_claimed_in_due_order_and_rescheduled(self):
+        never = _website(self.user, 'never')
+        late = _website(self.user, 'late', next_check_at=self.now - timedelta(minutes=10))
+        early = _website(self.user, 'early', next_check_at=self.now - timedelta(minutes=1), check_interval_seconds=300)
+        _website(self.user, 'future', next_check_at=self.now + timedelta(minutes=1))
+        _website(self.user, 'paused', is_active=False)
+
+        self.assertEqual(claim_due_websites(self.now, limit=2), [never.pk, late.pk])
+        self.assertEqual(claim_due_websites(self.now), [early.pk])
+        self.assertEqual(claim_due_websites(self.now), [])
+        for website, interval in ((never, 60), (late, 60), (early, 300)):
+            website.refresh_from_db()
+            self.assertEqual(website.next_check_at, self.now + timedelta(seconds=interval))
+
+    def test_sites_claimed_elsewhere_are_skipped(self):
+        first = _website(self.user, 'first', next_check_at=self.now - timedelta(minutes=2))
+        second = _website(self.user, 'second', next_check_at=self.now - timedelta(minutes=1))
+        self.assertEqual(claim_due_websites(self.now, limit=1), [first.pk])
+        self.assertEqual(claim_websites([first.pk, second.pk], self.now), [(second.pk, 60)])
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'SKIP LOCKED needs PostgreSQL.')
+class SchedulerLockingTests(TransactionTestCase):
+    def test_rows_locked_by_another_scheduler_are_skipped(self):
+        user = _user()
+        now = timezone.now()
+        locked_site = _website(user, 'locked', next_check_at=now - timedelta(minutes=2))
+        free_site = _website(user, 'free', next_check_at=now - timedelta(minutes=1))
+        locked, release = threading.Event(), threading.Event()
+
+        def hold_lock():
+            try:
+                with transaction.atomic():
+                    list(Website.objects.select_for_update().filter(pk=locked_site.pk))
+                    locked.set()
+                    release.wait(5)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=hold_lock)
+        thread.start()
+        try:
+            self.assertTrue(locked.wait(5))
+            self.assertEqual(claim_due_websites(now), [free_site.pk])
+        finally:
+            release.set()
+            thread.join()
+        self.assertEqual(claim_due_websites(now), [locked_site.pk])
+
+
+# --- Prober DNS cache (monitor.dnscache) ---
+
+class _ScriptedDNSCache(DNSCache):
+    """Answers from a {host: (addresses, ttl) or exception} dict instead of DNS."""
+
+    def __init__(self, answers, **kwargs):
+        super().__init__(**kwargs)
+        self._resolver = object()  # Anything but None, so _query is used
+        self.answers = answers
+        self.queries = []
+
+    async def _query(self, host):
+        self.queries.append(host)
+        await asyncio.sleep(0)
+        answer = self.answers[host]
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+
+class DNSCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.clock = 1000.0
+        patcher = mock.patch('monitor.dnscache.time.monotonic', side_effect=lambda: self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _resolve(self, dns_cache, host, **kwargs):
+        return asyncio.run(dns_cache.resolve(host, 443, **kwargs))
+
+    def test_answers_are_cached_for_their_clamped_ttl(self):
+        dns_cache = _ScriptedDNSCache({'a.test': (['10.0.0.1'], 30), 'b.test': (['10.0.0.2'], 0)}, min_ttl=5)
+        for _ in range(2):
+            self.assertEqual(self._resolve(dns_cache, 'a.test'), ['10.0.0.1'])
+            self._resolve(dns_cache, 'b.test')
+        self.assertEqual(dns_cache.queries, ['a.test', 'b.test'])
+        self.clock += 6  # Past b.test's TTL, raised from 0 to min_ttl
+        self._resolve(dns_cache, 'a.test')
+        self._resolve(dns_cache, 'b.test')
+        self.clock += 25
+        self._resolve(dns_cache, 'a.test')
+        self.assertEqual(dns_cache.queries, ['a.test', 'b.test', 'b.test', 'a.test'])
+        self.assertEqual((dns_cache.hits, dns_cache.misses), (3, 4))
+
+    def test_failures_are_cached_for_the_negative_ttl(self):
+        dns_cache = _ScriptedDNSCache({'down.test': OSError('timed out')}, negative_ttl=30)
+        for _ in range(2):
+            with self.assertRaisesMessage(DNSLookupError, 'timed out'):
+                self._resolve(dns_cache, 'down.test')
+        self.assertEqual((len(dns_cache.queries), dns_cache.negative_hits), (1, 1))
+
+        dns_cache.answers['down.test'] = (['10.0.0.3'], 60)
+        self.assertEqual(self._resolve(dns_cache, 'down.test', fresh=True), ['10.0.0.3'])
+        dns_cache.answers['down.test'] = OSError('timed out')
+        self.clock += 61
+        with self.assertRaises(DNSLookupError):
+            self._resolve(dns_cache, 'down.test')
+        self.assertEqual(len(dns_cache.queries), 3)
+
+    def test_least_recently_used_host_is_evicted(self):
+        dns_cache = _ScriptedDNSCache({host: ([f'10.0.0.{i}'], 60) for i, host in enumerate('abc')}, max_size=2)
+        for host in ('a', 'b', 'a', 'c'):
+            self._resolve(dns_cache, host)
+        self.assertEqual([dns_cache.peek(host) for host in 'abc'], [['10.0.0.0'], None, ['10.0.0.2']])
+        self.assertEqual(dns_cache.stats()['evictions'], 1)
+
+    def test_concurrent_misses_share_one_query(self):
+        dns_cache = _ScriptedDNSCache({'a.test': (['10.0.0.1'], 60)})
+
+        async def resolve_many():
+            return await asyncio.gather(*(dns_cache.resolve('a.test', 443) for _ in range(5)))
+
+        self.assertEqual(asyncio.run(resolve_many()), [['10.0.0.1']] * 5)
+        self.assertEqual(dns_cache.queries, ['a.test'])
+
+
+# --- Alert delivery retries (monitor.tasks) ---
+
+class _FailingEmailBackend(BaseEmailBackend):
+    """Raises `error` for every message and counts the attempts."""
+    error = None
+    attempts = 0
+
+    def send_messages(self, messages):
+        type(self).attempts += 1
+        raise self.error
+
+
+@override_settings(EMAIL_ENABLED=True, EMAIL_BACKEND='monitor.tests._FailingEmailBackend')
+class AlertDeliveryRetryTests(SimpleTestCase):
+    def setUp(self):
+        _FailingEmailBackend.attempts = 0
+        mailer.close()  # The pooled connection belongs to whichever backend was configured before
+        self.addCleanup(mailer.close)
+
+    def _deliver(self, error):
+        _FailingEmailBackend.error = error
+        with self.assertLogs('monitor.tasks', 'WARNING') as logs:
+            deliver_email_alert.apply(args=('ops@example.com', 'site', 'DOWN', 'HTTP 503'))
+        return logs.output
+
+    def test_refused_recipient_is_dropped_without_retrying(self):
+        output = self._deliver(smtplib.SMTPRecipientsRefused({'ops@example.com': (550, b'No such user')}))
+        self.assertEqual(_FailingEmailBackend.attempts, 1)
+        self.assertIn('rejected permanently', output[-1])
+
+    def test_transient_errors_are_retried_until_max_retries(self):
+        output = self._deliver(smtplib.SMTPDataError(451, b'Try again later'))
+        self.assertEqual(_FailingEmailBackend.attempts, deliver_email_alert.max_retries + 1)
+        self.assertIn(f'after {deliver_email_alert.max_retries} retries', output[-1])
+
+    @override_settings(ALERT_RETRY_BACKOFF_MAX_SECONDS=60)
+    def test_backoff_is_jittered_exponential_and_capped(self):
+        countdowns = []
+
+        class Task:
+            max_retries = 10
+            request = mock.Mock()
+
+            def retry(self, exc, countdown, args):
+                countdowns.append(countdown)
+                return RuntimeError('retry')
+
+        task = Task()
+        for retries in (0, 2, 6):
+            task.request.retries = retries
+            with self.assertLogs('monitor.tasks', 'WARNING'), self.assertRaises(RuntimeError):
+                _retry_delivery(task, OSError('refused'), 'Email', 'ops@example.com')
+        for countdown, (low, high) in zip(countdowns, ((2.5, 5), (10, 20), (30, 60))):
+            self.assertTrue(low <= countdown <= high, countdown)
+
+
+# --- Live dashboard feed (monitor.livefeed) ---
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class LiveUpdatePublisherTests(SimpleTestCase):
+    def setUp(self):
+        self.channel_layer = get_channel_layer()
+        self.channels = {}
+        for user_id in (1, 2, 3):
+            self.channels[user_id] = async_to_sync(self.channel_layer.new_channel)()
+            async_to_sync(self.channel_layer.group_add)(user_group(user_id), self.channels[user_id])
+
+    def _received(self, user_id):
+        message = async_to_sync(self.channel_layer.receive)(self.channels[user_id])
+        self.assertEqual(message['type'], 'send_dashboard_update')
+        return json.loads(message['text'])
+
+    def test_updates_are_merged_per_site_and_sent_once_per_user(self):
+        publisher = LiveUpdatePublisher(window_ms=60_000)
+        publisher.add_many([(1, 10, {'u': 0, 'c': 503}), (1, 11, {'u': 1}), (2, 20, {'r': 5}), (3, 30, {})])
+        publisher.add_many([(1, 10, {'c': 504, 'r': 812})])
+        self.assertEqual(publisher.flush(), 3)
+        self.assertEqual(self._received(1), {
+            'type': 'delta', 'sites': {'10': {'u': 0, 'c': 504, 'r': 812}, '11': {'u': 1}},
+        })
+        self.assertEqual(self._received(2), {'type': 'delta', 'sites': {'20': {'r': 5}}})
+        self.assertEqual(publisher.flush(), 0)
+
+    def test_pending_updates_are_flushed_when_the_window_ends(self):
+        publisher = LiveUpdatePublisher(window_ms=10)
+        publisher.add_many([(1, 10, {'u': 0})])
+        time.sleep(0.2)
+        self.assertEqual(publisher.flush(), 0)  # Already sent from the window's timer
+        self.assertEqual(self._received(1)['sites'], {'10': {'u': 0}})
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class LiveDashboardConsumerTests(TransactionTestCase):
+    """Not a TestCase: database_sync_to_async closes connections left inside a transaction."""
+
+    def setUp(self):
+        cache.clear()
+        self.user, self.other = _user(), _user('5550000002')
+        self.website = _website(self.user, status_code=200)
+
+    async def _connect(self, user):
+        """Opens a dashboard socket as `user`; returns (communicator, first message sent back)."""
+        communicator = ApplicationCommunicator(LiveDashboardConsumer.as_asgi(), {
+            'type': 'websocket', 'path': '/ws/dashboard/', 'headers': [], 'subprotocols': [], 'user': user,
+        })
+        await communicator.send_input({'type': 'websocket.connect'})
+        return communicator, await communicator.receive_output(1)
+
+    async def test_anonymous_socket_is_refused(self):
+        _, response = await self._connect(AnonymousUser())
+        self.assertEqual(response['type'], 'websocket.close')
+
+    async def test_snapshot_then_only_the_users_own_deltas(self):
+        communicator, response = await self._connect(self.user)
+        self.assertEqual(response['type'], 'websocket.accept')
+        snapshot = json.loads((await communicator.receive_output(1))['text'])
+        self.assertEqual(snapshot['type'], 'snapshot')
+        self.assertEqual(snapshot['sites'][str(self.website.pk)]['c'], 200)
+
+        channel_layer = get_channel_layer()
+        for user in (self.other, self.user):
+            text = json.dumps({'type': 'delta', 'sites': {str(user.pk): {'u': 0}}})
+            await channel_layer.group_send(user_group(user.pk), {'type': 'send_dashboard_update', 'text': text})
+        self.assertEqual(await communicator.receive_output(1), {'type': 'websocket.send', 'text': text})
+        self.assertTrue(await communicator.receive_nothing())
+
+        await communicator.send_input({'type': 'websocket.disconnect', 'code': 1000})
+        await communicator.wait(1)
+        self.assertFalse(channel_layer.groups.get(user_group(self.user.pk)))
+
+
+# --- History exports (monitor.exports / monitor.views) ---
+
+class ExportTests(TestCase):
+    fields = ('id', 'timestamp', 'is_up', 'error_message')
+
+    def setUp(self):
+        self.user = _user()
+        self.website = _website(self.user)
+        now = timezone.now()
+        self.ids = []
+        for minutes in range(30, 0, -1):
+            result = CheckResult.objects.create(
+                website=self.website, status_code=503, is_up=False, response_time_ms=1.0,
+                error_message=f'HTTP 503, "busy"\nretry {minutes}',  # Needs quoting in CSV
+            )
+            CheckResult.objects.filter(pk=result.pk).update(timestamp=now - timedelta(minutes=minutes))
+            self.ids.append(result.pk)
+
+    def _export(self, fmt, **kwargs):
+        return b''.join(export_stream(self.website.pk, fmt, fields=self.fields, **kwargs))
+
+    def test_csv_has_a_header_and_one_record_per_row_oldest_first(self):
+        records = list(csv.reader(io.StringIO(self._export('csv').decode(), newline='')))
+        self.assertEqual(records[0], list(self.fields))
+        self.assertEqual([int(record[0]) for record in records[1:]], self.ids)
+        self.assertEqual(records[1][3], 'HTTP 503, "busy"\nretry 30')
+        self.assertEqual(records[1][2], 'False')
+
+    def test_ndjson_has_one_object_per_line(self):
+        lines = self._export('ndjson').decode().splitlines()
+        self.assertEqual([json.loads(line)['id'] for line in lines], self.ids)
+        self.assertEqual(set(json.loads(lines[0])), set(self.fields))
+        self.assertIs(json.loads(lines[0])['is_up'], False)
+
+    @mock.patch('monitor.exports.OUTPUT_CHUNK_BYTES', 256)
+    def test_gzip_stream_decompresses_to_the_plain_export(self):
+        for fmt in ('csv', 'ndjson'):
+            chunks = list(export_stream(self.website.pk, fmt, gzip=True, fields=self.fields))
+            self.assertGreater(len(chunks), 1)
+            self.assertEqual(gzip.decompress(b''.join(chunks)), self._export(fmt))
+
+    def test_export_view_streams_a_download(self):
+        self.client.force_login(self.user)
+        url = reverse('api_export_history', args=[self.website.pk])
+        response = self.client.get(url, {'format': 'ndjson', 'gzip': '1', 'fields': ','.join(self.fields)})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn(f'check-history-{self.website.pk}.ndjson.gz', response['Content-Disposition'])
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), self._export('ndjson'))
+        self.assertEqual(self.client.get(url, {'format': 'xml'}).status_code, 400)
@@ -9,4 +9,8 @@ urlpatterns = [
     path('login/', views.api_login_user, name='api_login_user'),          # Login endpoint
     path('logout/', views.api_logout_user, name='api_logout_user'),       # Logout endpoint
     path('dashboard/', views.dashboard_view, name='dashboard_view'),      # Protected dashboard
+    path('api/status/', views.api_status_snapshot, name='api_status_snapshot'),  # Cached site states (ETag)
+    path('api/sites/<int:website_id>/history/', views.api_check_history, name='api_check_history'),
+    path('api/sites/<int:website_id>/export/', views.api_export_history, name='api_export_history'),
+    path('api/sla/', views.api_sla_report, name='api_sla_report'),
 ]
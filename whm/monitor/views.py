@@ -1,5 +1,6 @@
 import random
 import json
+from datetime import timedelta
 from django.shortcuts import render
 from django.http import JsonResponse
 from django.contrib.auth import authenticate, login, logout
@@ -9,7 +10,20 @@ from django.db import IntegrityError
 
 # Assuming these imports exist and are correct in your monitor/ directory
 from .forms import CustomUserCreationForm 
-from django.http import HttpResponse
+from .analytics import sla_report
+from .archive import database_start
+from .exports import FORMATS, export_filename, export_stream
+from .history import bucket_page, parse_time, raw_page
+from .models import Website
+from .serializers import (
+    BUCKET_FIELDS, CHECK_RESULT_FIELDS, DEFAULT_CHECK_RESULT_FIELDS, parse_fields, serialize_row,
+)
+from .snapshots import current_version, snapshot
+from django.conf import settings
+from django.utils import timezone
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
 
 def index_view(request):
     return HttpResponse("Welcome to the Website Health Monitor!")
@@ -159,4 +173,140 @@ def dashboard_view(request):
     if not request.user.is_verified:
         return JsonResponse({'error': 'User not verified.'}, status=403)
         
-    return JsonResponse({'message': 'Session is valid.', 'user_id': request.user.id}, status=200)
\ No newline at end of file
+    return JsonResponse({'message': 'Session is valid.', 'user_id': request.user.id}, status=200)
+
+
+# --- 7. Status Snapshot API (current state of all the user's sites) ---
+@require_GET
+def api_status_snapshot(request):
+    """Serves the cached status snapshot; an unchanged If-None-Match gets a 304.
+
+    Authentication goes through request.user (one primary-key lookup, which
+    checks the session's auth hash and is_active); the snapshot and its
+    version come from the cache.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required.'}, status=401)
+    user_id = request.user.pk
+
+    version = current_version(user_id)
+    etag = f'"{user_id}-{version}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponse(status=304)
+    else:
+        _, body = snapshot(user_id, version)
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+# --- 8. Check History API (keyset-paginated, optionally downsampled) ---
+@require_GET
+def api_check_history(request, website_id):
+    """Check results of one site, newest first.
+
+    Query parameters: start / end (ISO-8601), limit, cursor (the previous
+    page's next_cursor), fields (comma-separated) and bucket (e.g. 5m, 1h, 1d)
+    for aggregated history. Raw rows stop at the archive; buckets come from
+    rollups, which cover archived months too.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required.'}, status=401)
+    if not Website.objects.filter(pk=website_id, user=request.user).exists():
+        return JsonResponse({'error': 'Website not found.'}, status=404)
+
+    params = request.GET
+    try:
+        start, end = parse_time(params.get('start')), parse_time(params.get('end'))
+        limit = int(params.get('limit', settings.HISTORY_PAGE_SIZE))
+        if not 1 <= limit <= settings.HISTORY_MAX_PAGE_SIZE:
+            raise ValueError(f"limit must be between 1 and {settings.HISTORY_MAX_PAGE_SIZE}.")
+        options = {'start': start, 'end': end, 'cursor': params.get('cursor'), 'limit': limit}
+        if params.get('bucket'):
+            fields = parse_fields(params.get('fields'), BUCKET_FIELDS, BUCKET_FIELDS)
+            rows, next_cursor = bucket_page(website_id, params['bucket'], **options)
+        else:
+            fields = parse_fields(params.get('fields'), CHECK_RESULT_FIELDS, DEFAULT_CHECK_RESULT_FIELDS)
+            options['start'] = database_start(website_id, start)
+            rows, next_cursor = raw_page(website_id, fields, **options)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    return JsonResponse({
+        'results': [serialize_row(row, fields) for row in rows],
+        'next_cursor': next_cursor,
+    })
+
+
+# --- 9. Check History Export (streamed CSV / NDJSON, optionally gzipped) ---
+@require_GET
+def api_export_history(request, website_id):
+    """Raw check results of one site as a download, oldest first.
+
+    Query parameters: format (csv or ndjson), gzip=1, start / end (ISO-8601)
+    and fields (comma-separated, default all). Archived months are not
+    exported; a start inside them is rejected.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required.'}, status=401)
+    website = Website.objects.filter(pk=website_id, user=request.user).first()
+    if website is None:
+        return JsonResponse({'error': 'Website not found.'}, status=404)
+
+    params = request.GET
+    fmt = params.get('format', 'csv')
+    gzip = params.get('gzip') in ('1', 'true')
+    try:
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown format: {fmt!r}. Use one of: {', '.join(FORMATS)}.")
+        fields = parse_fields(params.get('fields'), CHECK_RESULT_FIELDS, CHECK_RESULT_FIELDS)
+        start, end = parse_time(params.get('start')), parse_time(params.get('end'))
+        start = database_start(website.pk, start)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    response = StreamingHttpResponse(
+        export_stream(website.pk, fmt, gzip, start, end, fields),
+        content_type='application/gzip' if gzip else FORMATS[fmt],
+    )
+    response['Content-Disposition'] = f'attachment; filename="{export_filename(website, fmt, gzip)}"'
+    return response
+
+
+# --- 10. SLA Report API (uptime, outages, MTTR/MTBF, latency percentiles) ---
+@require_GET
+def api_sla_report(request):
+    """SLA metrics of the user's sites over a window.
+
+    Query parameters: sites (comma-separated ids, default all), start / end
+    (ISO-8601; end defaults to now, start to SLA_DEFAULT_DAYS before end, and
+    the window may span at most SLA_MAX_DAYS) and outages=1 to list outage
+    intervals.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required.'}, status=401)
+
+    params = request.GET
+    websites = Website.objects.filter(user=request.user)
+    try:
+        if params.get('sites'):
+            websites = websites.filter(pk__in=[int(site_id) for site_id in params['sites'].split(',')])
+        start, end = parse_time(params.get('start')), parse_time(params.get('end'))
+        end = end or timezone.now()
+        start = start or end - timedelta(days=settings.SLA_DEFAULT_DAYS)
+        if not timedelta(0) < end - start <= timedelta(days=settings.SLA_MAX_DAYS):
+            raise ValueError(f"start must be before end, and at most {settings.SLA_MAX_DAYS} days before it.")
+        report = sla_report(
+            list(websites.values_list('pk', flat=True)), start, end, params.get('outages') in ('1', 'true'),
+        )
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except ImproperlyConfigured as e:
+        return JsonResponse({'error': str(e)}, status=501)
+
+    return JsonResponse({
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'sites': {str(website_id): metrics for website_id, metrics in report.items()},
+    })
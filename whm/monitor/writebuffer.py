@@ -0,0 +1,92 @@
+import logging
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .latency import record_latency_sketches
+from .models import CheckResult, Website
+
+logger = logging.getLogger(__name__)
+
+# =================================================================
+# Write-Behind Buffer for Check Results
+# =================================================================
+# Instead of one INSERT plus one full-row UPDATE per probe, results are
+# accumulated here and written with bulk_create / bulk_update once the buffer
+# is full or old enough. Only the status columns are updated, so columns the
+# scheduler owns (next_check_at) are never overwritten with stale values.
+# On PostgreSQL the status columns are written with a single
+# UPDATE ... FROM (VALUES ...) per batch; bulk_update's per-column CASE
+# expressions cost more to plan than the update itself at 500 rows.
+
+WEBSITE_STATUS_FIELDS = ['last_checked', 'status_code', 'response_time', 'is_up']
+
+
+def update_website_status(websites):
+    """Writes WEBSITE_STATUS_FIELDS of the given websites, one statement per DB batch."""
+    batch_size = settings.WRITE_BUFFER_DB_BATCH_SIZE
+    if connection.vendor != 'postgresql':
+        Website.objects.bulk_update(websites, WEBSITE_STATUS_FIELDS, batch_size=batch_size)
+        return
+    pk = Website._meta.pk
+    fields = [Website._meta.get_field(name) for name in WEBSITE_STATUS_FIELDS]
+    columns = ', '.join(field.column for field in fields)
+    assignments = ', '.join(f"{field.column} = v.{field.column}" for field in fields)
+    # The first row carries explicit casts so NULLs in any column get the right type.
+    casts = ', '.join(f"%s::{field.db_type(connection)}" for field in fields)
+    placeholders = ', '.join(['%s'] * len(fields))
+    for i in range(0, len(websites), batch_size):
+        batch = websites[i:i + batch_size]
+        rows = [f"(%s::{pk.cast_db_type(connection)}, {casts})"] + [f"(%s, {placeholders})"] * (len(batch) - 1)
+        params = []
+        for website in batch:
+            params.append(website.pk)
+            params.extend(field.get_db_prep_save(getattr(website, field.attname), connection) for field in fields)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {Website._meta.db_table} AS w SET {assignments} "
+                f"FROM (VALUES {', '.join(rows)}) AS v(id, {columns}) WHERE w.{pk.column} = v.id",
+                params,
+            )
+
+
+class ResultWriteBuffer:
+    """Collects unsaved CheckResult rows and Website status changes for bulk flushing."""
+
+    def __init__(self, max_size=None, max_age_seconds=None):
+        self.max_size = max_size or settings.WRITE_BUFFER_MAX_SIZE
+        self.max_age = max_age_seconds or settings.WRITE_BUFFER_MAX_AGE_SECONDS
+        self._results = []
+        self._websites = {}
+        self._first_added = None
+
+    def __len__(self):
+        return len(self._results)
+
+    def add(self, website, check_result):
+        """Queues one CheckResult and the Website it updated; flushes when due."""
+        if self._first_added is None:
+            self._first_added = time.monotonic()
+        self._results.append(check_result)
+        # Only the latest state per site needs writing.
+        self._websites[website.pk] = website
+
+        if len(self._results) >= self.max_size or time.monotonic() - self._first_added >= self.max_age:
+            self.flush()
+
+    def flush(self):
+        """Writes everything buffered in one transaction; returns the number of results."""
+        if not self._results:
+            return 0
+
+        results, websites = self._results, list(self._websites.values())
+        self._results, self._websites, self._first_added = [], {}, None
+
+        with transaction.atomic():
+            CheckResult.objects.bulk_create(results, batch_size=settings.WRITE_BUFFER_DB_BATCH_SIZE)
+            record_latency_sketches(results)
+            update_website_status(websites)
+
+        logger.info(f"Flushed {len(results)} check results for {len(websites)} websites.")
+        return len(results)
@@ -16,12 +16,8 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 app.autodiscover_tasks()
 
 # Celery Beat Settings (The Scheduler)
-app.conf.beat_schedule = {
-    'run-all-checks-every-60-seconds': {
-        'task': 'monitor.tasks.run_all_checks',
-        'schedule': 60.0, # Run every 60 seconds
-    },
-}
+# The schedule lives in settings.CELERY_BEAT_SCHEDULE (loaded above). Assigning
+# app.conf.beat_schedule here would replace it and drop every entry but one.
 
 @app.task(bind=True)
 def debug_task(self):
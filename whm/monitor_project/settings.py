@@ -10,6 +10,7 @@ from pathlib import Path
 from dotenv import load_dotenv
 import os
 from celery.schedules import crontab
+from django.core.exceptions import ImproperlyConfigured
 
 load_dotenv()  # <--- ADD THIS LINE
 
@@ -34,6 +35,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'channels',
 
     # Your app
     'monitor',
@@ -68,6 +70,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'monitor_project.wsgi.application'
+ASGI_APPLICATION = 'monitor_project.asgi.application'
 
 # =================================================================
 # DATABASE CONFIGURATION
@@ -79,6 +82,74 @@ DATABASES = {
     }
 }
 
+# Use PostgreSQL when POSTGRES_DB is set (recommended at high check rates).
+if os.getenv('POSTGRES_DB'):
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.getenv('POSTGRES_DB'),
+        'USER': os.getenv('POSTGRES_USER', 'postgres'),
+        'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
+        'HOST': os.getenv('POSTGRES_HOST', '127.0.0.1'),
+        'PORT': os.getenv('POSTGRES_PORT', '5432'),
+    }
+
+# =================================================================
+# CACHE CONFIGURATION
+# =================================================================
+# Shared by all web and Celery processes (per-site check state, contact lists),
+# so deployments with more than one process must set CACHE_URL (Redis, needs
+# the `redis` package). Without it each process gets its own LocMemCache,
+# which is only suitable for development and tests.
+CACHE_URL = os.getenv('CACHE_URL')
+if CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+    }
+# Active alert contacts per user (monitor.contacts); save/delete signals invalidate
+# entries early, this bounds staleness after bulk queryset updates.
+CONTACT_CACHE_SECONDS = int(os.getenv('CONTACT_CACHE_SECONDS', 3600))
+# Per-site status written through by the checker (monitor.snapshots); entries
+# are rebuilt from the database if evicted. Encoded snapshots are per version.
+STATUS_SNAPSHOT_SECONDS = int(os.getenv('STATUS_SNAPSHOT_SECONDS', 86400))
+STATUS_SNAPSHOT_BODY_SECONDS = int(os.getenv('STATUS_SNAPSHOT_BODY_SECONDS', 300))
+
+# Sessions are read from the cache, so an authenticated poll costs one user lookup.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# =================================================================
+# CHANNELS (LIVE DASHBOARD)
+# =================================================================
+# Checkers publish coalesced per-user deltas (monitor.livefeed); dashboard
+# sockets subscribe to their user's group. Across processes this needs
+# CHANNEL_LAYER_URL and channels_redis; without it the in-memory layer only
+# reaches sockets served by the same process (development and tests).
+CHANNEL_LAYER_URL = os.getenv('CHANNEL_LAYER_URL')
+if CHANNEL_LAYER_URL:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {
+                'hosts': [CHANNEL_LAYER_URL],
+                # Deltas are superseded by the next window, so a slow socket drops them rather than queueing.
+                'capacity': int(os.getenv('CHANNEL_LAYER_CAPACITY', 200)),
+                'expiry': 10,
+            },
+        },
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}
+    }
+LIVE_UPDATES_ENABLED = os.getenv('LIVE_UPDATES_ENABLED', 'True') == 'True'
+LIVE_UPDATE_COALESCE_MS = int(os.getenv('LIVE_UPDATE_COALESCE_MS', 1000))  # Per-site coalescing window
+
 # =================================================================
 # AUTHENTICATION & CUSTOM USER MODEL
 # =================================================================
@@ -124,21 +195,127 @@ LOGGING = {
 # =================================================================
 # CELERY CONFIGURATION
 # =================================================================
-CELERY_BROKER_URL = 'redis://127.0.0.1:6379/0'
-CELERY_RESULT_BACKEND = 'redis://127.0.0.1:6379/0'
+# Redis (needs the `redis` package) unless overridden, e.g. CELERY_BROKER_URL=memory://
+# and CELERY_RESULT_BACKEND=cache+memory:// with CELERY_TASK_ALWAYS_EAGER=True
+# to run tasks inline without Redis (Celery acquires a producer even when eager).
+CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', 'redis://127.0.0.1:6379/0').strip()
+CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', 'redis://127.0.0.1:6379/0').strip()
+CELERY_TASK_ALWAYS_EAGER = os.getenv('CELERY_TASK_ALWAYS_EAGER', 'False') == 'True'
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
 CELERY_IMPORTS = ('monitor.tasks',)
 
+# run_all_checks only dispatches sites whose next_check_at has passed, so the
+# tick just has to be at least as fine as the shortest per-site interval.
+SCHEDULER_TICK_SECONDS = float(os.getenv('SCHEDULER_TICK_SECONDS', 10))
+SCHEDULER_HORIZON_SECONDS = int(os.getenv('SCHEDULER_HORIZON_SECONDS', 60))  # Heap look-ahead for run_scheduler
+SCHEDULER_MAX_DUE_PER_TICK = int(os.getenv('SCHEDULER_MAX_DUE_PER_TICK', 50000))
+
 CELERY_BEAT_SCHEDULE = {
-    'run-all-checks-every-minute': {
+    'run-all-checks': {
         'task': 'monitor.tasks.run_all_checks',
+        'schedule': SCHEDULER_TICK_SECONDS,
+    },
+    'update-check-rollups-every-minute': {
+        'task': 'monitor.tasks.update_check_rollups',
         'schedule': crontab(minute='*'),
     },
+    'maintain-check-history-hourly': {
+        'task': 'monitor.tasks.maintain_check_history',
+        'schedule': crontab(minute=5),
+    },
 }
 
+# =================================================================
+# PROBE ENGINE CONFIGURATION
+# =================================================================
+PROBE_TIMEOUT_SECONDS = int(os.getenv('PROBE_TIMEOUT_SECONDS', 15))
+PROBE_CONCURRENCY = int(os.getenv('PROBE_CONCURRENCY', 500))  # Max in-flight probes per event loop
+# Each worker keeps one pooled client; idle keep-alive connections are reused across batches.
+PROBE_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv('PROBE_MAX_KEEPALIVE_CONNECTIONS', 200))
+PROBE_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv('PROBE_KEEPALIVE_EXPIRY_SECONDS', 90))
+PROBE_MAX_CONNECTIONS_PER_HOST = int(os.getenv('PROBE_MAX_CONNECTIONS_PER_HOST', 6))
+PROBE_DEFAULT_MAX_BODY_BYTES = int(os.getenv('PROBE_DEFAULT_MAX_BODY_BYTES', 65536))  # Body cap for 'capped'/'range' probes without max_body_bytes
+
+# Content assertions: regex matches are searched within a sliding window of
+# this many recent characters; JSONPath assertions parse at most this much body.
+ASSERTION_REGEX_WINDOW_BYTES = int(os.getenv('ASSERTION_REGEX_WINDOW_BYTES', 8192))
+ASSERTION_JSON_MAX_BYTES = int(os.getenv('ASSERTION_JSON_MAX_BYTES', 1048576))
+
+# Per-worker DNS cache for the prober. Record TTLs are honoured (clamped to
+# MIN/MAX) when dnspython is installed; otherwise DEFAULT_TTL is used.
+DNS_CACHE_MAX_SIZE = int(os.getenv('DNS_CACHE_MAX_SIZE', 10000))
+DNS_CACHE_DEFAULT_TTL = 60
+DNS_CACHE_MIN_TTL = 5
+DNS_CACHE_MAX_TTL = 3600
+DNS_CACHE_NEGATIVE_TTL = 30  # Seconds to remember failed lookups
+
+# run_all_checks sends one check_website_batch message per CHECK_BATCH_SIZE due sites.
+# Set CHECK_BATCH_DISPATCH=False to fall back to one check_website message per site.
+CHECK_BATCH_DISPATCH = os.getenv('CHECK_BATCH_DISPATCH', 'True') == 'True'
+CHECK_BATCH_SIZE = int(os.getenv('CHECK_BATCH_SIZE', 200))
+
+# Check results are written behind the prober with bulk_create/bulk_update,
+# flushed when the buffer holds WRITE_BUFFER_MAX_SIZE rows or is this old.
+WRITE_BUFFER_MAX_SIZE = int(os.getenv('WRITE_BUFFER_MAX_SIZE', 500))
+WRITE_BUFFER_MAX_AGE_SECONDS = float(os.getenv('WRITE_BUFFER_MAX_AGE_SECONDS', 5))
+WRITE_BUFFER_DB_BATCH_SIZE = 500  # Rows per INSERT/UPDATE statement
+
+# Confirmation policy: a site changes state once CONFIRM_FAILURES of its last
+# CONFIRM_WINDOW checks agree (1 and 1 = alert on every single result). Until
+# then it is re-probed every CONFIRM_RETRY_SECONDS, at most CONFIRM_RETRIES times.
+CONFIRM_FAILURES = int(os.getenv('CONFIRM_FAILURES', 3))
+CONFIRM_WINDOW = int(os.getenv('CONFIRM_WINDOW', 5))
+CONFIRM_RETRIES = int(os.getenv('CONFIRM_RETRIES', 3))
+CONFIRM_RETRY_SECONDS = int(os.getenv('CONFIRM_RETRY_SECONDS', 5))
+# With half the window or less, both directions could be confirmed at once.
+if not CONFIRM_WINDOW / 2 < CONFIRM_FAILURES <= CONFIRM_WINDOW:
+    raise ImproperlyConfigured(
+        f"CONFIRM_FAILURES ({CONFIRM_FAILURES}) must be more than half of CONFIRM_WINDOW ({CONFIRM_WINDOW}) "
+        f"and no more than CONFIRM_WINDOW."
+    )
+# Flapping: FLAP_THRESHOLD raw up/down changes within the last FLAP_WINDOW checks.
+FLAP_WINDOW = int(os.getenv('FLAP_WINDOW', 20))
+FLAP_THRESHOLD = int(os.getenv('FLAP_THRESHOLD', 8))
+
+# =================================================================
+# CHECK HISTORY STORAGE
+# =================================================================
+# On PostgreSQL, set CHECKRESULT_PARTITIONING to 'day' or 'month' (before
+# running migrate, or later via `manage.py partition_check_history`) to store
+# CheckResult as native range partitions. Expired history is then dropped a
+# partition at a time; otherwise it is deleted in chunks.
+CHECKRESULT_PARTITIONING = os.getenv('CHECKRESULT_PARTITIONING') or None
+CHECKRESULT_PARTITIONS_AHEAD = int(os.getenv('CHECKRESULT_PARTITIONS_AHEAD', 7))  # Future partitions kept ready
+CHECKRESULT_RETENTION_DAYS = int(os.getenv('CHECKRESULT_RETENTION_DAYS', 90))
+CHECKRESULT_PRUNE_CHUNK_SIZE = 10000  # Rows per DELETE when pruning without partitions
+# Columnar archive (needs pyarrow and numpy): whole months older than
+# ARCHIVE_AFTER_DAYS are moved to per-site monthly Parquet files before
+# pruning. Keep ARCHIVE_AFTER_DAYS below RETENTION_DAYS or pruning deletes first.
+CHECKRESULT_ARCHIVE_ENABLED = os.getenv('CHECKRESULT_ARCHIVE_ENABLED', 'False') == 'True'
+CHECKRESULT_ARCHIVE_AFTER_DAYS = int(os.getenv('CHECKRESULT_ARCHIVE_AFTER_DAYS', 30))
+CHECKRESULT_ARCHIVE_DIR = os.getenv('CHECKRESULT_ARCHIVE_DIR', str(BASE_DIR / 'archive'))
+
+# Rollups (1m/1h/1d aggregates) are updated incrementally from an id watermark.
+ROLLUP_BATCH_SIZE = int(os.getenv('ROLLUP_BATCH_SIZE', 50000))  # Raw rows per rollup pass
+ROLLUP_MAX_BATCHES_PER_RUN = 10
+ROLLUP_SETTLE_SECONDS = 30  # Leave very recent rows for the next run
+
+# History API (/monitor/api/sites/<id>/history/) page sizes, in rows or buckets.
+HISTORY_PAGE_SIZE = int(os.getenv('HISTORY_PAGE_SIZE', 100))
+HISTORY_MAX_PAGE_SIZE = int(os.getenv('HISTORY_MAX_PAGE_SIZE', 1000))
+# Rows fetched per round trip by exports (server-side cursor on PostgreSQL).
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', 5000))
+# SLA report API (/monitor/api/sla/): window when no start is given, and the longest allowed.
+# Reports are computed from raw checks, so the longest window defaults to the raw retention.
+SLA_DEFAULT_DAYS = int(os.getenv('SLA_DEFAULT_DAYS', 30))
+SLA_MAX_DAYS = int(os.getenv('SLA_MAX_DAYS', CHECKRESULT_RETENTION_DAYS))
+
+# Response-time percentiles are tracked in one DDSketch per site per bucket.
+SKETCH_BUCKET_SECONDS = 300
+
 # =================================================================
 # ALERTING CONFIGURATION
 # =================================================================
@@ -152,6 +329,10 @@ EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 EMAIL_ENABLED = True
+# monitor.mailer keeps one SMTP connection open per worker; reconnect after
+# this much idle time (servers drop idle sessions) or this many messages.
+EMAIL_CONNECTION_MAX_IDLE_SECONDS = int(os.getenv('EMAIL_CONNECTION_MAX_IDLE_SECONDS', 60))
+EMAIL_MAX_MESSAGES_PER_CONNECTION = int(os.getenv('EMAIL_MAX_MESSAGES_PER_CONNECTION', 100))
 
 # --- SMS & WHATSAPP ALERTING (Twilio) ---
 TWILIO_ACCOUNT_SID = os.getenv('TWILIO_ACCOUNT_SID')
@@ -159,6 +340,63 @@ TWILIO_AUTH_TOKEN = os.getenv('TWILIO_AUTH_TOKEN')
 TWILIO_PHONE_NUMBER = os.getenv('TWILIO_PHONE_NUMBER')
 TWILIO_WHATSAPP_NUMBER = os.getenv('TWILIO_WHATSAPP_NUMBER')
 SMS_ENABLED = True
+# Override to send SMS to the fake Twilio server (manage.py run_fake_providers).
+TWILIO_API_BASE_URL = os.getenv('TWILIO_API_BASE_URL', 'https://api.twilio.com')
+SMS_REQUEST_TIMEOUT_SECONDS = float(os.getenv('SMS_REQUEST_TIMEOUT_SECONDS', 10))
+# Bulk SMS fan-out (deliver_sms_bulk): parallel sends per process, throttled by
+# a token bucket. Match the rate to the sender's throughput (Twilio: ~1/s for a
+# long code, 3/s toll-free, 100/s short code or a Messaging Service pool).
+SMS_FANOUT_WORKERS = int(os.getenv('SMS_FANOUT_WORKERS', 8))
+SMS_RATE_PER_SECOND = float(os.getenv('SMS_RATE_PER_SECOND', 1))  # Same long-code pace as ALERT_SMS_RATE_LIMIT
+SMS_RATE_BURST = int(os.getenv('SMS_RATE_BURST', 1))
+
+# --- ALERT DELIVERY QUEUES ---
+# Checkers only enqueue alerts; delivery runs on its own queue per channel, so a
+# slow SMTP server or SMS provider never stalls probing. Run dedicated workers
+# to cap concurrency per channel, e.g.:
+#   celery -A monitor_project worker -Q alerts_email -c 4
+#   celery -A monitor_project worker -Q alerts_sms -c 2
+# Rate limits are per worker process (Celery rate_limit semantics).
+ALERT_EMAIL_QUEUE = 'alerts_email'
+ALERT_SMS_QUEUE = 'alerts_sms'
+ALERT_EMAIL_RATE_LIMIT = os.getenv('ALERT_EMAIL_RATE_LIMIT', '20/s')
+ALERT_SMS_RATE_LIMIT = os.getenv('ALERT_SMS_RATE_LIMIT', '1/s')  # Twilio long codes: ~1 msg/s
+ALERT_MAX_RETRIES = int(os.getenv('ALERT_MAX_RETRIES', 6))
+ALERT_RETRY_BACKOFF_MAX_SECONDS = int(os.getenv('ALERT_RETRY_BACKOFF_MAX_SECONDS', 600))
+# Email alerts for the same contact within this window go out as one digest
+# mail (flush_email_digests runs at this interval). 0 sends each alert alone.
+ALERT_EMAIL_DIGEST_SECONDS = int(os.getenv('ALERT_EMAIL_DIGEST_SECONDS', 30))
+ALERT_DIGEST_MAX_ALERTS_PER_RUN = 5000
+if ALERT_EMAIL_DIGEST_SECONDS:
+    CELERY_BEAT_SCHEDULE['flush-email-digests'] = {
+        'task': 'monitor.tasks.flush_email_digests',
+        'schedule': ALERT_EMAIL_DIGEST_SECONDS,
+    }
+
+# Incident grouping: DOWN transitions sharing a host, IP or DNS provider are
+# collected for GROUP_WAIT seconds and notified once per user. If at least
+# STORM_MIN_INCIDENTS incidents come due together they are merged into one.
+# GROUP_WAIT = 0 alerts on every transition immediately. A site only joins an
+# incident opened within the last CORRELATION_WINDOW seconds.
+INCIDENT_GROUP_WAIT_SECONDS = int(os.getenv('INCIDENT_GROUP_WAIT_SECONDS', 60))
+INCIDENT_CORRELATION_WINDOW_SECONDS = int(os.getenv('INCIDENT_CORRELATION_WINDOW_SECONDS', 300))
+INCIDENT_STORM_MIN_INCIDENTS = int(os.getenv('INCIDENT_STORM_MIN_INCIDENTS', 5))
+# DNS provider (NS) lookups: one overall time budget per checker batch, answers
+# cached for their TTL up to INCIDENT_NS_CACHE_SECONDS. Failures are not cached.
+INCIDENT_NS_LOOKUP_TIMEOUT = float(os.getenv('INCIDENT_NS_LOOKUP_TIMEOUT', 1.0))
+INCIDENT_NS_CACHE_SECONDS = int(os.getenv('INCIDENT_NS_CACHE_SECONDS', 3600))
+if INCIDENT_GROUP_WAIT_SECONDS:
+    CELERY_BEAT_SCHEDULE['notify-incidents'] = {
+        'task': 'monitor.tasks.notify_incidents',
+        'schedule': max(5, INCIDENT_GROUP_WAIT_SECONDS // 4),
+    }
+
+CELERY_TASK_ROUTES = {
+    'monitor.tasks.deliver_email_alert': {'queue': ALERT_EMAIL_QUEUE},
+    'monitor.tasks.flush_email_digests': {'queue': ALERT_EMAIL_QUEUE},
+    'monitor.tasks.deliver_sms_alert': {'queue': ALERT_SMS_QUEUE},
+    'monitor.tasks.deliver_sms_bulk': {'queue': ALERT_SMS_QUEUE},
+}
 
 
 # =================================================================
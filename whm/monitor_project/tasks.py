@@ -4,7 +4,7 @@ from django.utils import timezone
 from .models import MonitoredWebsite, AlertLog
 from celery import shared_task
 from django.core.mail import send_mail
-from twilio.rest import Client # Needs pip install twilio
+from monitor.alerts import twilio_client
 
 # --- Configuration (Move to settings.py for production) ---
 # Simulating latency threshold (e.g., if response is over 500ms, mark as SLOW)
@@ -20,7 +20,7 @@ TWILIO_PHONE_NUMBER = '+15017122661' # Your Twilio phone number
 def send_sms_alert(phone_number, message):
     """Sends an SMS alert via Twilio."""
     try:
-        client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+        client = twilio_client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)  # Cached per process
         # Note: WhatsApp alerts use the same API endpoint but with a different 'from_' number format
         client.messages.create(
             to=phone_number,
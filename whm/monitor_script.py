@@ -5,6 +5,12 @@ from datetime import datetime
 # Define the acceptable threshold for a "SLOW" response (e.g., half a second)
 RESPONSE_TIME_THRESHOLD = 0.5 # seconds
 
+# One shared session keeps connections alive between checks of the same host,
+# so repeat checks skip the DNS + TCP + TLS handshake.
+session = requests.Session()
+session.mount('http://', requests.adapters.HTTPAdapter(pool_connections=50, pool_maxsize=10))
+session.mount('https://', requests.adapters.HTTPAdapter(pool_connections=50, pool_maxsize=10))
+
 def check_website_health(url):
     """
     Pings a URL and returns its status, response time, and status code.
@@ -15,7 +21,7 @@ def check_website_health(url):
         # but GET is safer for full health checks. We'll use GET here.
         start_time = time.time()
         
-        response = requests.get(url, timeout=10, allow_redirects=True)
+        response = session.get(url, timeout=10, allow_redirects=True)
         
         # Calculate the response time
         end_time = time.time()